@@ -0,0 +1,153 @@
+"""
+Substituto local do endpoint POST /api/groups do Laravel
+
+Aceita os mesmos payloads que GroupController::store e permite injetar:
+- latência (média + variação aleatória)
+- taxa de erros HTTP 500
+- quedas periódicas (a conexão é fechada sem resposta, como um servidor fora do ar)
+
+Uso isolado:
+    python api_standin.py --port 8001 --latency 0.05 --error-rate 0.02
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeGroupsAPI:
+    """Servidor HTTP local que imita POST /api/groups com falhas configuráveis"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 outage_every=0.0, outage_duration=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.outage_every = outage_every
+        self.outage_duration = outage_duration
+
+        self.stats = {'received': 0, 'errors': 0, 'outage_drops': 0, 'invalid': 0}
+        self._lock = threading.Lock()
+        self._started_at = None
+        self._next_group_id = 1
+
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                api._handle_post(self)
+
+            def log_message(self, format, *args):
+                pass  # Silencia o log padrão do http.server
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    def start(self):
+        self._started_at = time.monotonic()
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _in_outage(self):
+        """Indica se o servidor está numa janela de queda simulada"""
+        if not self.outage_every or not self.outage_duration:
+            return False
+        elapsed = time.monotonic() - self._started_at
+        return elapsed % self.outage_every >= self.outage_every - self.outage_duration
+
+    def _handle_post(self, handler):
+        if handler.path.rstrip('/') != '/api/groups':
+            handler.send_error(404)
+            return
+
+        length = int(handler.headers.get('Content-Length', 0))
+        body = handler.rfile.read(length)
+
+        if self._in_outage():
+            # Simula servidor fora do ar: fecha a conexão sem responder
+            self._count('outage_drops')
+            handler.close_connection = True
+            return
+
+        delay = self.latency + random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        if random.random() < self.error_rate:
+            self._count('errors')
+            self._send_json(handler, 500, {'message': 'Ocorreu um erro ao processar sua requisição.'})
+            return
+
+        try:
+            payload = json.loads(body)
+            valid = (
+                isinstance(payload.get('group_time'), (int, float)) and
+                len(payload.get('cubes', [])) == 3 and
+                all(isinstance(c.get('individual_time'), (int, float)) and c.get('color') and c.get('face')
+                    for c in payload['cubes'])
+            )
+        except (ValueError, AttributeError):
+            valid = False
+
+        if not valid:
+            self._count('invalid')
+            self._send_json(handler, 422, {'message': 'Payload inválido'})
+            return
+
+        with self._lock:
+            self.stats['received'] += 1
+            group_id = self._next_group_id
+            self._next_group_id += 1
+        self._send_json(handler, 201, {'id': group_id, 'group_time': payload['group_time']})
+
+    @staticmethod
+    def _send_json(handler, status, data):
+        body = json.dumps(data).encode()
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Substituto local de POST /api/groups")
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', type=float, default=0.0, help="latência média (s)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="variação da latência (s)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fração de respostas 500")
+    parser.add_argument('--outage-every', type=float, default=0.0, help="período entre quedas (s)")
+    parser.add_argument('--outage-duration', type=float, default=0.0, help="duração de cada queda (s)")
+    args = parser.parse_args()
+
+    api = FakeGroupsAPI(port=args.port, latency=args.latency, jitter=args.jitter,
+                        error_rate=args.error_rate, outage_every=args.outage_every,
+                        outage_duration=args.outage_duration).start()
+    print(f"[INFO] API local em {api.url}/groups - Ctrl+C para sair")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"[INFO] {api.stats}")
+    except KeyboardInterrupt:
+        api.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,453 @@
+"""
+Micro-benchmarks dos caminhos críticos do detector
+
+Mede, com frames sintéticos e frames dos datasets (1 a 6 caixas por frame):
+- CubeDetector.detect_cube_color
+- CubeDetector.update_tracking (modelo YOLO substituído por um stub)
+- CubeTimeLogger.add_cube / finalize_group (envio para API desativado)
+- Renderização do overlay (draw_overlay e draw_time_block)
+- Consultas do histórico colunar (HistoryStore) sobre um mês de grupos
+
+Uso:
+    python benchmark_hotpaths.py                   # compara com o baseline salvo
+    python benchmark_hotpaths.py --update-baseline # grava um novo baseline (mediana de várias rodadas)
+    python benchmark_hotpaths.py --threshold 0.4   # aceita até 40% de regressão
+
+A comparação usa o melhor tempo de cada caso (menos sensível a interrupções
+do sistema que a mediana), normalizado por uma carga de calibração
+intercalada com as amostras do caso: se a máquina inteira está mais lenta
+naquele momento (CPU disputada, frequência reduzida), a calibração fica lenta
+junto e a razão não acusa regressão. Sai com código 1 se algum caso ficar
+mais lento que o baseline além do limite.
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from config import (BENCHMARK_REGRESSION_THRESHOLD, BENCHMARK_BASELINE_FILE, BENCHMARK_BASELINE_RUNS,
+                    BENCHMARK_CONFIRM_RUNS)
+from cube_time_logger import create_logger
+from history_store import HistoryStore, COLORS
+from webcam_detect_adaptive import CubeDetector, draw_overlay
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASET_DIRS = [
+    os.path.join(BASE_DIR, "..", "dataset"),
+    os.path.join(BASE_DIR, "..", "dataset2"),
+]
+FRAME_WIDTH = 640
+FRAME_HEIGHT = 480
+MAX_BOXES = 6
+
+# Cores BGR usadas para pintar os cubos sintéticos
+SYNTHETIC_COLORS = {
+    'white': (235, 235, 235),
+    'yellow': (0, 220, 230),
+    'red': (20, 20, 200),
+    'orange': (0, 120, 245),
+    'blue': (200, 60, 10),
+    'green': (40, 180, 40)
+}
+
+# Carga fixa (Python puro + OpenCV) que mede a velocidade da máquina no momento de cada caso
+_CALIBRATION_FRAME = np.random.default_rng(0).integers(0, 255, (240, 320, 3), dtype=np.uint8)
+
+# Detectores criados pelo caso em execução; o barramento de cada um é fechado ao fim do caso
+# (threads de assinantes vivas deixariam os casos seguintes mais lentos)
+_open_detectors = []
+
+
+class _ModeloFalso:
+    """Substitui o YOLO nos benchmarks de tracking (nunca é chamado)"""
+
+    def __call__(self, *args, **kwargs):
+        return []
+
+
+def make_synthetic_frames(seed=0):
+    """Gera um frame sintético para cada quantidade de cubos (1 a 6)"""
+    rng = random.Random(seed)
+    frames = []
+    colors = list(SYNTHETIC_COLORS.keys())
+    for n_boxes in range(1, MAX_BOXES + 1):
+        frame = np.full((FRAME_HEIGHT, FRAME_WIDTH, 3), 90, dtype=np.uint8)
+        noise = np.random.default_rng(seed + n_boxes).integers(0, 25, frame.shape, dtype=np.uint8)
+        frame = cv2.add(frame, noise)
+        boxes = []
+        for i in range(n_boxes):
+            size = rng.randint(70, 110)
+            col, row = i % 3, i // 3
+            x1 = 20 + col * 200 + rng.randint(0, 40)
+            y1 = 30 + row * 220 + rng.randint(0, 40)
+            x2, y2 = x1 + size, y1 + size
+            cv2.rectangle(frame, (x1, y1), (x2, y2), SYNTHETIC_COLORS[colors[i]], -1)
+            boxes.append((x1, y1, x2, y2))
+        frames.append(('sintetico', frame, boxes))
+    return frames
+
+
+def load_dataset_frames(limit=12):
+    """Carrega imagens de teste dos datasets com as caixas dos rótulos YOLO"""
+    frames = []
+    for dataset_dir in DATASET_DIRS:
+        image_paths = sorted(glob.glob(os.path.join(dataset_dir, "test", "images", "*.jpg")))
+        for image_path in image_paths:
+            label_path = os.path.join(
+                dataset_dir, "test", "labels",
+                os.path.splitext(os.path.basename(image_path))[0] + ".txt"
+            )
+            if not os.path.exists(label_path):
+                continue
+            image = cv2.imread(image_path)
+            if image is None:
+                continue
+            frame = cv2.resize(image, (FRAME_WIDTH, FRAME_HEIGHT))
+            boxes = []
+            with open(label_path) as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) < 5:
+                        continue
+                    cx, cy, w, h = (float(v) for v in parts[1:5])
+                    x1 = int((cx - w / 2) * FRAME_WIDTH)
+                    y1 = int((cy - h / 2) * FRAME_HEIGHT)
+                    x2 = int((cx + w / 2) * FRAME_WIDTH)
+                    y2 = int((cy + h / 2) * FRAME_HEIGHT)
+                    boxes.append((max(0, x1), max(0, y1), min(FRAME_WIDTH, x2), min(FRAME_HEIGHT, y2)))
+            if boxes:
+                frames.append(('dataset', frame, boxes[:MAX_BOXES]))
+            if len(frames) >= limit:
+                return frames
+    return frames
+
+
+def create_benchmark_detector():
+    """Cria um CubeDetector com modelo stub e logger sem envio para API"""
+    detector = CubeDetector(None, model=_ModeloFalso())
+    logger = create_logger(history_dir=None)
+    logger.send_to_api_async = lambda payload: None
+    detector.attach_logger(logger)
+    _open_detectors.append(detector)
+    return detector
+
+
+def close_benchmark_detectors():
+    """Encerra as threads do barramento dos detectores criados desde a última chamada"""
+    while _open_detectors:
+        _open_detectors.pop().events.close()
+
+
+def _time_once(func):
+    start = time.perf_counter()
+    n_ops = func()
+    return (time.perf_counter() - start) / max(1, n_ops) * 1e6
+
+
+def _measure(func, repeat, calibrate=False):
+    """Executa func `repeat` vezes e retorna (melhor, mediana, p95, calibração) em us por operação
+
+    Com `calibrate`, a carga de calibração roda antes de cada amostra (na mesma
+    janela de tempo do caso) e a melhor delas é retornada; sem, vem None.
+    """
+    samples = []
+    calibrations = []
+    for _ in range(repeat):
+        if calibrate:
+            calibrations.append(_time_once(calibration))
+        samples.append(_time_once(func))
+    samples.sort()
+    p95_index = min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))
+    return samples[0], float(np.median(samples)), samples[p95_index], min(calibrations) if calibrate else None
+
+
+def calibration():
+    total = 0
+    for i in range(2000):
+        total += i * i % 7
+    cv2.GaussianBlur(_CALIBRATION_FRAME, (5, 5), 0)
+    cv2.cvtColor(_CALIBRATION_FRAME, cv2.COLOR_BGR2HSV)
+    return 1
+
+
+def bench_detect_cube_color(frames):
+    detector = create_benchmark_detector()
+
+    def run():
+        n_ops = 0
+        for _, frame, boxes in frames:
+            for bbox in boxes:
+                detector.detect_cube_color(frame, bbox)
+                n_ops += 1
+        return n_ops
+    return run
+
+
+def bench_update_tracking(frames, frames_per_scene=45):
+    """Simula cubos parados por `frames_per_scene` frames e depois saindo de cena"""
+    def run():
+        detector = create_benchmark_detector()
+        current_time = 1000.0
+        n_ops = 0
+        for _, frame, boxes in frames:
+            detections = [{'bbox': bbox, 'confidence': 0.9, 'frame': frame} for bbox in boxes]
+            for _ in range(frames_per_scene):
+                detector.update_tracking(detections, current_time)
+                current_time += 1 / 30
+                n_ops += 1
+            # Frames vazios para confirmar a saída dos cubos
+            for _ in range(detector.min_exit_frames + 1):
+                detector.update_tracking([], current_time)
+                current_time += 1 / 30
+                n_ops += 1
+            current_time += detector.cooldown_duration
+        detector.events.close()
+        return n_ops
+    return run
+
+
+def bench_logger(n_groups=200):
+    colors = list(SYNTHETIC_COLORS.keys())
+
+    def run():
+        logger = create_logger(history_dir=None)
+        logger.send_to_api_async = lambda payload: None
+        n_ops = 0
+        for i in range(n_groups):
+            for j in range(3):
+                logger.add_cube(colors[(i + j) % len(colors)], 3.0 + j)
+                n_ops += 1
+        return n_ops
+    return run
+
+
+def bench_history(days=30, group_interval=10.0):
+    """Consultas do painel sobre um histórico sintético de `days` dias (1 grupo a cada 10s)"""
+    workdir = tempfile.TemporaryDirectory(prefix="history_bench_")
+    rng = np.random.default_rng(0)
+    n_groups = int(days * 86400 / group_interval)
+    start = time.time() - days * 86400
+
+    # Três cores diferentes por grupo, tempos individuais em torno de 5s
+    color_ids = np.argsort(rng.random((n_groups, len(COLORS))), axis=1)[:, :3].astype(np.uint8)
+    times = np.clip(rng.normal(5.0, 1.5, (n_groups, 3)), 0.1, None).astype(np.float32)
+    group_ids = np.arange(1, n_groups + 1, dtype=np.int64)
+    timestamps = start + np.arange(n_groups) * group_interval
+    slowest, fastest = times.argmax(axis=1), times.argmin(axis=1)
+    rows = np.arange(n_groups)
+
+    store = HistoryStore(workdir.name)
+    store.cubes.extend({
+        'timestamp': np.repeat(timestamps, 3),
+        'color_id': color_ids.ravel(),
+        'individual_time': times.ravel(),
+        'group_id': np.repeat(group_ids, 3),
+    })
+    store.groups.extend({
+        'group_id': group_ids,
+        'timestamp': timestamps,
+        'group_time': times.sum(axis=1),
+        'max_color': color_ids[rows, slowest],
+        'max_time': times[rows, slowest],
+        'min_color': color_ids[rows, fastest],
+        'min_time': times[rows, fastest],
+    })
+    store.flush()
+    store = HistoryStore(workdir.name)
+    for _ in range(10):
+        store.append_group([{'color': c, 'individual_time': 5.0} for c in COLORS[:3]], 15.0)
+
+    def run():
+        store.averages_by_all_colors()
+        store.averages_by_all_colors(since=time.time() - 86400)
+        store.delayed(limit=50)
+        store.early(limit=50)
+        store.notifications()
+        store.latest_group_times()
+        store.groups_with_cubes()
+        return 7
+    run.workdir = workdir  # O diretório temporário vive enquanto o caso existir
+    return run
+
+
+def _populate_overlay_state(detector, boxes, current_time):
+    """Preenche o estado do detector para que o overlay desenhe todos os elementos"""
+    colors = list(SYNTHETIC_COLORS.keys())
+    for i, bbox in enumerate(boxes):
+        color = colors[i % len(colors)]
+        detector.active_cubes_by_color[color] = {
+            'id': f"cubo_{color}_{i + 1}", 'color': color,
+            'entry_time': current_time - 2.0, 'last_seen': current_time,
+            'bbox': bbox, 'detected_this_frame': i % 2 == 0
+        }
+        detector.cube_exit_frames[color] = i
+        detector.color_total_times[color] = 4.0 + i
+    detector.color_detection_start['white'] = current_time - 0.1
+    detector.logger.add_cube('red', 3.0)
+
+
+def bench_overlay(frames):
+    detector = create_benchmark_detector()
+    current_time = time.time()
+
+    def run():
+        n_ops = 0
+        for _, frame, boxes in frames:
+            detector.active_cubes_by_color.clear()
+            _populate_overlay_state(detector, boxes, current_time)
+            canvas = frame.copy()
+            draw_overlay(canvas, detector, current_time)
+            n_ops += 1
+        return n_ops
+    return run
+
+
+def bench_time_block(frames):
+    detector = create_benchmark_detector()
+    for color in SYNTHETIC_COLORS:
+        detector.color_total_times[color] = 12.5
+
+    def run():
+        n_ops = 0
+        for _, frame, _ in frames:
+            canvas = frame.copy()
+            detector.draw_time_block(canvas, detector)
+            n_ops += 1
+        return n_ops
+    return run
+
+
+def run_benchmarks(repeat, only=None):
+    """Executa os casos (todos, ou só os nomes em `only`) e retorna {nome_do_caso: {best_us, median_us, p95_us}}"""
+    synthetic = make_synthetic_frames()
+    dataset = load_dataset_frames()
+    frame_sets = {'sintetico': synthetic}
+    if dataset:
+        frame_sets['dataset'] = dataset
+
+    # Cada caso é montado só na sua vez, para não ter threads de outros casos rodando junto
+    cases = {}
+    for set_name, frames in frame_sets.items():
+        cases[f"detect_cube_color[{set_name}]"] = lambda frames=frames: bench_detect_cube_color(frames)
+        cases[f"update_tracking[{set_name}]"] = lambda frames=frames: bench_update_tracking(frames)
+        cases[f"draw_overlay[{set_name}]"] = lambda frames=frames: bench_overlay(frames)
+        cases[f"draw_time_block[{set_name}]"] = lambda frames=frames: bench_time_block(frames)
+    cases["logger.add_cube+finalize_group"] = bench_logger
+    cases["history.consultas[30 dias]"] = bench_history
+    if only is not None:
+        cases = {name: make_case for name, make_case in cases.items() if name in only}
+
+    results = {}
+    for name, make_case in cases.items():
+        # Os métodos medidos imprimem no terminal - silencia durante a medição
+        with contextlib.redirect_stdout(io.StringIO()):
+            func = make_case()
+            func()  # aquecimento
+            best_us, median_us, p95_us, calibration_us = _measure(func, repeat, calibrate=True)
+            close_benchmark_detectors()
+        results[name] = {'best_us': round(best_us, 2), 'median_us': round(median_us, 2), 'p95_us': round(p95_us, 2),
+                         'calibration_us': round(calibration_us, 2)}
+        print(f"{name:<40} melhor {best_us:10.1f} us/op   mediana {median_us:10.1f}   p95 {p95_us:10.1f}"
+              f"   (calibração {calibration_us:.1f})")
+    return results
+
+
+def combine_runs(runs):
+    """Baseline de várias rodadas: mediana, por caso, de cada estatística"""
+    return {
+        name: {key: round(float(np.median([run[name][key] for run in runs])), 2) for key in runs[0][name]}
+        for name in runs[0]
+    }
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """Retorna a lista de casos que regrediram além do limite"""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get('results', {}).get(name)
+        if not reference:
+            print(f"ℹ️ {name}: sem baseline para comparar")
+            continue
+        # Baselines antigos só têm a mediana (e nenhuma calibração)
+        reference_us = reference.get('best_us', reference['median_us'])
+        raw_ratio = result['best_us'] / reference_us if reference_us else 1.0
+        machine = result['calibration_us'] / reference['calibration_us'] if reference.get('calibration_us') else 1.0
+        ratio = raw_ratio / machine
+        status = "❌" if ratio > 1 + threshold else "✅"
+        print(f"{status} {name:<40} {ratio:6.2f}x do baseline   (bruto {raw_ratio:.2f}x, máquina {machine:.2f}x)")
+        if ratio > 1 + threshold:
+            regressions.append((name, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks do detector de cubos")
+    parser.add_argument('--repeat', type=int, default=15, help="repetições por caso")
+    parser.add_argument('--threshold', type=float, default=BENCHMARK_REGRESSION_THRESHOLD,
+                        help="regressão máxima aceita (fração da mediana do baseline)")
+    parser.add_argument('--baseline', default=BENCHMARK_BASELINE_FILE,
+                        help="arquivo JSON com o baseline")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="grava os resultados atuais como novo baseline")
+    parser.add_argument('--confirm', type=int, default=BENCHMARK_CONFIRM_RUNS,
+                        help="novas medições de um caso acima do limite antes de reprovar")
+    parser.add_argument('--runs', type=int, default=BENCHMARK_BASELINE_RUNS,
+                        help="rodadas completas combinadas no baseline (só com --update-baseline)")
+    args = parser.parse_args()
+
+    if args.update_baseline:
+        runs = []
+        for i in range(max(1, args.runs)):
+            print(f"[INFO] Rodada {i + 1}/{max(1, args.runs)}")
+            runs.append(run_benchmarks(args.repeat))
+        results = combine_runs(runs)
+        with open(args.baseline, 'w') as f:
+            json.dump({
+                'machine': platform.platform(),
+                'python': platform.python_version(),
+                'opencv': cv2.__version__,
+                'results': results
+            }, f, indent=2)
+        print(f"💾 Baseline salvo em {args.baseline} ({len(runs)} rodadas)")
+        return 0
+
+    results = run_benchmarks(args.repeat)
+
+    if not os.path.exists(args.baseline):
+        print(f"⚠️ Baseline {args.baseline} não encontrado - rode com --update-baseline")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    regressions = compare_with_baseline(results, baseline, args.threshold)
+    for attempt in range(args.confirm):
+        if not regressions:
+            break
+        names = [name for name, _ in regressions]
+        print(f"[INFO] Medindo de novo {len(names)} caso(s) acima do limite ({attempt + 1}/{args.confirm})")
+        retry = run_benchmarks(args.repeat, only=names)
+        for name in names:
+            # Fica a medição com menor tempo normalizado pela calibração
+            if retry[name]['best_us'] / retry[name]['calibration_us'] < \
+                    results[name]['best_us'] / results[name]['calibration_us']:
+                results[name] = retry[name]
+        regressions = compare_with_baseline({name: results[name] for name in names}, baseline, args.threshold)
+    if regressions:
+        print(f"🚨 {len(regressions)} caso(s) regrediram mais de {args.threshold:.0%}")
+        return 1
+    print("✅ Nenhuma regressão acima do limite")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
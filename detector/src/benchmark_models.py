@@ -0,0 +1,286 @@
+"""
+Benchmark de precisão vs. desempenho dos modelos treinados
+
+Roda cada modelo disponível (runs-cube/yolov8n-cube ... cube5) sobre os splits
+valid/test de dataset e dataset2, em cada backend de inferência e tamanho de
+entrada, e reporta numa tabela única:
+- mAP50 e mAP50-95
+- latência por imagem (p50/p90/p99)
+- throughput (imagens/s)
+- pico de memória do processo
+
+Com --select grava em model_selection.json o modelo que o main() deve usar:
+o de maior mAP50-95 entre os que atingem MODEL_MIN_FPS.
+
+Uso:
+    python benchmark_models.py
+    python benchmark_models.py --backends pytorch onnx --imgsz 320 640 --select
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+import psutil
+from ultralytics import YOLO
+
+from config import MODEL_SELECTION_FILE, MODEL_MIN_FPS
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RUNS_DIR = os.path.join(BASE_DIR, "..", "runs-cube")
+DATASETS = {
+    'dataset': os.path.join(BASE_DIR, "..", "dataset"),
+    'dataset2': os.path.join(BASE_DIR, "..", "dataset2"),
+}
+SPLITS = ['valid', 'test']
+BACKENDS = ['pytorch', 'onnx', 'openvino', 'torchscript']
+IMAGE_SIZES = [320, 480, 640]
+
+# Formato de exportação do ultralytics para cada backend
+EXPORT_FORMATS = {
+    'onnx': 'onnx',
+    'openvino': 'openvino',
+    'torchscript': 'torchscript'
+}
+
+
+class PeakMemorySampler:
+    """Amostra o RSS do processo em segundo plano para medir o pico durante um trecho"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.peak = self.process.memory_info().rss
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.process.memory_info().rss)
+            self._stop.wait(self.interval)
+
+
+def find_models():
+    """Retorna {nome_do_run: caminho_do_best.pt} para os modelos existentes"""
+    models = {}
+    for run_dir in sorted(glob.glob(os.path.join(RUNS_DIR, "yolov8n-cube*"))):
+        weights = os.path.join(run_dir, "weights", "best.pt")
+        if os.path.exists(weights):
+            models[os.path.basename(run_dir)] = weights
+    return models
+
+
+def export_model(weights_path, backend, imgsz):
+    """Exporta o modelo para o backend (com cache por tamanho de entrada)"""
+    if backend == 'pytorch':
+        return weights_path
+
+    weights_dir = os.path.dirname(weights_path)
+    stem = os.path.splitext(os.path.basename(weights_path))[0]
+    suffix = {'onnx': '.onnx', 'openvino': '_openvino_model', 'torchscript': '.torchscript'}[backend]
+    cached_path = os.path.join(weights_dir, f"{stem}_{imgsz}{suffix}")
+    if os.path.exists(cached_path):
+        return cached_path
+
+    exported = YOLO(weights_path).export(format=EXPORT_FORMATS[backend], imgsz=imgsz, verbose=False)
+    shutil.move(str(exported), cached_path)
+    return cached_path
+
+
+def write_data_yaml(dataset_dir, tmp_dir, name):
+    """Gera um data.yaml com caminhos absolutos (os do Roboflow são relativos e inconsistentes)"""
+    dataset_dir = os.path.abspath(dataset_dir)
+    yaml_path = os.path.join(tmp_dir, f"{name}.yaml")
+    with open(yaml_path, 'w') as f:
+        f.write(f"path: {dataset_dir}\n")
+        f.write("train: train/images\n")
+        f.write("val: valid/images\n")
+        f.write("test: test/images\n")
+        f.write("nc: 1\n")
+        f.write("names: ['cubo']\n")
+    return yaml_path
+
+
+def load_split_images(dataset_dir, split):
+    """Carrega as imagens de um split para a memória (fora da medição de latência)"""
+    images = []
+    for image_path in sorted(glob.glob(os.path.join(dataset_dir, split, "images", "*.jpg"))):
+        image = cv2.imread(image_path)
+        if image is not None:
+            images.append(image)
+    return images
+
+
+def measure_latency(model, images, imgsz, warmup=3):
+    """Mede a latência por imagem, o throughput e o pico de memória"""
+    for image in images[:warmup]:
+        model.predict(image, imgsz=imgsz, conf=0.5, verbose=False)
+
+    latencies = []
+    with PeakMemorySampler() as memory:
+        start = time.perf_counter()
+        for image in images:
+            t0 = time.perf_counter()
+            model.predict(image, imgsz=imgsz, conf=0.5, verbose=False)
+            latencies.append((time.perf_counter() - t0) * 1000)
+        total = time.perf_counter() - start
+
+    latencies = np.array(latencies)
+    return {
+        'latency_p50_ms': float(np.percentile(latencies, 50)),
+        'latency_p90_ms': float(np.percentile(latencies, 90)),
+        'latency_p99_ms': float(np.percentile(latencies, 99)),
+        'throughput_fps': len(images) / total if total > 0 else 0.0,
+        'peak_memory_mb': memory.peak / (1024 * 1024)
+    }
+
+
+def run_benchmark(models, backends, image_sizes, tmp_dir):
+    """Executa todas as combinações e retorna a lista de linhas da tabela"""
+    data_yamls = {name: write_data_yaml(path, tmp_dir, name) for name, path in DATASETS.items()}
+    split_images = {
+        (name, split): load_split_images(path, split)
+        for name, path in DATASETS.items() for split in SPLITS
+    }
+
+    rows = []
+    for model_name, weights_path in models.items():
+        for backend in backends:
+            for imgsz in image_sizes:
+                try:
+                    model_path = export_model(weights_path, backend, imgsz)
+                    model = YOLO(model_path, task='detect')
+                except Exception as e:
+                    print(f"[WARN] {model_name}/{backend}@{imgsz} indisponível: {e}")
+                    continue
+
+                for (dataset_name, split), images in split_images.items():
+                    if not images:
+                        continue
+                    metrics = model.val(
+                        data=data_yamls[dataset_name], split='val' if split == 'valid' else split,
+                        imgsz=imgsz, batch=1, device='cpu', plots=False, verbose=False
+                    )
+                    row = {
+                        'model': model_name,
+                        'model_path': os.path.relpath(model_path, BASE_DIR),
+                        'backend': backend,
+                        'imgsz': imgsz,
+                        'dataset': dataset_name,
+                        'split': split,
+                        'images': len(images),
+                        'map50': float(metrics.box.map50),
+                        'map50_95': float(metrics.box.map)
+                    }
+                    row.update(measure_latency(model, images, imgsz))
+                    rows.append(row)
+                    print(f"[INFO] {model_name}/{backend}@{imgsz} {dataset_name}/{split}: "
+                          f"mAP50-95 {row['map50_95']:.3f}, {row['throughput_fps']:.1f} fps")
+    return rows
+
+
+def print_table(rows):
+    """Imprime todos os resultados numa tabela única"""
+    header = (f"{'modelo':<16}{'backend':<12}{'imgsz':>6}  {'dataset/split':<18}"
+              f"{'mAP50':>7}{'mAP50-95':>10}{'p50ms':>8}{'p90ms':>8}{'p99ms':>8}"
+              f"{'fps':>8}{'pico MB':>9}")
+    print("\n" + header)
+    print("-" * len(header))
+    for row in rows:
+        print(f"{row['model']:<16}{row['backend']:<12}{row['imgsz']:>6}  "
+              f"{row['dataset'] + '/' + row['split']:<18}"
+              f"{row['map50']:>7.3f}{row['map50_95']:>10.3f}"
+              f"{row['latency_p50_ms']:>8.1f}{row['latency_p90_ms']:>8.1f}{row['latency_p99_ms']:>8.1f}"
+              f"{row['throughput_fps']:>8.1f}{row['peak_memory_mb']:>9.0f}")
+
+
+def select_model(rows, min_fps):
+    """Escolhe a configuração de maior mAP50-95 médio que atinge o FPS mínimo"""
+    configs = {}
+    for row in rows:
+        key = (row['model'], row['backend'], row['imgsz'])
+        configs.setdefault(key, []).append(row)
+
+    summaries = []
+    for (model_name, backend, imgsz), config_rows in configs.items():
+        summaries.append({
+            'model': model_name,
+            'model_path': config_rows[0]['model_path'],
+            'backend': backend,
+            'imgsz': imgsz,
+            'map50_95': float(np.mean([r['map50_95'] for r in config_rows])),
+            'throughput_fps': float(np.mean([r['throughput_fps'] for r in config_rows])),
+            'latency_p90_ms': float(np.mean([r['latency_p90_ms'] for r in config_rows]))
+        })
+    if not summaries:
+        return None
+
+    fast_enough = [s for s in summaries if s['throughput_fps'] >= min_fps]
+    if fast_enough:
+        return max(fast_enough, key=lambda s: (s['map50_95'], s['throughput_fps']))
+
+    print(f"[WARN] Nenhum modelo atingiu {min_fps:.0f} fps - escolhendo o mais rápido")
+    return max(summaries, key=lambda s: s['throughput_fps'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de precisão vs. desempenho dos modelos")
+    parser.add_argument('--backends', nargs='+', default=BACKENDS, choices=BACKENDS)
+    parser.add_argument('--imgsz', nargs='+', type=int, default=IMAGE_SIZES)
+    parser.add_argument('--models', nargs='+', help="runs a incluir (padrão: todos)")
+    parser.add_argument('--min-fps', type=float, default=MODEL_MIN_FPS)
+    parser.add_argument('--output', default=os.path.join(BASE_DIR, "model_benchmark.json"))
+    parser.add_argument('--select', action='store_true',
+                        help=f"grava a escolha em {MODEL_SELECTION_FILE} para o main()")
+    args = parser.parse_args()
+
+    models = find_models()
+    if args.models:
+        models = {name: path for name, path in models.items() if name in args.models}
+    if not models:
+        print("[ERRO] Nenhum modelo encontrado em runs-cube/*/weights/best.pt")
+        return 1
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        rows = run_benchmark(models, args.backends, args.imgsz, tmp_dir)
+
+    print_table(rows)
+    with open(args.output, 'w') as f:
+        json.dump(rows, f, indent=2)
+    print(f"\n💾 Resultados salvos em {args.output}")
+
+    choice = select_model(rows, args.min_fps)
+    if choice is None:
+        return 1
+    print(f"🏆 Melhor escolha: {choice['model']} ({choice['backend']} @ {choice['imgsz']}px) - "
+          f"mAP50-95 {choice['map50_95']:.3f}, {choice['throughput_fps']:.1f} fps")
+
+    if args.select:
+        choice['min_fps'] = args.min_fps
+        choice['selected_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        with open(MODEL_SELECTION_FILE, 'w') as f:
+            json.dump(choice, f, indent=2)
+        print(f"💾 Escolha gravada em {MODEL_SELECTION_FILE}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
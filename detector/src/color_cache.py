@@ -0,0 +1,104 @@
+"""
+Cache temporal de cor por trilha
+
+Um cubo parado sob a câmera passa frame após frame pelo mesmo blur/HSV/
+máscaras de detect_cube_color para dar a mesma resposta. Aqui cada caixa do
+frame anterior vira uma trilha com a cor calculada e uma assinatura barata do
+recorte (miniatura BGR de poucos pixels). No frame seguinte a cor é
+reaproveitada quando:
+- a nova caixa sobrepõe a da trilha com IoU >= COLOR_CACHE_IOU
+- a miniatura do novo recorte difere da assinatura da última classificação
+  completa em no máximo COLOR_CACHE_MAX_DIFF (média por pixel, escala 0-255)
+- a trilha foi classificada por completo há menos de COLOR_CACHE_REFRESH_FRAMES frames
+
+Qualquer outra situação (caixa nova ou deslocada, pixels mudaram, idade
+esgotada) faz a classificação completa e renova a trilha. Trilhas sem caixa
+no frame são descartadas.
+"""
+import cv2
+import numpy as np
+
+from config import (COLOR_CACHE_IOU, COLOR_CACHE_MAX_DIFF, COLOR_CACHE_REFRESH_FRAMES,
+                    COLOR_CACHE_THUMBNAIL)
+
+
+def bbox_iou(a, b):
+    """Interseção sobre união de duas caixas (x1, y1, x2, y2)"""
+    ix = min(a[2], b[2]) - max(a[0], b[0])
+    iy = min(a[3], b[3]) - max(a[1], b[1])
+    if ix <= 0 or iy <= 0:
+        return 0.0
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class ColorCache:
+    """Reaproveita a cor de trilhas cuja caixa e pixels não mudaram"""
+
+    def __init__(self, iou_threshold=COLOR_CACHE_IOU, max_diff=COLOR_CACHE_MAX_DIFF,
+                 refresh_frames=COLOR_CACHE_REFRESH_FRAMES, thumbnail=COLOR_CACHE_THUMBNAIL):
+        self.iou_threshold = iou_threshold
+        self.max_diff = max_diff
+        self.refresh_frames = refresh_frames
+        self.thumbnail = thumbnail
+        self.tracks = []    # Trilhas do frame anterior
+        self._matched = []  # Trilhas confirmadas no frame atual
+        self.stats = {'hits': 0, 'new': 0, 'changed': 0, 'refreshed': 0}
+
+    def _signature(self, roi):
+        size = self.thumbnail
+        return cv2.resize(roi, (size, size), interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def _best_track(self, bbox):
+        best, best_iou = None, self.iou_threshold
+        for track in self.tracks:
+            iou = bbox_iou(bbox, track['bbox'])
+            if iou >= best_iou:
+                best, best_iou = track, iou
+        return best
+
+    def classify(self, frame, bbox, classifier):
+        """Cor da caixa: da trilha correspondente ou de `classifier(frame, bbox)`"""
+        x1, y1, x2, y2 = bbox
+        roi = frame[y1:y2, x1:x2]
+        if roi.size == 0:
+            return classifier(frame, bbox)
+        signature = self._signature(roi)
+
+        track = self._best_track(bbox)
+        if track is not None:
+            # Cada trilha atende uma caixa por frame; remove por identidade (== compararia os arrays)
+            self.tracks = [t for t in self.tracks if t is not track]
+            if track['age'] + 1 >= self.refresh_frames:
+                self.stats['refreshed'] += 1
+            elif np.abs(signature - track['signature']).mean() > self.max_diff:
+                self.stats['changed'] += 1
+            else:
+                self.stats['hits'] += 1
+                track['bbox'] = bbox
+                track['age'] += 1
+                self._matched.append(track)
+                return track['color'], track['conf']
+        else:
+            self.stats['new'] += 1
+
+        color, conf = classifier(frame, bbox)
+        self._matched.append({'bbox': bbox, 'signature': signature, 'color': color, 'conf': conf, 'age': 0})
+        return color, conf
+
+    def end_frame(self):
+        """Fecha o frame: trilhas sem caixa neste frame são descartadas"""
+        self.tracks, self._matched = self._matched, []
+
+    def clear(self):
+        """Descarta todas as trilhas (ex.: ranges HSV mudaram)"""
+        self.tracks = []
+        self._matched = []
+
+    def hit_rate(self):
+        total = sum(self.stats.values())
+        return self.stats['hits'] / total if total else 0.0
+
+    def get_stats(self):
+        return dict(self.stats, hit_rate=self.hit_rate(), tracks=len(self.tracks))
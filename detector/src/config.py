@@ -2,6 +2,10 @@
 Configurações gerais do sistema de detecção de cubos
 Altere estes valores para ajustar os tempos médios esperados
 """
+import os
+
+# Arquivos e diretórios gerados ficam nesta pasta, independente do diretório atual
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # ===========================================
 # CONFIGURAÇÕES DE TEMPO MÉDIO
@@ -37,11 +41,167 @@ COLOR_CONFIDENCE_THRESHOLD = 0.05
 MAX_DISTANCE_THRESHOLD = 150
 MAX_CUBES_SIMULTANEOUS = 6
 MIN_STABILITY_FRAMES = 5
-MIN_DETECTION_DURATION = 0.2
-MIN_CONSECUTIVE_FRAMES = 6
-MAX_MISSED_FRAMES = 2
-COOLDOWN_DURATION = 2.0
-MIN_EXIT_FRAMES = 10
+
+# Janelas de tempo do tracking (em segundos). O número mínimo de frames de cada
+# janela é derivado da taxa de frames medida (ver frame_rate.py)
+MIN_DETECTION_DURATION = 0.2  # Tempo detectando uma cor para confirmar o cubo
+MAX_MISSED_DURATION = 0.07    # Falhas toleradas durante a confirmação
+COOLDOWN_DURATION = 2.0       # Tempo sem aceitar a mesma cor após uma saída
+MIN_EXIT_DURATION = 0.33      # Tempo sem detecção para confirmar a saída do cubo
+
+# Taxa assumida antes da primeira medição e quantos intervalos entram na mediana
+NOMINAL_FPS = 30.0
+FPS_WINDOW = 30
+
+# Teste de presença na última caixa (ver presence.py): compara a região com um modelo da
+# cena vazia para confirmar saídas mais cedo e manter o cubo enquanto o YOLO falha
+PRESENCE_ENABLED = True
+PRESENCE_EXIT_DURATION = 0.1     # Saída confirmada quando a região já é fundo por este tempo
+PRESENCE_MAX_HOLD = 1.0          # Máximo que a presença sozinha mantém um cubo sem detecção do YOLO
+PRESENCE_SCALE = 0.25            # Escala do modelo de fundo (640x480 -> 160x120)
+PRESENCE_BG_ALPHA = 0.05         # Peso de cada atualização na média móvel do fundo
+PRESENCE_BG_INTERVAL = 3         # Atualiza o fundo a cada N frames
+PRESENCE_DIFF_THRESHOLD = 20.0   # Diferença média (0-255) acima da qual a região está ocupada
+PRESENCE_MIN_KNOWN = 0.8         # Fração da região com fundo já observado para decidir
+
+# Frames seguidos sem inferência enquanto só há cubos já confirmados (0 = YOLO em todo frame);
+# nesses frames a saída é decidida pelo teste de presença. Atrasa em até N frames a entrada de um novo cubo
+YOLO_SKIP_FRAMES = 0
+
+# Cache temporal de cor por trilha (ver color_cache.py): reaproveita a cor do frame anterior
+# quando a caixa quase não mexeu (IoU) e a miniatura do recorte não mudou (diferença média 0-255)
+COLOR_CACHE_ENABLED = True
+COLOR_CACHE_IOU = 0.85
+COLOR_CACHE_MAX_DIFF = 6.0
+COLOR_CACHE_REFRESH_FRAMES = 15  # Reclassificação completa forçada a cada N frames
+COLOR_CACHE_THUMBNAIL = 8        # Lado da miniatura usada como assinatura
+
+# Ranges de cores em HSV com margens maiores para iluminação variável
+# (podem ser ajustados por estação/câmera em station_profiles.json)
+COLOR_RANGES = {
+    'white': ([0, 0, 150], [180, 80, 255]),  # Margem maior para branco
+    'yellow': ([15, 80, 80], [35, 255, 255]),  # Margem expandida
+    'red': ([0, 80, 80], [15, 255, 255]),  # Margem expandida
+    'red2': ([165, 80, 80], [180, 255, 255]),  # Margem expandida
+    'orange': ([5, 80, 80], [25, 255, 255]),  # Margem expandida
+    'blue': ([95, 60, 60], [135, 255, 255]),  # Margem muito maior para azul
+    'green': ([35, 80, 80], [85, 255, 255])  # Margem expandida
+}
+
+# ===========================================
+# CONFIGURAÇÕES DE EXIBIÇÃO
+# ===========================================
+
+# "window" = janela a cada frame, "reduced" = janela a DISPLAY_FPS,
+# "headless" = sem janela e sem desenho (estações de produção)
+DISPLAY_MODE = "window"
+
+# Taxa de atualização da janela no modo "reduced" (a inferência segue na taxa da câmera)
+DISPLAY_FPS = 10.0
+
+# ===========================================
+# CONFIGURAÇÕES DE GRUPOS
+# ===========================================
+
+# Tempo sem novos cubos para um grupo parcial ser considerado abandonado (em segundos)
+GROUP_TIMEOUT = 120.0
+
+# Máximo de grupos abertos ao mesmo tempo em cada fluxo (estação/câmera)
+MAX_OPEN_GROUPS_PER_FLOW = 4
+
+# ===========================================
+# CONFIGURAÇÕES DE HISTÓRICO
+# ===========================================
+
+# Diretório do histórico colunar em disco (None desativa)
+HISTORY_DIR = os.path.join(BASE_DIR, "history")
+
+# Linhas por segmento de cada coluna (arquivos .npy memory-mapped)
+HISTORY_SEGMENT_ROWS = 65536
+
+# Quantos grupos completos ficam em memória (CubeTimeLogger.all_groups)
+HISTORY_HOT_WINDOW = 50
+
+# Quantos cubos saídos ficam em memória (CubeDetector.cube_history)
+CUBE_HISTORY_LIMIT = 200
+
+# ===========================================
+# CONFIGURAÇÕES DE GRAVAÇÃO
+# ===========================================
+
+# Lado (px) do recorte de cada detecção gravado com --record-crops (ver detection_log.py)
+RECORD_CROP_SIZE = 32
+
+# ===========================================
+# CONFIGURAÇÕES DE CONTROLE REMOTO
+# ===========================================
+
+# API HTTP local de controle (--daemon ou --control-port); só escuta em localhost por padrão
+CONTROL_API_HOST = "127.0.0.1"
+CONTROL_API_PORT = 8765
+
+# Tempo máximo que uma requisição espera o próximo limite de frame (em segundos)
+CONTROL_REPLY_TIMEOUT = 2.0
+
+# ===========================================
+# CONFIGURAÇÕES DE PREVIEW REMOTO
+# ===========================================
+
+# Stream MJPEG com o overlay (--preview, ver preview.py); só escuta em localhost por padrão,
+# use --preview-host 0.0.0.0 para os supervisores verem de outra máquina (só leitura, sem autenticação)
+PREVIEW_HOST = "127.0.0.1"
+PREVIEW_PORT = 8766
+
+# Faixa de fps por cliente: começa no máximo e cai (depois a resolução) se o cliente não acompanha
+PREVIEW_MAX_FPS = 15.0
+PREVIEW_MIN_FPS = 1.0
+
+# Resoluções oferecidas (fração do frame); cada uma é codificada uma vez por frame publicado
+PREVIEW_SCALES = (1.0, 0.5, 0.25)
+PREVIEW_JPEG_QUALITY = 70
+
+# Frames rápidos seguidos antes de subir resolução/fps e tempo máximo de escrita num cliente parado
+PREVIEW_ADAPT_FRAMES = 10
+PREVIEW_CLIENT_TIMEOUT = 10.0
+
+# ===========================================
+# CONFIGURAÇÕES DE EVIDÊNCIAS
+# ===========================================
+
+# Recortes JPEG dos cubos na confirmação e na saída (--evidence, ver evidence.py)
+EVIDENCE_DIR = os.path.join(BASE_DIR, "evidence")
+
+# Espaço máximo em disco; os arquivos mais antigos são apagados ao passar do limite
+EVIDENCE_MAX_MB = 200
+
+# Threads de codificação/gravação e recortes aguardando (fila cheia = recorte descartado)
+EVIDENCE_WORKERS = 2
+EVIDENCE_QUEUE_SIZE = 32
+
+# Qualidade do JPEG e margem em volta da caixa (fração do tamanho da caixa)
+EVIDENCE_JPEG_QUALITY = 85
+EVIDENCE_MARGIN = 0.15
+
+# ===========================================
+# CONFIGURAÇÕES DE EVENTOS
+# ===========================================
+
+# Eventos pendentes por assinante do barramento do tracker (ver event_bus.py)
+EVENT_QUEUE_SIZE = 256
+
+# Fila cheia: "drop" descarta o evento novo; "block" espera até EVENT_BLOCK_TIMEOUT e então descarta
+EVENT_OVERFLOW_POLICY = "drop"
+EVENT_BLOCK_TIMEOUT = 0.5
+
+# ===========================================
+# CONFIGURAÇÕES DE CPU
+# ===========================================
+
+# Threads/afinidade gravadas pelo autotune (python resources.py --autotune)
+RESOURCES_FILE = os.path.join(BASE_DIR, "resources.json")
+
+# Núcleos reservados para threads de E/S (envio para API, captura, configuração)
+IO_RESERVED_CORES = 1
 
 # ===========================================
 # CONFIGURAÇÕES DE API
@@ -50,6 +210,42 @@ MIN_EXIT_FRAMES = 10
 # URL base da API (ajuste conforme necessário)
 API_BASE_URL = "http://127.0.0.1:8000/api"
 
+# ===========================================
+# CONFIGURAÇÃO EM TEMPO DE EXECUÇÃO
+# ===========================================
+
+# Perfis por estação/câmera recarregados sem reiniciar o detector (ver runtime_config.py)
+STATION_PROFILES_FILE = os.path.join(BASE_DIR, "station_profiles.json")
+
+# Intervalo de verificação de mudanças no arquivo de perfis (em segundos)
+CONFIG_WATCH_INTERVAL = 1.0
+
+# ===========================================
+# CONFIGURAÇÕES DE BENCHMARK
+# ===========================================
+
+# Regressão máxima aceita em relação ao baseline salvo (0.25 = 25% mais lento)
+BENCHMARK_REGRESSION_THRESHOLD = 0.25
+
+# Arquivo com os resultados de referência dos micro-benchmarks
+BENCHMARK_BASELINE_FILE = os.path.join(BASE_DIR, "benchmark_baseline.json")
+
+# Rodadas completas combinadas (mediana por caso) ao gravar o baseline
+BENCHMARK_BASELINE_RUNS = 5
+
+# Quantas vezes um caso acima do limite é medido de novo antes de contar como regressão
+# (vale a menor razão; uma regressão real se repete, um soluço da máquina não)
+BENCHMARK_CONFIRM_RUNS = 2
+
+# Arquivo gerado por benchmark_models.py com o modelo escolhido para o main()
+MODEL_SELECTION_FILE = os.path.join(BASE_DIR, "model_selection.json")
+
+# FPS mínimo que um modelo precisa atingir para ser escolhido
+MODEL_MIN_FPS = 15.0
+
+# Cache com o último modelo que carregou com sucesso (acelera a inicialização)
+STARTUP_CACHE_FILE = os.path.join(BASE_DIR, ".last_model.json")
+
 # ===========================================
 # VALIDAÇÕES
 # ===========================================
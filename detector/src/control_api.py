@@ -0,0 +1,283 @@
+"""
+Controle do detector em execução: teclas da janela e API HTTP local
+
+As teclas do cv2.waitKey e a API usam as mesmas ações (apply_control). A API
+serve estações sem janela (--daemon): modelo e câmera continuam carregados e
+os parâmetros mudam sem reiniciar. As requisições entram numa fila e o laço
+principal as aplica entre um frame e outro (process), então nenhuma ação
+altera o detector no meio de um update_tracking.
+
+Endpoints (JSON):
+    GET  /state              estado do detector, do grupo atual, do logger e dos eventos
+    GET  /actions            ações disponíveis
+    POST /actions/<ação>     aplica a ação no próximo limite de frame (parâmetros no corpo)
+
+Ações:
+    finalize_group                          força a finalização do grupo atual (tecla f)
+    toggle_api_send | set_api_send {enabled} envio para a API (tecla a)
+    toggle_debug                            modo debug (tecla d)
+    quick_mode {enabled?}                   detecção rápida (tecla r)
+    detection_duration {delta | value}      tempo para confirmar uma cor, em segundos (teclas +/-)
+    missed_tolerance {frames | value}       tolerância a falhas na confirmação (teclas [/])
+    pause | resume                          pausa a detecção mantendo câmera e modelo prontos
+    stop                                    encerra o detector (tecla q)
+
+Exemplo:
+    curl -X POST localhost:8765/actions/detection_duration -d '{"delta": 0.1}'
+"""
+import json
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import CONTROL_API_HOST, CONTROL_API_PORT, CONTROL_REPLY_TIMEOUT
+from resources import pin_io_thread
+
+# Limites usados pelas teclas desde a primeira versão
+DETECTION_DURATION_LIMITS = (0.1, 2.0)
+MAX_MISSED_DURATION_LIMIT = 0.5
+
+
+def new_control_state():
+    """Estado do laço principal alterado pelas ações (pausa, parada, frames processados)"""
+    return {'paused': False, 'running': True, 'frames': 0}
+
+
+def _set_detection_duration(detector, params):
+    low, high = DETECTION_DURATION_LIMITS
+    value = params['value'] if 'value' in params else detector.min_detection_duration + params.get('delta', 0.0)
+    previous = detector.min_detection_duration
+    detector.min_detection_duration = min(high, max(low, float(value)))
+    detector.update_frame_windows()
+    verb = "aumentado" if detector.min_detection_duration >= previous else "reduzido"
+    print(f"⏱️ Tempo de detecção {verb} para {detector.min_detection_duration:.1f}s")
+    return {'min_detection_duration': detector.min_detection_duration,
+            'min_consecutive_frames': detector.min_consecutive_frames}
+
+
+def _set_missed_tolerance(detector, params):
+    frame_time = 1.0 / detector.frame_rate.fps
+    if 'value' in params:
+        value = float(params['value'])
+    else:
+        value = detector.max_missed_duration + int(params.get('frames', 0)) * frame_time
+    previous = detector.max_missed_duration
+    detector.max_missed_duration = min(MAX_MISSED_DURATION_LIMIT, max(frame_time, value))
+    detector.update_frame_windows()
+    verb = "aumentada" if detector.max_missed_duration >= previous else "reduzida"
+    print(f"🎯 Tolerância a frames perdidos {verb} para {detector.max_missed_duration:.2f}s ({detector.max_missed_frames} frames)")
+    return {'max_missed_duration': detector.max_missed_duration,
+            'max_missed_frames': detector.max_missed_frames}
+
+
+def _require_bool(value, name):
+    """Aceita só booleano JSON ("false" como string viraria True com bool())"""
+    if not isinstance(value, bool):
+        raise ValueError(f"'{name}' deve ser true ou false, recebido {value!r}")
+    return value
+
+
+def _set_quick_mode(detector, params):
+    enabled = params.get('enabled', not detector.quick_detection_mode)
+    detector.quick_detection_mode = _require_bool(enabled, 'enabled')
+    mode_text = "ATIVADO" if detector.quick_detection_mode else "DESATIVADO"
+    duration = detector.quick_detection_duration if detector.quick_detection_mode else detector.min_detection_duration
+    frames = detector.quick_detection_frames if detector.quick_detection_mode else detector.min_consecutive_frames
+    print(f"🚀 Modo de detecção rápida {mode_text} - {duration:.1f}s / {frames} frames")
+    return {'quick_detection_mode': detector.quick_detection_mode}
+
+
+def _set_api_send(logger, enabled):
+    if _require_bool(enabled, 'enabled') != logger.enable_api_send:
+        logger.toggle_api_send()
+    return {'api_send': logger.enable_api_send}
+
+
+def _toggle_debug(detector):
+    detector.debug_mode = not detector.debug_mode
+    return {'debug_mode': detector.debug_mode}
+
+
+def _finalize_group(logger, params):
+    logger.force_finalize_group(discard_incomplete=_require_bool(params.get('discard', False), 'discard'))
+    return {'total_groups': logger.totals['groups']}
+
+
+def _set_paused(control, paused):
+    control['paused'] = paused
+    print("⏸️ Detecção pausada" if paused else "▶️ Detecção retomada")
+    return {'paused': paused}
+
+
+def _stop(control):
+    control['running'] = False
+    return {'running': False}
+
+
+ACTIONS = ('state', 'finalize_group', 'toggle_api_send', 'set_api_send', 'toggle_debug', 'quick_mode',
+           'detection_duration', 'missed_tolerance', 'pause', 'resume', 'stop')
+
+
+def apply_control(action, detector, logger, params=None, control=None):
+    """Aplica uma ação (tecla ou API) e retorna o resultado; ValueError para ação/parâmetro inválido"""
+    params = params or {}
+    control = control if control is not None else new_control_state()
+    try:
+        if action == 'state':
+            return snapshot(detector, logger, control)
+        elif action == 'finalize_group':
+            return _finalize_group(logger, params)
+        elif action == 'toggle_api_send':
+            return _set_api_send(logger, not logger.enable_api_send)
+        elif action == 'set_api_send':
+            return _set_api_send(logger, params['enabled'])
+        elif action == 'toggle_debug':
+            return _toggle_debug(detector)
+        elif action == 'quick_mode':
+            return _set_quick_mode(detector, params)
+        elif action == 'detection_duration':
+            return _set_detection_duration(detector, params)
+        elif action == 'missed_tolerance':
+            return _set_missed_tolerance(detector, params)
+        elif action in ('pause', 'resume'):
+            return _set_paused(control, action == 'pause')
+        elif action == 'stop':
+            return _stop(control)
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Parâmetros inválidos para {action}: {e}")
+    raise ValueError(f"Ação desconhecida: {action}")
+
+
+def snapshot(detector, logger, control):
+    """Estado atual em JSON (montado entre frames, então é consistente)"""
+    return {
+        'paused': control['paused'],
+        'frames': control['frames'],
+        'fps': round(detector.frame_rate.fps, 2),
+        'debug_mode': detector.debug_mode,
+        'quick_detection_mode': detector.quick_detection_mode,
+        'api_send': logger.enable_api_send,
+        'min_detection_duration': detector.min_detection_duration,
+        'min_consecutive_frames': detector.min_consecutive_frames,
+        'max_missed_duration': detector.max_missed_duration,
+        'max_missed_frames': detector.max_missed_frames,
+        'min_exit_duration': detector.min_exit_duration,
+        'min_exit_frames': detector.min_exit_frames,
+        'cooldown_duration': detector.cooldown_duration,
+        'active_cubes': {
+            color: {'id': cube['id'], 'entry_time': cube['entry_time'],
+                    'last_seen': cube['last_seen'], 'bbox': list(cube['bbox'])}
+            for color, cube in detector.active_cubes_by_color.items()
+        },
+        'candidates': dict(detector.color_detection_start),
+        'group': logger.get_current_group_info(),
+        'summary': logger.get_summary(),
+        'events': detector.events.get_stats(),
+        'evidence': detector.evidence.get_stats(control['frames']) if detector.evidence is not None else None,
+        'color_cache': detector.color_cache.get_stats() if detector.color_cache is not None else None,
+        'exits': dict(detector.exit_stats,
+                      presence=dict(detector.presence.stats) if detector.presence is not None else None)
+    }
+
+
+class ControlServer:
+    """Servidor HTTP local; as ações ficam na fila até o laço principal chamar process()"""
+
+    def __init__(self, host=CONTROL_API_HOST, port=CONTROL_API_PORT, reply_timeout=CONTROL_REPLY_TIMEOUT):
+        self.reply_timeout = reply_timeout
+        self.stats = {'requests': 0, 'applied': 0, 'errors': 0, 'timeouts': 0}
+        self._commands = queue.Queue()
+
+        control = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') == '/state':
+                    control._handle(self, 'state', {})
+                elif self.path.rstrip('/') == '/actions':
+                    self._reply(200, {'actions': list(ACTIONS)})
+                else:
+                    self._reply(404, {'error': f"Caminho desconhecido: {self.path}"})
+
+            def do_POST(self):
+                prefix = '/actions/'
+                if not self.path.startswith(prefix):
+                    self._reply(404, {'error': f"Caminho desconhecido: {self.path}"})
+                    return
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    params = json.loads(self.rfile.read(length) or b'{}') if length else {}
+                    if not isinstance(params, dict):
+                        raise ValueError("o corpo deve ser um objeto JSON")
+                except ValueError as e:
+                    self._reply(400, {'error': f"JSON inválido: {e}"})
+                    return
+                control._handle(self, self.path[len(prefix):].strip('/'), params)
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass  # Silencia o log padrão do http.server
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handle(self, request, action, params):
+        """Roda na thread da requisição: enfileira e espera o laço principal aplicar"""
+        self.stats['requests'] += 1
+        if action not in ACTIONS:
+            request._reply(404, {'error': f"Ação desconhecida: {action}"})
+            return
+        command = {'action': action, 'params': params, 'done': threading.Event(), 'status': 200, 'result': None}
+        self._commands.put(command)
+        if not command['done'].wait(self.reply_timeout):
+            self.stats['timeouts'] += 1
+            request._reply(504, {'error': "O laço principal não respondeu (câmera parada?)"})
+            return
+        request._reply(command['status'], command['result'])
+
+    def process(self, detector, logger, control):
+        """Aplica as ações pendentes; chamado pelo laço principal entre frames"""
+        while True:
+            try:
+                command = self._commands.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                command['result'] = apply_control(command['action'], detector, logger, command['params'], control)
+                self.stats['applied'] += 1
+            except ValueError as e:
+                command['status'], command['result'] = 400, {'error': str(e)}
+                self.stats['errors'] += 1
+            except Exception as e:
+                # Erro inesperado não pode derrubar o laço principal nem deixar a requisição esperando
+                print(f"[ERRO] Falha ao aplicar '{command['action']}': {e}")
+                command['status'], command['result'] = 500, {'error': str(e)}
+                self.stats['errors'] += 1
+            finally:
+                command['done'].set()
+
+    def _serve(self):
+        pin_io_thread()  # As threads das requisições herdam a afinidade de E/S
+        self.server.serve_forever()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -3,12 +3,16 @@ import requests
 import threading
 import time
 from datetime import datetime
-from collections import defaultdict
-from config import EXPECTED_CUBE_TIME, EXPECTED_GROUP_TIME, TOLERANCE
+from collections import defaultdict, deque
+from config import EXPECTED_CUBE_TIME, EXPECTED_GROUP_TIME, TOLERANCE, API_BASE_URL, HISTORY_DIR, HISTORY_HOT_WINDOW
+from event_bus import CUBE_EXITED
+from group_assembler import GroupAssembler, DEFAULT_FLOW
+from history_store import HistoryStore
+from resources import pin_io_thread
 
 class CubeTimeLogger:
-    def __init__(self):
-        """Inicializa o logger de tempos dos cubos"""
+    def __init__(self, history_dir=HISTORY_DIR):
+        """Inicializa o logger de tempos dos cubos (history_dir=None não grava histórico em disco)"""
         # Mapeamento de cores para faces do cubo mágico
         self.color_mapping = {
             'white': 'Frente',
@@ -19,10 +23,15 @@ class CubeTimeLogger:
             'green': 'Esquerda'
         }
         
-        # Sistema de grupos de 3 cubos
-        self.current_group = []  # Grupo atual sendo formado
+        # Sistema de grupos de 3 cubos - vários grupos abertos por fluxo (estação/câmera)
+        self.assembler = GroupAssembler(on_expired=lambda group: self._report_abandoned(group, 'timeout'))
+        self.abandoned_groups = deque(maxlen=100)  # Grupos parciais expirados/descartados
         self.group_number = 1
-        self.all_groups = []  # Todos os grupos finalizados
+        self.all_groups = deque(maxlen=HISTORY_HOT_WINDOW)  # Últimos grupos finalizados
+        self.totals = {'groups': 0, 'cubes': 0, 'time': 0.0}
+        
+        # Histórico completo em disco, com consultas agregadas (ver history_store.py)
+        self.history = HistoryStore(history_dir, face_names=self.color_mapping) if history_dir else None
         
         # Logs removidos - não são mais necessários
         
@@ -34,145 +43,234 @@ class CubeTimeLogger:
         
         # Configuração para envio de API
         self.enable_api_send = True  # Mude para False para desabilitar envio
+        self.api_url = f"{API_BASE_URL}/groups"
+        self.api_timeout = 2
+        
+        # Tempos esperados (podem ser trocados em tempo de execução via apply_config)
+        self.expected_cube_time = EXPECTED_CUBE_TIME
+        self.expected_group_time = EXPECTED_GROUP_TIME
+        self.tolerance = TOLERANCE
+        
+        # Callback opcional chamado ao fim de cada envio: (sucesso, status, latência em s)
+        self.on_send_complete = None
+        self.send_stats = {'sent': 0, 'failed': 0}
+        self._stats_lock = threading.Lock()
+        # Finalização de grupos roda na thread do barramento e no laço principal (tecla f, API, expiração)
+        self._lock = threading.RLock()
     
     def send_to_api_async(self, payload):
         """Envia dados para API de forma assíncrona ultra-rápida"""
         def send_request():
+            pin_io_thread()  # Envio roda nos núcleos de E/S, fora dos núcleos de detecção
+            start = time.perf_counter()
+            success = False
+            status = None
             try:
                 # Timeout reduzido para 2 segundos (mais rápido)
-                response = requests.post("http://127.0.0.1:8000/api/groups", 
+                response = requests.post(self.api_url, 
                                        json=payload, 
-                                       timeout=2,  # Timeout reduzido
+                                       timeout=self.api_timeout,  # Timeout reduzido
                                        headers={'Content-Type': 'application/json'})
+                status = response.status_code
                 if response.status_code == 201:
+                    success = True
                     print("✅ Grupo enviado com sucesso para a API!")
                 else:
                     print(f"❌ Falha ao enviar grupo: {response.status_code}")
             except requests.exceptions.Timeout:
-                print("⏰ Timeout ao enviar grupo para API (2s)")
+                status = 'timeout'
+                print(f"⏰ Timeout ao enviar grupo para API ({self.api_timeout}s)")
             except requests.exceptions.ConnectionError:
+                status = 'connection_error'
                 print("🔌 Erro de conexão com API - Laravel pode estar offline")
             except Exception as e:
+                status = 'error'
                 print(f"❌ Erro ao enviar grupo para API: {e}")
             finally:
                 self.is_sending = False
+                with self._stats_lock:
+                    self.send_stats['sent' if success else 'failed'] += 1
+                if self.on_send_complete:
+                    self.on_send_complete(success, status, time.perf_counter() - start)
         
         # Executa em thread separada para não travar a câmera
         thread = threading.Thread(target=send_request, daemon=True)
         thread.start()
     
-    def add_cube(self, color, individual_time):
-        """Adiciona um cubo ao grupo atual (apenas se a cor não existir no grupo)"""
+    @property
+    def current_group(self):
+        """Cubos do grupo aberto mais antigo do fluxo padrão (o que aparece no overlay)"""
+        group = self.assembler.oldest_open(DEFAULT_FLOW)
+        return group.cubes if group else []
+    
+    def add_cube(self, color, individual_time, flow=DEFAULT_FLOW, now=None):
+        """Adiciona um cubo a um grupo aberto do fluxo (estação/câmera)
+
+        O cubo entra no grupo mais antigo do fluxo que ainda não tem a cor; se a
+        cor já existe em todos, ele abre o próximo grupo em vez de ser descartado.
+        """
         face_name = self.color_mapping.get(color, 'Desconhecida')
         
-        # Verifica se a cor já existe no grupo atual
-        existing_colors = [cube['color'] for cube in self.current_group]
-        if color in existing_colors:
-            return
-        
         cube_data = {
             'color': color,
             'face_name': face_name,
             'individual_time': individual_time,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': datetime.now().isoformat(),
+            'flow': flow
         }
         
-        self.current_group.append(cube_data)
-        
         # Verifica se completou um grupo de 3 cores diferentes
-        if len(self.current_group) == 3:
-            self.finalize_group()
+        with self._lock:
+            group = self.assembler.add(cube_data, flow, now)
+            if group is not None:
+                self.finalize_group(group.cubes)
     
-    def finalize_group(self):
-        """Finaliza um grupo de 3 cubos com cores diferentes e calcula o tempo total"""
-        # VALIDAÇÃO RIGOROSA: Só processa se tiver exatamente 3 cubos diferentes
-        if len(self.current_group) != 3:
-            print(f"⚠️ Grupo incompleto: {len(self.current_group)}/3 cubos")
-            return
+    def handle_event(self, event):
+        """Assinante do barramento do detector (roda na thread do assinante, fora do laço da câmera)"""
+        if event.kind == CUBE_EXITED:
+            self.add_cube(event.color, event.data['total_time'], now=event.timestamp)
+    
+    def finalize_group(self, cubes=None):
+        """Finaliza um grupo de 3 cubos com cores diferentes e calcula o tempo total
 
-        colors = [cube['color'] for cube in self.current_group]
-        if len(set(colors)) != 3:
-            print(f"⚠️ Cores duplicadas detectadas: {colors}")
-            return
+        Sem `cubes`, usa o grupo aberto mais antigo do fluxo padrão.
+        """
+        with self._lock:
+            if cubes is None:
+                cubes = self.current_group
+        
+            # VALIDAÇÃO RIGOROSA: Só processa se tiver exatamente 3 cubos diferentes
+            if len(cubes) != 3:
+                print(f"⚠️ Grupo incompleto: {len(cubes)}/3 cubos")
+                return
+
+            colors = [cube['color'] for cube in cubes]
+            if len(set(colors)) != 3:
+                print(f"⚠️ Cores duplicadas detectadas: {colors}")
+                return
 
-        # Calcula tempo total do grupo
-        group_total_time = sum(cube['individual_time'] for cube in self.current_group)
+            # Calcula tempo total do grupo
+            group_total_time = sum(cube['individual_time'] for cube in cubes)
         
-        print(f"🎯 GRUPO COMPLETO! Tempo total: {group_total_time:.2f}s")
-        cubes_info = [f"{c['color']}({c['individual_time']:.1f}s)" for c in self.current_group]
-        print(f"   Cubos: {cubes_info}")
+            print(f"🎯 GRUPO COMPLETO! Tempo total: {group_total_time:.2f}s")
+            cubes_info = [f"{c['color']}({c['individual_time']:.1f}s)" for c in cubes]
+            print(f"   Cubos: {cubes_info}")
 
-        group_data = {
-            'group_number': self.group_number,
-            'cubes': self.current_group.copy(),
-            'total_group_time': group_total_time,
-            'timestamp': datetime.now().isoformat()
-        }
+            group_data = {
+                'group_number': self.group_number,
+                'cubes': list(cubes),
+                'total_group_time': group_total_time,
+                'timestamp': datetime.now().isoformat()
+            }
 
-        self.all_groups.append(group_data)
-        # Logs removidos - não são mais necessários
-        self.analyze_delays()
+            self.all_groups.append(group_data)
+            self.totals['groups'] += 1
+            self.totals['cubes'] += len(cubes)
+            self.totals['time'] += group_total_time
+            if self.history is not None:
+                self.history.append_group(cubes, group_total_time)
+            # Logs removidos - não são mais necessários
+            self.analyze_delays()
 
-        # ------------------------------
-        # VALIDAÇÃO E ENVIO PARA API (ASSÍNCRONO)
-        # ------------------------------
+            # ------------------------------
+            # VALIDAÇÃO E ENVIO PARA API (ASSÍNCRONO)
+            # ------------------------------
         
-        # VALIDAÇÃO FINAL: Garante que temos exatamente 3 cubos válidos
-        if len(self.current_group) != 3:
-            print("❌ ERRO: Grupo não tem 3 cubos!")
-            return
+            # VALIDAÇÃO FINAL: Garante que temos exatamente 3 cubos válidos
+            if len(cubes) != 3:
+                print("❌ ERRO: Grupo não tem 3 cubos!")
+                return
             
-        # Valida cada cubo individualmente
-        valid_cubes = []
-        for cube in self.current_group:
-            if (cube.get('color') and 
-                cube.get('face_name') and 
-                cube.get('individual_time', 0) > 0):
-                valid_cubes.append(cube)
+            # Valida cada cubo individualmente
+            valid_cubes = []
+            for cube in cubes:
+                if (cube.get('color') and 
+                    cube.get('face_name') and 
+                    cube.get('individual_time', 0) > 0):
+                    valid_cubes.append(cube)
         
-        if len(valid_cubes) != 3:
-            print(f"❌ ERRO: Apenas {len(valid_cubes)}/3 cubos válidos!")
-            return
+            if len(valid_cubes) != 3:
+                print(f"❌ ERRO: Apenas {len(valid_cubes)}/3 cubos válidos!")
+                return
         
-        # Monta payload com validação
-        payload = {
-            "group_time": group_total_time,
-            "cubes": [
-                {
-                    "color": cube["color"].upper(),
-                    "face": cube["face_name"],
-                    "individual_time": cube["individual_time"]
-                } for cube in valid_cubes
-            ]
-        }
+            # Monta payload com validação
+            payload = {
+                "group_time": group_total_time,
+                "cubes": [
+                    {
+                        "color": cube["color"].upper(),
+                        "face": cube["face_name"],
+                        "individual_time": cube["individual_time"]
+                    } for cube in valid_cubes
+                ]
+            }
         
-        print(f"📤 Enviando grupo #{self.group_number} para API...")
-        print(f"   Tempo total: {group_total_time:.2f}s")
+            print(f"📤 Enviando grupo #{self.group_number} para API...")
+            print(f"   Tempo total: {group_total_time:.2f}s")
 
-        # Envia de forma assíncrona para não travar a câmera (se habilitado)
-        if self.enable_api_send:
-            self.send_to_api_async(payload)
-        else:
-            print("📝 Envio para API desabilitado - dados salvos apenas localmente")
+            # Envia de forma assíncrona para não travar a câmera (se habilitado)
+            if self.enable_api_send:
+                self.send_to_api_async(payload)
+            else:
+                print("📝 Envio para API desabilitado - dados salvos apenas localmente")
 
-        self.current_group = []
-        self.group_number += 1
+            self.group_number += 1
     
     
     def get_current_group_info(self):
         """Retorna informações do grupo atual"""
-        existing_colors = [cube['color'] for cube in self.current_group]
+        current_group = list(self.current_group)
+        existing_colors = [cube['color'] for cube in current_group]
         return {
-            'current_group_size': len(self.current_group),
-            'current_group': self.current_group.copy(),
+            'current_group_size': len(current_group),
+            'current_group': current_group,
             'current_colors': existing_colors,
-            'total_groups': len(self.all_groups)
+            'total_groups': self.totals['groups'],
+            'open_groups': len(self.assembler.open_groups())
         }
     
-    def force_finalize_group(self):
-        """Força a finalização do grupo atual (mesmo que não tenha 3 cubos)"""
-        if self.current_group:
+    def force_finalize_group(self, discard_incomplete=False):
+        """Força a finalização do grupo atual
+
+        Um grupo incompleto é recusado por finalize_group e continua aberto; com
+        `discard_incomplete` ele é descartado e reportado em abandoned_groups.
+        """
+        with self._lock:
+            group = self.assembler.oldest_open(DEFAULT_FLOW)
+            if group is None:
+                return
             self.finalize_group()
+            if discard_incomplete and not group.is_complete():
+                self.assembler.abandon(group)
+                self._report_abandoned(group, 'manual')
+    
+    def expire_groups(self, now=None):
+        """Expira grupos parciais abandonados (chamado pelo laço principal)"""
+        with self._lock:
+            return self.assembler.expire(now)
+    
+    def _report_abandoned(self, group, reason):
+        """Registra um grupo parcial que não vai ser enviado"""
+        self.abandoned_groups.append({
+            'flow': group.flow,
+            'reason': reason,
+            'cubes': list(group.cubes),
+            'created_at': group.created_at,
+            'updated_at': group.updated_at
+        })
+        print(f"🗑️ Grupo parcial descartado ({reason}) no fluxo {group.flow}: {group.colors}")
+    
+    def apply_config(self, cfg):
+        """Aplica uma versão da configuração em tempo de execução (ver runtime_config.py)"""
+        self.expected_cube_time = cfg['EXPECTED_CUBE_TIME']
+        self.expected_group_time = cfg['EXPECTED_GROUP_TIME']
+        self.tolerance = cfg['TOLERANCE']
+        self.api_url = f"{cfg['API_BASE_URL']}/groups"
+    
+    def close(self):
+        """Grava em disco o que estiver pendente no histórico"""
+        if self.history is not None:
+            self.history.flush()
     
     def toggle_api_send(self):
         """Alterna o envio para API (útil para debug)"""
@@ -182,14 +280,12 @@ class CubeTimeLogger:
     
     def get_summary(self):
         """Retorna um resumo dos dados"""
-        total_cubes = sum(len(group['cubes']) for group in self.all_groups)
-        total_time = sum(group['total_group_time'] for group in self.all_groups)
-        
         return {
-            'total_groups': len(self.all_groups),
-            'total_cubes': total_cubes,
-            'total_time': total_time,
-            'current_group_size': len(self.current_group)
+            'total_groups': self.totals['groups'],
+            'total_cubes': self.totals['cubes'],
+            'total_time': self.totals['time'],
+            'current_group_size': len(self.current_group),
+            'assembler': self.assembler.get_stats()
         }
 
 # Função para usar o logger no webcam_detect_adaptive.py
@@ -207,10 +303,10 @@ class CubeTimeLogger:
         if not self.all_groups:
             return
 
-        # Usa constantes do arquivo de configuração
-        expected_cube_time = EXPECTED_CUBE_TIME
-        expected_group_time = EXPECTED_GROUP_TIME
-        tolerance = TOLERANCE
+        # Usa os tempos da configuração atual (config.py ou perfil da estação)
+        expected_cube_time = self.expected_cube_time
+        expected_group_time = self.expected_group_time
+        tolerance = self.tolerance
 
         last_group = self.all_groups[-1]
         total_time = last_group["total_group_time"]
@@ -258,9 +354,9 @@ class CubeTimeLogger:
 
         print("=" * 50)
 
-def create_logger():
+def create_logger(history_dir=HISTORY_DIR):
     """Cria uma instância do logger para usar no detector principal"""
-    return CubeTimeLogger()
+    return CubeTimeLogger(history_dir)
 
 # Exemplo de uso no webcam_detect_adaptive.py:
 """
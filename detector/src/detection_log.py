@@ -0,0 +1,145 @@
+"""
+Gravação binária das detecções de cada frame (para replay sem modelo e sem câmera)
+
+Formato (little-endian):
+
+    cabeçalho: magic "CUBEDET1", versão (u16), flags (u16), lado do recorte (u16), reservado (u16)
+    por frame: timestamp (f64), quantidade de detecções (u16), flags do frame (u8),
+               quantidade de resultados de presença (u8)
+    por detecção: x1, y1, x2, y2 (i16), confiança do YOLO (f32), cor (u8), confiança da cor (f32)
+                  [+ recorte BGR lado x lado x 3 (u8) se FLAG_CROPS]
+    por resultado de presença: cor (u8), resultado (i8: 1 ocupado, 0 vazio, -1 sem conclusão)
+
+A cor gravada é a que o tracker classificou no frame. FRAME_INFERENCE marca os
+frames em que o YOLO rodou (YOLO_SKIP_FRAMES pula alguns) e os resultados de
+presença são os do teste na última caixa de cada cubo não detectado (ver
+presence.py): o replay não tem a imagem, então repete esses resultados em vez
+de recalculá-los. Gravações da versão 1 não têm nenhum dos dois (todo frame
+com inferência, presença desligada). Com --record-crops cada
+detecção também leva um recorte pequeno da caixa, e o replay pode reclassificar
+a cor (ex.: para testar novos ranges HSV) sem a imagem original.
+"""
+import struct
+
+import cv2
+import numpy as np
+
+from config import RECORD_CROP_SIZE
+from history_store import COLORS, COLOR_IDS, UNKNOWN_COLOR_ID
+
+MAGIC = b"CUBEDET1"
+VERSION = 2
+FLAG_CROPS = 1
+FRAME_INFERENCE = 1
+
+HEADER = struct.Struct('<8sHHHH')
+FRAME = struct.Struct('<dHBB')
+FRAME_V1 = struct.Struct('<dH')
+DETECTION = struct.Struct('<4hfBf')
+PRESENCE = struct.Struct('<Bb')
+
+# Resultado do teste de presença <-> valor gravado
+PRESENCE_CODES = {True: 1, False: 0, None: -1}
+PRESENCE_VALUES = {code: value for value, code in PRESENCE_CODES.items()}
+
+
+class DetectionRecorder:
+    """Grava as detecções pós-inferência de cada frame num arquivo binário"""
+
+    def __init__(self, path, crops=False, crop_size=RECORD_CROP_SIZE):
+        self.path = path
+        self.crops = crops
+        self.crop_size = crop_size
+        self.frames = 0
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, FLAG_CROPS if crops else 0, crop_size, 0))
+
+    def write_frame(self, timestamp, detections, inference=True, presence=None):
+        """Grava um frame; cada detecção precisa de 'bbox', 'confidence' e 'color'/'color_conf'
+
+        `presence` é {cor: True/False/None} com os testes de presença do frame.
+        """
+        presence = presence or {}
+        parts = [FRAME.pack(timestamp, len(detections), FRAME_INFERENCE if inference else 0, len(presence))]
+        for detection in detections:
+            x1, y1, x2, y2 = detection['bbox']
+            color_id = COLOR_IDS.get(detection.get('color'), UNKNOWN_COLOR_ID)
+            parts.append(DETECTION.pack(x1, y1, x2, y2, detection['confidence'],
+                                        color_id, detection.get('color_conf', 0.0)))
+            if self.crops:
+                parts.append(self._crop(detection.get('frame'), detection['bbox']))
+        for color, result in presence.items():
+            parts.append(PRESENCE.pack(COLOR_IDS.get(color, UNKNOWN_COLOR_ID), PRESENCE_CODES[result]))
+        self._file.write(b''.join(parts))
+        self.frames += 1
+
+    def _crop(self, frame, bbox):
+        size = self.crop_size
+        x1, y1, x2, y2 = bbox
+        roi = frame[max(0, y1):y2, max(0, x1):x2] if frame is not None else None
+        if roi is None or roi.size == 0:
+            return bytes(size * size * 3)
+        return cv2.resize(roi, (size, size), interpolation=cv2.INTER_AREA).tobytes()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_detection_log(path):
+    """Lê uma gravação inteira: retorna [(timestamp, [detecção, ...], inferência, presença), ...]
+
+    As detecções vêm sem frame; trazem 'color'/'color_conf' gravados e, se a
+    gravação tiver recortes, 'crop' (array BGR) para reclassificar a cor.
+    `presença` é {cor: True/False/None}, ou None nas gravações da versão 1.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    magic, version, flags, crop_size, _ = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: não é uma gravação de detecções")
+    if version not in (1, VERSION):
+        raise ValueError(f"{path}: versão {version} não suportada")
+    crop_bytes = crop_size * crop_size * 3 if flags & FLAG_CROPS else 0
+    frame_header = FRAME if version == VERSION else FRAME_V1
+
+    frames = []
+    offset = HEADER.size
+    while offset + frame_header.size <= len(data):
+        if version == VERSION:
+            timestamp, count, frame_flags, n_presence = FRAME.unpack_from(data, offset)
+        else:
+            (timestamp, count), frame_flags, n_presence = FRAME_V1.unpack_from(data, offset), FRAME_INFERENCE, 0
+        offset += frame_header.size
+        if offset + count * (DETECTION.size + crop_bytes) + n_presence * PRESENCE.size > len(data):
+            break  # Último frame incompleto (gravação interrompida)
+        detections = []
+        for _ in range(count):
+            x1, y1, x2, y2, confidence, color_id, color_conf = DETECTION.unpack_from(data, offset)
+            offset += DETECTION.size
+            detection = {
+                'bbox': (x1, y1, x2, y2),
+                'confidence': confidence,
+                'frame': None,
+                'color': COLORS[color_id] if color_id < len(COLORS) else 'unknown',
+                'color_conf': color_conf
+            }
+            if crop_bytes:
+                detection['crop'] = np.frombuffer(data, np.uint8, crop_bytes, offset).reshape(crop_size, crop_size, 3)
+                offset += crop_bytes
+            detections.append(detection)
+        presence = None
+        if version == VERSION:
+            presence = {}
+            for _ in range(n_presence):
+                color_id, code = PRESENCE.unpack_from(data, offset)
+                offset += PRESENCE.size
+                presence[COLORS[color_id] if color_id < len(COLORS) else 'unknown'] = PRESENCE_VALUES[code]
+        frames.append((timestamp, detections, bool(frame_flags & FRAME_INFERENCE), presence))
+    return frames
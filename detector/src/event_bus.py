@@ -0,0 +1,267 @@
+"""
+Barramento de eventos do tracker com assinantes assíncronos
+
+O CubeDetector publica o que acontece com cada cor (candidato iniciado,
+confirmado, perdido, cubo saído, cooldown) e não chama mais ninguém
+diretamente. Cada assinante tem a sua fila limitada e roda numa thread própria
+(ou numa task asyncio), então o laço da câmera paga só o enfileiramento:
+montagem de grupos, análise de atrasos, envio para API, métricas ou alertas
+rodam fora dele.
+
+Fila cheia segue a política do assinante:
+- "drop": o evento novo é descartado e contado (métricas, alertas)
+- "block": o publicador espera até `block_timeout`; se a fila continuar cheia
+  o evento é descartado e contado (logger, que não deve perder cubos)
+
+Uso:
+    bus = EventBus()
+    bus.subscribe('logger', logger.handle_event, kinds=(CUBE_EXITED,), policy='block')
+    bus.publish(CUBE_EXITED, 'red', current_time, total_time=4.2)
+    bus.close()  # entrega o que estiver pendente e encerra as threads
+"""
+import asyncio
+import concurrent.futures
+import queue
+import threading
+from collections import namedtuple
+
+from config import EVENT_QUEUE_SIZE, EVENT_OVERFLOW_POLICY, EVENT_BLOCK_TIMEOUT
+
+# Tipos de evento publicados pelo CubeDetector
+CANDIDATE_STARTED = 'candidate_started'  # Cor vista pela primeira vez (início do debounce)
+CUBE_CONFIRMED = 'cube_confirmed'        # Cor confirmada: cubo ativo. data: id, entry_time
+CANDIDATE_LOST = 'candidate_lost'        # Candidato descartado antes de confirmar. data: reason
+CUBE_EXITED = 'cube_exited'              # Cubo saiu. data: id, entry_time, last_seen, total_time
+COOLDOWN_STARTED = 'cooldown_started'    # Cor ignorada até data['until']
+
+EVENT_KINDS = (CANDIDATE_STARTED, CUBE_CONFIRMED, CANDIDATE_LOST, CUBE_EXITED, COOLDOWN_STARTED)
+POLICIES = ('drop', 'block')
+
+Event = namedtuple('Event', ['kind', 'color', 'timestamp', 'data'])
+
+_STOP = object()
+
+
+class Subscription:
+    """Fila limitada + thread que entrega os eventos a um handler"""
+
+    def __init__(self, name, handler, kinds=None, maxsize=EVENT_QUEUE_SIZE,
+                 policy=EVENT_OVERFLOW_POLICY, block_timeout=EVENT_BLOCK_TIMEOUT):
+        if policy not in POLICIES:
+            raise ValueError(f"Política de fila inválida: {policy} (use {', '.join(POLICIES)})")
+        self.name = name
+        self.handler = handler
+        self.kinds = frozenset(kinds) if kinds else None
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.stats = {'delivered': 0, 'dropped': 0, 'blocked': 0, 'errors': 0, 'max_depth': 0}
+        self._queue = queue.Queue(maxsize)
+        self._thread = threading.Thread(target=self._run, name=f"eventos-{name}", daemon=True)
+        self._thread.start()
+
+    def wants(self, kind):
+        return self.kinds is None or kind in self.kinds
+
+    def offer(self, event):
+        """Enfileira sem bloquear o publicador além do que a política permite"""
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            if self.policy == 'drop':
+                self.stats['dropped'] += 1
+                return False
+            self.stats['blocked'] += 1
+            try:
+                self._queue.put(event, timeout=self.block_timeout)
+            except queue.Full:
+                self.stats['dropped'] += 1
+                return False
+        depth = self._queue.qsize()
+        if depth > self.stats['max_depth']:
+            self.stats['max_depth'] = depth
+        return True
+
+    def _run(self):
+        while True:
+            event = self._queue.get()
+            try:
+                if event is _STOP:
+                    return
+                self.handler(event)
+                self.stats['delivered'] += 1
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"[WARN] Assinante '{self.name}' falhou em {event.kind}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def drain(self, timeout=None):
+        """Espera a fila esvaziar; retorna False se o tempo acabar antes"""
+        done = self._queue.all_tasks_done
+        with done:
+            while self._queue.unfinished_tasks:
+                if not done.wait(timeout):
+                    return False
+        return True
+
+    def close(self, timeout=5.0):
+        """Entrega o que estiver pendente e encerra a thread"""
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+
+class AsyncSubscription:
+    """Assinante asyncio: o handler é uma corrotina executada numa task do loop dado"""
+
+    def __init__(self, name, handler, loop, kinds=None, maxsize=EVENT_QUEUE_SIZE,
+                 policy=EVENT_OVERFLOW_POLICY, block_timeout=EVENT_BLOCK_TIMEOUT):
+        if policy not in POLICIES:
+            raise ValueError(f"Política de fila inválida: {policy} (use {', '.join(POLICIES)})")
+        self.name = name
+        self.handler = handler
+        self.kinds = frozenset(kinds) if kinds else None
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.loop = loop
+        self.stats = {'delivered': 0, 'dropped': 0, 'blocked': 0, 'errors': 0, 'max_depth': 0}
+        self._queue = None
+        self._ready = threading.Event()
+        self._task = None
+        loop.call_soon_threadsafe(self._start, maxsize)
+
+    def _start(self, maxsize):
+        self._queue = asyncio.Queue(maxsize)
+        self._task = self.loop.create_task(self._run())
+        self._ready.set()
+
+    def wants(self, kind):
+        return self.kinds is None or kind in self.kinds
+
+    def _put_nowait(self, event):
+        """Roda no loop: enfileira ou conta o descarte"""
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.stats['dropped'] += 1
+            return
+        depth = self._queue.qsize()
+        if depth > self.stats['max_depth']:
+            self.stats['max_depth'] = depth
+
+    def offer(self, event):
+        self._ready.wait()
+        if self.policy == 'drop' or not self._queue.full():
+            self.loop.call_soon_threadsafe(self._put_nowait, event)
+            return True
+        self.stats['blocked'] += 1
+        future = asyncio.run_coroutine_threadsafe(self._queue.put(event), self.loop)
+        try:
+            future.result(self.block_timeout)
+            return True
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            self.stats['dropped'] += 1
+            return False
+
+    async def _run(self):
+        while True:
+            event = await self._queue.get()
+            try:
+                if event is _STOP:
+                    return
+                await self.handler(event)
+                self.stats['delivered'] += 1
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"[WARN] Assinante '{self.name}' falhou em {event.kind}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def pending(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def drain(self, timeout=None):
+        self._ready.wait()
+        future = asyncio.run_coroutine_threadsafe(self._queue.join(), self.loop)
+        try:
+            future.result(timeout)
+            return True
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            return False
+
+    def close(self, timeout=5.0):
+        self._ready.wait()
+        future = asyncio.run_coroutine_threadsafe(self._queue.put(_STOP), self.loop)
+        try:
+            future.result(timeout)
+            asyncio.run_coroutine_threadsafe(asyncio.wait([self._task], timeout=timeout), self.loop).result()
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+
+
+class EventBus:
+    """Distribui os eventos do tracker para as filas dos assinantes"""
+
+    def __init__(self):
+        self.subscriptions = []
+        self.published = 0
+
+    def subscribe(self, name, handler, kinds=None, maxsize=EVENT_QUEUE_SIZE,
+                  policy=EVENT_OVERFLOW_POLICY, block_timeout=EVENT_BLOCK_TIMEOUT):
+        """Registra um handler chamado numa thread própria; `kinds` filtra os tipos de evento"""
+        subscription = Subscription(name, handler, kinds, maxsize, policy, block_timeout)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def subscribe_async(self, name, handler, loop, kinds=None, maxsize=EVENT_QUEUE_SIZE,
+                        policy=EVENT_OVERFLOW_POLICY, block_timeout=EVENT_BLOCK_TIMEOUT):
+        """Registra uma corrotina executada como task no loop asyncio dado"""
+        subscription = AsyncSubscription(name, handler, loop, kinds, maxsize, policy, block_timeout)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscriptions.remove(subscription)
+        subscription.close()
+
+    def publish(self, kind, color, timestamp, **data):
+        """Publica um evento (chamado no laço da câmera: só enfileira)"""
+        if not self.subscriptions:
+            return
+        event = Event(kind, color, timestamp, data)
+        self.published += 1
+        for subscription in self.subscriptions:
+            if subscription.wants(kind):
+                subscription.offer(event)
+
+    def drain(self, timeout=None):
+        """Espera todos os assinantes processarem o que já foi publicado"""
+        return all(subscription.drain(timeout) for subscription in self.subscriptions)
+
+    def close(self):
+        """Entrega os eventos pendentes, encerra os assinantes e retorna as estatísticas finais"""
+        for subscription in self.subscriptions:
+            subscription.close()
+        stats = self.get_stats()
+        self.subscriptions = []
+        return stats
+
+    def get_stats(self):
+        return {
+            'published': self.published,
+            'subscribers': {
+                s.name: dict(s.stats, pending=s.pending(), policy=s.policy) for s in self.subscriptions
+            }
+        }
+
+
+def print_event_stats(stats):
+    """Resumo do barramento: entregas, descartes e esperas por assinante"""
+    print(f"[INFO] Eventos publicados: {stats['published']}")
+    for name, sub in stats['subscribers'].items():
+        print(f"   {name} ({sub['policy']}): {sub['delivered']} entregues | {sub['dropped']} descartados | "
+              f"{sub['blocked']} esperas | {sub['errors']} erros | fila máx. {sub['max_depth']}")
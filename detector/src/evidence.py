@@ -0,0 +1,166 @@
+"""
+Evidências dos cubos: recortes JPEG na confirmação e na saída
+
+Quando um tempo é contestado, a imagem mostra qual cubo gerou a entrada do
+histórico. No laço da câmera só é feita a cópia do recorte (alguns
+microssegundos); a codificação JPEG e a gravação rodam num pool de threads
+de E/S. Com a fila cheia o recorte é descartado e contado: uma rajada de
+cubos perde evidências, nunca frames.
+
+Cada evidência gera dois arquivos com o mesmo nome-base:
+    <captura>_<cubo>_<etapa>.jpg   recorte da caixa (+ margem)
+    <captura>_<cubo>_<etapa>.json  cubo, cor, etapa e timestamps (entrada, última detecção, captura)
+
+Etapas: "confirmed" (recorte do cubo no frame da confirmação) e "exit" (a
+região da última caixa no frame em que a saída foi confirmada, ou seja, o
+local já sem o cubo). O diretório é rotativo: ao passar de EVIDENCE_MAX_MB os
+arquivos mais antigos são apagados.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import cv2
+
+from config import (EVIDENCE_DIR, EVIDENCE_MAX_MB, EVIDENCE_WORKERS, EVIDENCE_QUEUE_SIZE,
+                    EVIDENCE_JPEG_QUALITY, EVIDENCE_MARGIN)
+from resources import pin_io_thread
+
+_STOP = object()
+
+
+class EvidenceStore:
+    """Fila limitada de recortes + threads que codificam e gravam com limite de espaço"""
+
+    def __init__(self, directory=EVIDENCE_DIR, max_mb=EVIDENCE_MAX_MB, workers=EVIDENCE_WORKERS,
+                 queue_size=EVIDENCE_QUEUE_SIZE, jpeg_quality=EVIDENCE_JPEG_QUALITY, margin=EVIDENCE_MARGIN):
+        self.directory = directory
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.jpeg_quality = jpeg_quality
+        self.margin = margin
+        self.stats = {'captured': 0, 'dropped': 0, 'written': 0, 'rotated': 0, 'errors': 0,
+                      'capture_time': 0.0, 'capture_max': 0.0, 'encode_time': 0.0}
+        self._queue = queue.Queue(queue_size)
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._files, self._bytes = self._scan()
+        self._workers = [threading.Thread(target=self._run, name=f"evidencias-{i}", daemon=True)
+                         for i in range(max(1, workers))]
+        for worker in self._workers:
+            worker.start()
+
+    def _scan(self):
+        """Arquivos já existentes, do mais antigo para o mais novo (o nome começa pela captura)"""
+        files = deque()
+        total = 0
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(('.jpg', '.json')):
+                path = os.path.join(self.directory, name)
+                size = os.path.getsize(path)
+                files.append((path, size))
+                total += size
+        return files, total
+
+    # ------------------------------
+    # LAÇO DA CÂMERA
+    # ------------------------------
+    def capture(self, frame, bbox, cube_id, color, stage, **timestamps):
+        """Copia o recorte e enfileira para gravação; retorna False se foi descartado"""
+        start = time.perf_counter()
+        x1, y1, x2, y2 = bbox
+        pad_x = int((x2 - x1) * self.margin)
+        pad_y = int((y2 - y1) * self.margin)
+        height, width = frame.shape[:2]
+        crop = frame[max(0, y1 - pad_y):min(height, y2 + pad_y), max(0, x1 - pad_x):min(width, x2 + pad_x)]
+        queued = crop.size > 0
+        if queued:
+            try:
+                self._queue.put_nowait((crop.copy(), cube_id, color, stage, timestamps, time.time()))
+                self.stats['captured'] += 1
+            except queue.Full:
+                self.stats['dropped'] += 1
+                queued = False
+        elapsed = time.perf_counter() - start
+        self.stats['capture_time'] += elapsed
+        if elapsed > self.stats['capture_max']:
+            self.stats['capture_max'] = elapsed
+        return queued
+
+    # ------------------------------
+    # THREADS DE GRAVAÇÃO
+    # ------------------------------
+    def _run(self):
+        pin_io_thread()
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            try:
+                self._write(*item)
+            except (OSError, cv2.error) as e:
+                self.stats['errors'] += 1
+                print(f"[WARN] Falha ao gravar evidência: {e}")
+
+    def _write(self, crop, cube_id, color, stage, timestamps, captured_at):
+        start = time.perf_counter()
+        ok, jpeg = cv2.imencode('.jpg', crop, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        encode_time = time.perf_counter() - start
+        if not ok:
+            raise OSError(f"codificação JPEG falhou para {cube_id}")
+
+        stamp = datetime.fromtimestamp(captured_at).strftime('%Y%m%d-%H%M%S.%f')[:-3]
+        base = os.path.join(self.directory, f"{stamp}_{cube_id}_{stage}")
+        metadata = json.dumps(dict(timestamps, cube_id=cube_id, color=color, stage=stage,
+                                   captured_at=captured_at)).encode('utf-8')
+        with open(base + '.jpg', 'wb') as f:
+            f.write(jpeg.tobytes())
+        with open(base + '.json', 'wb') as f:
+            f.write(metadata)
+        self._account([(base + '.jpg', len(jpeg)), (base + '.json', len(metadata))], encode_time)
+
+    def _account(self, new_files, encode_time):
+        """Registra os arquivos gravados e apaga os mais antigos acima do limite"""
+        with self._lock:
+            self.stats['written'] += 1
+            self.stats['encode_time'] += encode_time
+            for path, size in new_files:
+                self._files.append((path, size))
+                self._bytes += size
+            while self._bytes > self.max_bytes and len(self._files) > len(new_files):
+                path, size = self._files.popleft()
+                self._bytes -= size
+                try:
+                    os.remove(path)
+                    self.stats['rotated'] += 1
+                except OSError:
+                    pass
+
+    def close(self, timeout=5.0):
+        """Grava o que estiver na fila e encerra as threads"""
+        for _ in self._workers:
+            self._queue.put(_STOP)
+        for worker in self._workers:
+            worker.join(timeout)
+
+    def get_stats(self, frames=None):
+        """Contadores + custo no laço da câmera (total e, se `frames` for dado, por frame)"""
+        stats = dict(self.stats, pending=self._queue.qsize(), disk_mb=self._bytes / (1024 * 1024))
+        captures = stats['captured'] + stats['dropped']
+        stats['capture_avg_us'] = stats['capture_time'] / captures * 1e6 if captures else 0.0
+        stats['encode_avg_ms'] = stats['encode_time'] / stats['written'] * 1000 if stats['written'] else 0.0
+        if frames:
+            stats['overhead_us_per_frame'] = stats['capture_time'] / frames * 1e6
+        return stats
+
+
+def print_evidence_stats(stats):
+    print(f"[INFO] Evidências: {stats['written']} gravadas | {stats['dropped']} descartadas (fila cheia) | "
+          f"{stats['rotated']} arquivos rotacionados | {stats['disk_mb']:.1f}MB em disco")
+    overhead = stats.get('overhead_us_per_frame')
+    print(f"   custo no laço: {stats['capture_avg_us']:.1f}us/recorte (máx. {stats['capture_max'] * 1e6:.0f}us)"
+          f"{f' = {overhead:.2f}us/frame' if overhead is not None else ''} | "
+          f"JPEG {stats['encode_avg_ms']:.2f}ms/recorte nas threads de E/S")
@@ -0,0 +1,281 @@
+"""
+Avaliação da confirmação de saída: latência e erro do tempo individual
+
+Compara três configurações do tracker sobre as mesmas imagens:
+    base           saída só por MIN_EXIT_DURATION sem detecção (teste de presença desligado)
+    presenca       teste de presença na última caixa (presence.py)
+    presenca+skip  presença + YOLO_SKIP_FRAMES frames sem inferência
+
+Para cada cubo são medidos:
+    latência  confirmação da saída - saída real (quanto o tempo demora a ser fechado)
+    erro      tempo individual reportado - tempo real na cena
+e também cubos partidos em dois (saída falsa) e cubos perdidos.
+
+Imagens sintéticas (padrão): cena com textura e ruído de sensor, cubos entrando e
+saindo em instantes conhecidos e um detector falso com falhas e jitter de caixa:
+
+    python exit_eval.py --cubes 40 --fps 15 --miss-rate 0.1 --skip 2
+
+Gravação real: roda o modelo sobre o vídeo (timestamps do próprio vídeo). Sem
+--truth (lista JSON de {"color", "entry", "exit"} em segundos do vídeo) as
+configurações são comparadas com a base:
+
+    python exit_eval.py --video esteira.mp4 --model ../runs-cube/yolov8n-cube5/weights/best.pt [--truth esteira.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import random
+import time
+
+import cv2
+import numpy as np
+
+from event_bus import CUBE_EXITED
+from history_store import COLORS
+from webcam_detect_adaptive import CubeDetector, OVERLAY_COLORS
+
+# Distância máxima (s) entre a entrada reportada e a real para associar um cubo
+MATCH_WINDOW = 1.0
+
+CONFIGS = ('base', 'presenca', 'presenca+skip')
+
+
+def configure(detector, name, skip_frames):
+    if name == 'base':
+        detector.presence = None
+    detector.yolo_skip_frames = skip_frames if name == 'presenca+skip' else 0
+
+
+# ------------------------------
+# CENA SINTÉTICA
+# ------------------------------
+def make_scene(cubes, fps, seed, width=640, height=480):
+    """Linha do tempo com cubos um a um: [(cor, entrada, saída, (x, y, lado))]"""
+    rng = random.Random(seed)
+    timeline = []
+    t = rng.uniform(1.0, 2.0)  # Cena vazia no início (o fundo é aprendido)
+    for i in range(cubes):
+        size = rng.randint(80, 130)
+        x, y = rng.randint(40, width - size - 40), rng.randint(40, height - size - 40)
+        duration = round(rng.uniform(1.5, 5.0) * fps) / fps
+        timeline.append((COLORS[i % len(COLORS)], t, t + duration, (x, y, size)))
+        t += duration + round(rng.uniform(1.2, 2.5) * fps) / fps  # Passa do cooldown
+    return timeline, t + 1.0
+
+
+def synthetic_frames(timeline, end, fps, seed, miss_rate, burst_rate, width=640, height=480):
+    """Gera (timestamp, frame, detecções) com ruído de sensor, variação de luz e falhas do detector"""
+    rng = np.random.default_rng(seed)
+    ys, xs = np.mgrid[0:height, 0:width]
+    background = np.dstack([60 + 40 * xs / width, 70 + 30 * ys / height, 80 + 20 * (xs + ys) / (width + height)])
+    background = np.clip(background + rng.normal(0, 12, (height, width, 1)), 0, 255).astype(np.float32)
+    noise = [rng.normal(0, 3, (height, width, 3)).astype(np.float32) for _ in range(8)]
+    burst = 0
+
+    for index in range(int(end * fps)):
+        timestamp = index / fps
+        light = 4.0 * np.sin(timestamp / 7.0)
+        frame = np.clip(background + light + noise[index % len(noise)], 0, 255).astype(np.uint8)
+        detections = []
+        for color, entry, exit_time, (x, y, size) in timeline:
+            if not entry <= timestamp < exit_time:
+                continue
+            # Cubo com adesivos (grade escura) e tremor da mão
+            jx, jy = rng.integers(-2, 3, 2)
+            x1, y1 = x + jx, y + jy
+            cv2.rectangle(frame, (x1, y1), (x1 + size, y1 + size), OVERLAY_COLORS[color], -1)
+            for k in (1, 2):
+                cv2.line(frame, (x1 + k * size // 3, y1), (x1 + k * size // 3, y1 + size), (20, 20, 20), 3)
+                cv2.line(frame, (x1, y1 + k * size // 3), (x1 + size, y1 + k * size // 3), (20, 20, 20), 3)
+            # Detector falso: falhas isoladas, rajadas de falhas e jitter da caixa
+            if burst == 0 and rng.random() < burst_rate:
+                burst = int(rng.integers(3, 9))
+            if burst:
+                burst -= 1
+                continue
+            if rng.random() < miss_rate:
+                continue
+            bx1, by1, bx2, by2 = (int(v) for v in np.array([x1, y1, x1 + size, y1 + size]) + rng.integers(-4, 5, 4))
+            detections.append({'bbox': (bx1, by1, bx2, by2), 'confidence': 0.9, 'color': color, 'color_conf': 0.6})
+        yield timestamp, frame, detections
+
+
+def run_synthetic(name, args):
+    timeline, end = make_scene(args.cubes, args.fps, args.seed)
+    detector = CubeDetector(None)  # As detecções vêm do detector falso, com a cor já classificada
+    configure(detector, name, args.skip)
+    exits = []
+    detector.events.subscribe('avaliacao', exits.append, kinds=(CUBE_EXITED,), policy='block')
+
+    frames = 0
+    inferences = 0
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for timestamp, frame, detections in synthetic_frames(timeline, end, args.fps, args.seed,
+                                                             args.miss_rate, args.burst_rate):
+            if detector.should_skip_inference():
+                detector.update_tracking([], timestamp, frame, inference=False)
+            else:
+                inferences += 1
+                detector.update_tracking(detections, timestamp, frame)
+            detector.events.drain()
+            frames += 1
+        detector.events.close()
+    elapsed = time.perf_counter() - start
+    truth = [{'color': c, 'entry': entry, 'exit': exit_time} for c, entry, exit_time, _ in timeline]
+    return summarize(name, exits, truth, frames, inferences, elapsed, detector)
+
+
+# ------------------------------
+# GRAVAÇÃO REAL
+# ------------------------------
+def run_video(name, args, model):
+    capture = cv2.VideoCapture(args.video)
+    if not capture.isOpened():
+        raise SystemExit(f"[ERRO] Não foi possível abrir {args.video}")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    detector = CubeDetector(None, model=model)
+    configure(detector, name, args.skip)
+    exits = []
+    detector.events.subscribe('avaliacao', exits.append, kinds=(CUBE_EXITED,), policy='block')
+
+    frames = 0
+    inferences = 0
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        while True:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            timestamp = frames / fps
+            skipped = detector.exit_stats['skipped_inferences']
+            detector.detect_cubes(frame, timestamp)
+            inferences += detector.exit_stats['skipped_inferences'] == skipped
+            detector.events.drain()
+            frames += 1
+        detector.events.close()
+    capture.release()
+    elapsed = time.perf_counter() - start
+
+    truth = None
+    if args.truth:
+        with open(args.truth) as f:
+            truth = json.load(f)
+    return summarize(name, exits, truth, frames, inferences, elapsed, detector)
+
+
+# ------------------------------
+# MÉTRICAS
+# ------------------------------
+def match_exits(exits, truth):
+    """Associa cada cubo real à saída da mesma cor com entrada mais próxima"""
+    pending = list(exits)
+    matched = []
+    for cube in truth:
+        best = None
+        for event in pending:
+            if event.color != cube['color']:
+                continue
+            delta = abs(event.data['entry_time'] - cube['entry'])
+            if delta <= MATCH_WINDOW and (best is None or delta < abs(best.data['entry_time'] - cube['entry'])):
+                best = event
+        if best is not None:
+            pending.remove(best)
+        matched.append((cube, best))
+    return matched, pending
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else float('nan')
+
+
+def summarize(name, exits, truth, frames, inferences, elapsed, detector):
+    result = {
+        'name': name, 'frames': frames, 'inferences': inferences, 'elapsed': elapsed,
+        'exits': [(e.color, e.data['entry_time'], e.timestamp, e.data['total_time']) for e in exits],
+        'exit_stats': dict(detector.exit_stats),
+        # Sem referência: latência medida desde a última vez que o cubo foi visto
+        'tail': [e.timestamp - e.data['last_seen'] for e in exits],
+    }
+    if truth is not None:
+        matched, extra = match_exits(exits, truth)
+        found = [(cube, event) for cube, event in matched if event is not None]
+        result['latency'] = [event.timestamp - cube['exit'] for cube, event in found]
+        result['error'] = [event.data['total_time'] - (cube['exit'] - cube['entry']) for cube, event in found]
+        result['missed'] = len(matched) - len(found)
+        result['split'] = len(extra)
+        result['truth'] = len(truth)
+    return result
+
+
+def print_report(results):
+    print(f"\n{'config':<15}{'cubos':>7}{'partidos':>10}{'perdidos':>10}"
+          f"{'latência p50/p95 (ms)':>24}{'erro médio/|p95| (ms)':>24}{'inferências':>13}")
+    for r in results:
+        if 'latency' in r:
+            latency = f"{percentile(r['latency'], 50) * 1000:.0f} / {percentile(r['latency'], 95) * 1000:.0f}"
+            errors = r['error']
+            error = (f"{np.mean(errors) * 1000:+.0f} / {percentile(np.abs(errors).tolist(), 95) * 1000:.0f}"
+                     if errors else "-")
+            cubes = f"{r['truth'] - r['missed']}/{r['truth']}"
+            split, missed = r['split'], r['missed']
+        else:
+            latency = f"{percentile(r['tail'], 50) * 1000:.0f} / {percentile(r['tail'], 95) * 1000:.0f}"
+            error, cubes, split, missed = "-", str(len(r['exits'])), "-", "-"
+        print(f"{r['name']:<15}{cubes:>7}{split:>10}{missed:>10}{latency:>24}{error:>24}"
+              f"{r['inferences']:>7}/{r['frames']:<5}")
+    for r in results:
+        stats = r['exit_stats']
+        print(f"   {r['name']}: {stats['presence_exits']} saídas por região vazia, {stats['frame_exits']} por "
+              f"frames sem detecção, {stats['presence_holds']} frames mantidos pela presença "
+              f"| {r['elapsed'] * 1000 / max(1, r['frames']):.2f}ms/frame")
+
+
+def compare_with_base(results):
+    """Sem referência: diferença de tempo individual de cada cubo em relação à base"""
+    base = results[0]['exits']
+    for r in results[1:]:
+        deltas = []
+        for color, entry, _, total in r['exits']:
+            same = [b for b in base if b[0] == color and abs(b[1] - entry) <= MATCH_WINDOW]
+            if same:
+                deltas.append(total - same[0][3])
+        if deltas:
+            print(f"   {r['name']} vs base: {len(deltas)} cubos em comum, tempo individual "
+                  f"{np.mean(deltas) * 1000:+.0f}ms em média (máx. {np.max(np.abs(deltas)) * 1000:.0f}ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latência de saída e erro de tempo por configuração")
+    parser.add_argument('--video', help="gravação real (sem isso usa a cena sintética)")
+    parser.add_argument('--model', help="pesos do YOLO para --video")
+    parser.add_argument('--truth', help="JSON com os cubos reais do vídeo: [{color, entry, exit}]")
+    parser.add_argument('--skip', type=int, default=2, help="YOLO_SKIP_FRAMES da configuração presenca+skip")
+    parser.add_argument('--cubes', type=int, default=40, help="cubos na cena sintética")
+    parser.add_argument('--fps', type=float, default=15.0, help="taxa de frames da cena sintética")
+    parser.add_argument('--miss-rate', type=float, default=0.1, help="falhas isoladas do detector falso")
+    parser.add_argument('--burst-rate', type=float, default=0.02, help="início de rajadas de 3-8 falhas")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.video:
+        if not args.model:
+            parser.error("--video exige --model")
+        from startup import load_model
+        model = load_model(args.model)
+        results = [run_video(name, args, model) for name in CONFIGS]
+        print(f"[INFO] {args.video}: {results[0]['frames']} frames")
+    else:
+        results = [run_synthetic(name, args) for name in CONFIGS]
+        print(f"[INFO] Cena sintética: {args.cubes} cubos a {args.fps:.0f}fps, falhas {args.miss_rate:.0%} "
+              f"+ rajadas {args.burst_rate:.0%}/frame")
+
+    print_report(results)
+    if not args.video or not args.truth:
+        compare_with_base(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,412 @@
+"""
+Barramento de frames em memória compartilhada (sem cópias entre processos)
+
+Um anel de slots fixos sobre multiprocessing.shared_memory:
+- a captura escreve cada frame uma única vez num slot (direto do cap.read)
+- inferência, classificação de cor e exibição leem views NumPy do mesmo buffer
+- as mensagens entre processos levam apenas (slot, seq) e as caixas detectadas
+
+Cada slot tem um número de sequência: enquanto o frame é escrito o slot fica
+marcado como -1, e um leitor confere o seq antes (e, se quiser, depois) de usar
+a view para saber se o frame não foi sobrescrito. Cada leitor registrado tem um
+índice de leitura no cabeçalho, usado pelo escritor para contar atropelamentos.
+
+Uso:
+    python frame_bus.py            # captura, inferência, tracking e exibição em processos separados
+"""
+import multiprocessing as mp
+import os
+import queue
+import time
+from multiprocessing import shared_memory
+
+from resources import limit_blas_env
+limit_blas_env()  # Antes do numpy: vale também para os processos filhos, que reimportam este módulo
+import numpy as np
+
+FRAME_SHAPE = (480, 640, 3)
+DEFAULT_SLOTS = 8
+MAX_READERS = 4
+
+# Índices do cabeçalho (int64)
+_MAGIC = 0x43554245  # "CUBE"
+_H_MAGIC, _H_SLOTS, _H_HEIGHT, _H_WIDTH, _H_CHANNELS, _H_WRITE_SEQ, _H_OVERRUNS = range(7)
+_HEADER_FIELDS = 8
+
+# Identificadores dos leitores do pipeline
+READER_INFERENCE = 0
+READER_TRACKER = 1
+READER_DISPLAY = 2
+
+# Inferência e tracking dividem os núcleos de cálculo; captura e exibição ficam nos de E/S
+PIPELINE_WORKERS = 2
+
+
+def _layout(slots, shape):
+    """Retorna (offsets, tamanho_total) das regiões do buffer compartilhado"""
+    header = _HEADER_FIELDS * 8
+    slot_seq = slots * 8
+    slot_ts = slots * 8
+    readers = MAX_READERS * 8
+    meta = header + slot_seq + slot_ts + readers
+    frames_offset = (meta + 63) // 64 * 64  # alinha os frames em 64 bytes
+    frame_bytes = int(np.prod(shape))
+    offsets = {
+        'slot_seq': header,
+        'slot_ts': header + slot_seq,
+        'readers': header + slot_seq + slot_ts,
+        'frames': frames_offset
+    }
+    return offsets, frames_offset + slots * frame_bytes
+
+
+class FrameRing:
+    """Anel de frames em memória compartilhada com slots e números de sequência"""
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        header = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        if header[_H_MAGIC] != _MAGIC:
+            raise ValueError(f"Memória compartilhada {shm.name} não é um FrameRing")
+        self.slots = int(header[_H_SLOTS])
+        self.shape = (int(header[_H_HEIGHT]), int(header[_H_WIDTH]), int(header[_H_CHANNELS]))
+        offsets, _ = _layout(self.slots, self.shape)
+
+        self._header = header
+        self._slot_seq = np.ndarray((self.slots,), dtype=np.int64, buffer=shm.buf, offset=offsets['slot_seq'])
+        self._slot_ts = np.ndarray((self.slots,), dtype=np.float64, buffer=shm.buf, offset=offsets['slot_ts'])
+        self._readers = np.ndarray((MAX_READERS,), dtype=np.int64, buffer=shm.buf, offset=offsets['readers'])
+        self._frames = np.ndarray((self.slots,) + self.shape, dtype=np.uint8,
+                                  buffer=shm.buf, offset=offsets['frames'])
+
+    @classmethod
+    def create(cls, slots=DEFAULT_SLOTS, shape=FRAME_SHAPE, name=None):
+        """Cria o anel (processo dono, normalmente quem orquestra o pipeline)"""
+        _, size = _layout(slots, shape)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[_H_SLOTS] = slots
+        header[_H_HEIGHT], header[_H_WIDTH], header[_H_CHANNELS] = shape
+        header[_H_WRITE_SEQ] = -1
+        offsets, _ = _layout(slots, shape)
+        np.ndarray((slots,), dtype=np.int64, buffer=shm.buf, offset=offsets['slot_seq'])[:] = -1
+        np.ndarray((MAX_READERS,), dtype=np.int64, buffer=shm.buf, offset=offsets['readers'])[:] = -1
+        header[_H_MAGIC] = _MAGIC
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        """Conecta a um anel já criado por outro processo"""
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def overruns(self):
+        """Quantas vezes o escritor sobrescreveu um frame ainda não lido por algum leitor"""
+        return int(self._header[_H_OVERRUNS])
+
+    # ------------------------------
+    # ESCRITA (apenas um escritor)
+    # ------------------------------
+    def begin_write(self):
+        """Reserva o próximo slot e retorna (slot, seq, view) para escrita direta"""
+        seq = int(self._header[_H_WRITE_SEQ]) + 1
+        slot = seq % self.slots
+        for reader_seq in self._readers:
+            if 0 <= reader_seq and seq - reader_seq > self.slots:
+                self._header[_H_OVERRUNS] += 1
+                break
+        self._slot_seq[slot] = -1  # slot em escrita
+        return slot, seq, self._frames[slot]
+
+    def commit(self, slot, seq, timestamp):
+        """Publica o frame escrito no slot"""
+        self._slot_ts[slot] = timestamp
+        self._slot_seq[slot] = seq
+        self._header[_H_WRITE_SEQ] = seq
+
+    def write(self, frame, timestamp):
+        """Copia um frame já existente para o anel (uma única cópia) e retorna (slot, seq)"""
+        slot, seq, view = self.begin_write()
+        np.copyto(view, frame)
+        self.commit(slot, seq, timestamp)
+        return slot, seq
+
+    # ------------------------------
+    # LEITURA (vários leitores)
+    # ------------------------------
+    def latest(self):
+        """Retorna (slot, seq, timestamp) do último frame publicado ou None"""
+        seq = int(self._header[_H_WRITE_SEQ])
+        if seq < 0:
+            return None
+        slot = seq % self.slots
+        return slot, seq, float(self._slot_ts[slot])
+
+    def wait_next(self, after_seq, timeout=1.0, poll=0.001):
+        """Espera um frame mais novo que `after_seq` (pula os intermediários)"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            latest = self.latest()
+            if latest and latest[1] > after_seq:
+                return latest
+            time.sleep(poll)
+        return None
+
+    def view(self, slot, seq):
+        """View NumPy (sem cópia) do frame, ou None se o slot já foi sobrescrito"""
+        if self._slot_seq[slot] != seq:
+            return None
+        return self._frames[slot]
+
+    def is_valid(self, slot, seq):
+        """Confere, após usar a view, se o frame não foi sobrescrito no meio do uso"""
+        return self._slot_seq[slot] == seq
+
+    def mark_read(self, reader_id, seq):
+        """Atualiza o índice de leitura do leitor (usado para contar atropelamentos)"""
+        self._readers[reader_id] = seq
+
+    def close(self):
+        # Libera as views antes de fechar o mapeamento
+        self._header = self._slot_seq = self._slot_ts = self._readers = self._frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def make_detection_message(slot, seq, timestamp, boxes):
+    """Mensagem leve entre processos: apenas slot/seq e caixas (x1, y1, x2, y2, conf)"""
+    return {'slot': slot, 'seq': seq, 'timestamp': timestamp, 'boxes': boxes}
+
+
+# ===========================================
+# PROCESSOS DO PIPELINE
+# ===========================================
+
+def _put_latest(q, item):
+    """Envia sem bloquear; se a fila estiver cheia descarta a mensagem mais antiga"""
+    try:
+        q.put_nowait(item)
+    except queue.Full:
+        try:
+            q.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            q.put_nowait(item)
+        except queue.Full:
+            pass
+
+
+def capture_process(ring_name, stop_event):
+    """Lê a câmera direto para os slots do anel"""
+    from startup import probe_cameras
+    from resources import apply_worker_resources
+
+    apply_worker_resources('io')
+    ring = FrameRing.attach(ring_name)
+    _, cap = probe_cameras()
+    if cap is None:
+        print("[ERRO] Nenhuma câmera disponível. Saindo...")
+        stop_event.set()
+        ring.close()
+        return
+
+    try:
+        while not stop_event.is_set():
+            slot, seq, view = ring.begin_write()
+            ret, frame = cap.read(view)
+            if not ret:
+                break
+            if frame is not view:
+                # Câmera com resolução diferente do anel: ajusta com uma única cópia
+                if frame.shape != view.shape:
+                    import cv2
+                    frame = cv2.resize(frame, (view.shape[1], view.shape[0]))
+                np.copyto(view, frame)
+            ring.commit(slot, seq, time.time())
+    finally:
+        cap.release()
+        ring.close()
+        stop_event.set()
+
+
+def inference_process(ring_name, model_path, tracker_queue, stop_event, confidence=0.5):
+    """Roda o YOLO sobre a view do último frame e envia apenas as caixas"""
+    from startup import load_model, warm_up_model
+    from resources import apply_worker_resources
+
+    apply_worker_resources('detector', index=0, workers=PIPELINE_WORKERS)
+    ring = FrameRing.attach(ring_name)
+    model = load_model(model_path)
+    warm_up_model(model)
+    last_seq = -1
+    try:
+        while not stop_event.is_set():
+            latest = ring.wait_next(last_seq, timeout=0.5)
+            if latest is None:
+                continue
+            slot, seq, timestamp = latest
+            frame = ring.view(slot, seq)
+            if frame is None:
+                continue
+            results = model(frame, conf=confidence, verbose=False)
+            last_seq = seq
+            ring.mark_read(READER_INFERENCE, seq)
+            if not ring.is_valid(slot, seq):
+                continue  # Frame sobrescrito durante a inferência - descarta
+
+            boxes = []
+            for r in results:
+                if r.boxes is not None:
+                    for box in r.boxes:
+                        x1, y1, x2, y2 = map(int, box.xyxy[0])
+                        boxes.append((x1, y1, x2, y2, float(box.conf[0])))
+            _put_latest(tracker_queue, make_detection_message(slot, seq, timestamp, boxes))
+    finally:
+        ring.close()
+
+
+def tracker_process(ring_name, tracker_queue, display_queue, stop_event):
+    """Classifica cor e faz o tracking lendo o frame direto da memória compartilhada"""
+    from cube_time_logger import create_logger
+    from webcam_detect_adaptive import CubeDetector
+    from resources import apply_worker_resources
+
+    apply_worker_resources('detector', index=1, workers=PIPELINE_WORKERS)
+    ring = FrameRing.attach(ring_name)
+    detector = CubeDetector(None)  # Sem modelo: apenas cor + tracking
+    logger = create_logger()
+    detector.attach_logger(logger)
+    stale = 0
+    try:
+        while not stop_event.is_set():
+            try:
+                message = tracker_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            frame = ring.view(message['slot'], message['seq'])
+            if frame is None:
+                stale += 1
+                continue
+            detections = [
+                {'bbox': box[:4], 'confidence': box[4], 'frame': frame}
+                for box in message['boxes']
+            ]
+            # A cor é a única leitura do frame: classifica antes e confere o slot
+            # antes de mexer no tracking, para um frame sobrescrito não virar cubo
+            for detection in detections:
+                detector.classify_detection(detection)
+                del detection['frame']
+            ring.mark_read(READER_TRACKER, message['seq'])
+            if not ring.is_valid(message['slot'], message['seq']):
+                stale += 1
+                if detector.color_cache is not None:
+                    detector.color_cache.clear()  # Trilhas vieram dos pixels sobrescritos
+                continue
+            detector.update_tracking(detections, message['timestamp'])
+
+            cubes = [
+                {'color': color, 'bbox': cube['bbox'],
+                 'time_in_frame': cube['last_seen'] - cube['entry_time']}
+                for color, cube in detector.active_cubes_by_color.items()
+            ]
+            _put_latest(display_queue, dict(message, cubes=cubes))
+    finally:
+        detector.events.close()
+        if logger.current_group:
+            logger.force_finalize_group()
+        logger.close()
+        if stale:
+            print(f"[INFO] Tracker: {stale} frames descartados por terem sido sobrescritos")
+        ring.close()
+
+
+def display_process(ring_name, display_queue, stop_event):
+    """Mostra o frame do slot com as caixas do tracker"""
+    import cv2
+    from resources import apply_worker_resources
+
+    apply_worker_resources('io')
+    ring = FrameRing.attach(ring_name)
+    color_map = {
+        'white': (255, 255, 255), 'yellow': (0, 255, 255), 'red': (0, 0, 255),
+        'orange': (0, 165, 255), 'blue': (255, 0, 0), 'green': (0, 255, 0)
+    }
+    try:
+        while not stop_event.is_set():
+            try:
+                message = display_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            frame = ring.view(message['slot'], message['seq'])
+            if frame is None:
+                continue
+            # A exibição desenha por cima, então trabalha numa cópia local
+            canvas = frame.copy()
+            ring.mark_read(READER_DISPLAY, message['seq'])
+            for cube in message['cubes']:
+                x1, y1, x2, y2 = cube['bbox']
+                color_bgr = color_map.get(cube['color'], (128, 128, 128))
+                cv2.rectangle(canvas, (x1, y1), (x2, y2), color_bgr, 3)
+                cv2.putText(canvas, f"Cubo {cube['color']} | {cube['time_in_frame']:.1f}s", (x1, y1 - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, color_bgr, 2)
+            cv2.imshow("Detecção de Cubos", canvas)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                stop_event.set()
+    finally:
+        cv2.destroyAllWindows()
+        ring.close()
+
+
+def run_pipeline(model_path, slots=DEFAULT_SLOTS):
+    """Orquestra captura, inferência, tracking e exibição em processos separados"""
+    ring = FrameRing.create(slots=slots)
+    stop_event = mp.Event()
+    tracker_queue = mp.Queue(maxsize=4)
+    display_queue = mp.Queue(maxsize=2)
+
+    processes = [
+        mp.Process(target=capture_process, args=(ring.name, stop_event), name="captura"),
+        mp.Process(target=inference_process, args=(ring.name, model_path, tracker_queue, stop_event),
+                   name="inferencia"),
+        mp.Process(target=tracker_process, args=(ring.name, tracker_queue, display_queue, stop_event),
+                   name="tracking"),
+        mp.Process(target=display_process, args=(ring.name, display_queue, stop_event), name="exibicao"),
+    ]
+    for process in processes:
+        process.start()
+    try:
+        while not stop_event.is_set() and all(p.is_alive() for p in processes):
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        print(f"[INFO] Frames atropelados no anel: {ring.overruns}")
+        ring.close()
+
+
+def main():
+    from webcam_detect_adaptive import get_model_candidates, load_model_selection
+
+    candidates = [path for path in get_model_candidates(load_model_selection()) if os.path.exists(path)]
+    if not candidates:
+        print("[ERRO] Nenhum modelo disponível. Saindo...")
+        return
+    print(f"[INFO] Pipeline multiprocesso com {candidates[0]}")
+    run_pipeline(candidates[0])
+
+
+if __name__ == "__main__":
+    main()
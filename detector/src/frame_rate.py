@@ -0,0 +1,43 @@
+"""
+Medição contínua da taxa de frames efetiva do tracking
+
+As janelas de confirmação, tolerância e saída são configuradas em segundos
+(config.py); o tracker converte cada uma em número mínimo de frames usando a
+taxa medida aqui. Assim uma estação que cai de 30 para 8 fps continua
+confirmando e liberando cubos no mesmo tempo, em vez de esperar o mesmo número
+de frames (10 frames = 0,33s a 30 fps, mas 1,25s a 8 fps).
+
+A taxa é a mediana dos últimos FPS_WINDOW intervalos entre frames, então uma
+pausa isolada (troca de configuração, soluço da câmera) não derruba a estimativa.
+"""
+from collections import deque
+
+from config import NOMINAL_FPS, FPS_WINDOW
+
+
+class FrameRateMeter:
+    """Estima o fps pelo intervalo mediano entre os timestamps recebidos"""
+
+    def __init__(self, window=FPS_WINDOW, initial_fps=NOMINAL_FPS):
+        self.intervals = deque(maxlen=window)
+        self.initial_fps = initial_fps
+        self.fps = initial_fps  # Usado até haver intervalos medidos
+        self.last_time = None
+
+    def tick(self, timestamp):
+        """Registra um frame processado e retorna o fps estimado"""
+        if self.last_time is not None and timestamp > self.last_time:
+            self.intervals.append(timestamp - self.last_time)
+            ordered = sorted(self.intervals)
+            self.fps = 1.0 / ordered[len(ordered) // 2]
+        self.last_time = timestamp
+        return self.fps
+
+    def frames_for(self, duration, minimum=1):
+        """Quantos frames cobrem `duration` segundos na taxa atual (pelo menos `minimum`)"""
+        return max(minimum, int(round(duration * self.fps)))
+
+    def reset(self):
+        self.intervals.clear()
+        self.fps = self.initial_fps
+        self.last_time = None
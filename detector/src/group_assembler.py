@@ -0,0 +1,176 @@
+"""
+Montagem concorrente de grupos de 3 cubos
+
+Mantém vários grupos abertos ao mesmo tempo, separados por fluxo (estação,
+câmera...), para aceitar cubos que chegam intercalados ou fora de ordem:
+- a pertença de cor em cada grupo é testada com uma máscara de bits
+- um cubo vai para o grupo aberto mais antigo do fluxo que ainda não tem a cor;
+  se todos já têm, abre um grupo novo (até MAX_OPEN_GROUPS_PER_FLOW)
+- grupos parados há mais de GROUP_TIMEOUT segundos expiram e são reportados
+- cubos repetidos/descartados são contados e guardados em `rejected`
+
+O custo por cubo é constante: busca no dicionário de fluxos, no máximo
+MAX_OPEN_GROUPS_PER_FLOW testes de bits e expiração amortizada pela fila
+ordenada por última atividade.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+
+from config import GROUP_TIMEOUT, MAX_OPEN_GROUPS_PER_FLOW
+
+GROUP_SIZE = 3
+DEFAULT_FLOW = 'default'
+
+# Um bit por cor de cubo
+COLOR_BITS = {
+    'white': 1 << 0,
+    'yellow': 1 << 1,
+    'red': 1 << 2,
+    'orange': 1 << 3,
+    'blue': 1 << 4,
+    'green': 1 << 5
+}
+
+
+class OpenGroup:
+    """Grupo em formação: cubos recebidos e máscara de cores presentes"""
+
+    __slots__ = ('group_id', 'flow', 'cubes', 'mask', 'created_at', 'updated_at')
+
+    def __init__(self, group_id, flow, now):
+        self.group_id = group_id
+        self.flow = flow
+        self.cubes = []
+        self.mask = 0
+        self.created_at = now
+        self.updated_at = now
+
+    @property
+    def colors(self):
+        return [cube['color'] for cube in self.cubes]
+
+    def is_complete(self):
+        return len(self.cubes) == GROUP_SIZE
+
+
+class GroupAssembler:
+    """Distribui cubos em grupos abertos por fluxo e avisa quando um grupo completa ou expira"""
+
+    def __init__(self, group_timeout=GROUP_TIMEOUT, max_open_per_flow=MAX_OPEN_GROUPS_PER_FLOW,
+                 on_complete=None, on_expired=None, max_rejected=200):
+        self.group_timeout = group_timeout
+        self.max_open_per_flow = max_open_per_flow
+        self.on_complete = on_complete
+        self.on_expired = on_expired
+
+        self.flows = {}  # {flow: [OpenGroup, ...]} do mais antigo para o mais novo
+        self._by_activity = OrderedDict()  # {group_id: OpenGroup} ordenado por última atividade
+        self._next_group_id = 1
+        self._lock = threading.RLock()
+
+        self.stats = {
+            'accepted': 0,
+            'completed': 0,
+            'expired': 0,
+            'duplicates': 0,  # Cor repetida que abriu/entrou num grupo seguinte
+            'dropped': 0,     # Cubo recusado (cor desconhecida ou limite de grupos abertos)
+        }
+        self.rejected = deque(maxlen=max_rejected)
+
+    def add(self, cube, flow=DEFAULT_FLOW, now=None):
+        """Adiciona um cubo ({'color', ...}) ao fluxo e retorna o grupo se ele completou"""
+        now = time.time() if now is None else now
+        with self._lock:
+            if self._by_activity and now - next(iter(self._by_activity.values())).updated_at >= self.group_timeout:
+                self.expire(now)
+
+            bit = COLOR_BITS.get(cube['color'])
+            if bit is None:
+                self._reject(cube, flow, now, 'cor_desconhecida')
+                return None
+
+            groups = self.flows.setdefault(flow, [])
+            target = None
+            for group in groups:
+                if not group.mask & bit:
+                    target = group
+                    break
+
+            if target is None:
+                if len(groups) >= self.max_open_per_flow:
+                    self._reject(cube, flow, now, 'limite_de_grupos_abertos')
+                    return None
+                if groups:
+                    # Cor já presente em todos os grupos abertos: não descarta, abre o próximo grupo
+                    self.stats['duplicates'] += 1
+                target = OpenGroup(self._next_group_id, flow, now)
+                self._next_group_id += 1
+                groups.append(target)
+                self._by_activity[target.group_id] = target
+
+            target.cubes.append(cube)
+            target.mask |= bit
+            target.updated_at = now
+            self._by_activity.move_to_end(target.group_id)
+            self.stats['accepted'] += 1
+
+            if target.is_complete():
+                self._close(target)
+                self.stats['completed'] += 1
+                if self.on_complete:
+                    self.on_complete(target)
+                return target
+            return None
+
+    def expire(self, now=None):
+        """Expira grupos sem atividade há mais de group_timeout segundos"""
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = []
+            while self._by_activity:
+                group = next(iter(self._by_activity.values()))
+                if now - group.updated_at < self.group_timeout:
+                    break
+                self._close(group)
+                expired.append(group)
+            for group in expired:
+                self.stats['expired'] += 1
+                if self.on_expired:
+                    self.on_expired(group)
+            return expired
+
+    def abandon(self, group):
+        """Remove um grupo incompleto a pedido (ex.: finalização manual)"""
+        with self._lock:
+            if group.group_id in self._by_activity:
+                self._close(group)
+                self.stats['expired'] += 1
+
+    def oldest_open(self, flow=DEFAULT_FLOW):
+        """Grupo aberto mais antigo de um fluxo (ou None)"""
+        groups = self.flows.get(flow)
+        return groups[0] if groups else None
+
+    def open_groups(self):
+        with self._lock:
+            return list(self._by_activity.values())
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats['open_groups'] = len(self._by_activity)
+            stats['flows'] = len(self.flows)
+            return stats
+
+    def _close(self, group):
+        del self._by_activity[group.group_id]
+        groups = self.flows.get(group.flow)
+        if groups is not None:
+            groups.remove(group)  # No máximo max_open_per_flow elementos
+            if not groups:
+                del self.flows[group.flow]
+
+    def _reject(self, cube, flow, now, reason):
+        self.stats['dropped'] += 1
+        self.rejected.append({'flow': flow, 'reason': reason, 'time': now, 'cube': cube})
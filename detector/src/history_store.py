@@ -0,0 +1,315 @@
+"""
+Histórico colunar de grupos e cubos em disco (memory-mapped)
+
+Cada coluna fica num arquivo .npy próprio, dividido em segmentos de tamanho
+fixo (HISTORY_SEGMENT_ROWS linhas) abertos com np.memmap:
+
+    history/
+      cubes/000000/{timestamp,color_id,individual_time,group_id,count}.npy
+      groups/000000/{group_id,timestamp,group_time,max_color,max_time,min_color,min_time,count}.npy
+
+`count.npy` guarda quantas linhas do segmento já estão completas e só é
+atualizado depois que todas as colunas da linha foram escritas. As consultas
+varrem só as colunas necessárias, segmento por segmento, com operações
+vetorizadas do NumPy; quem mantém as páginas em memória é o sistema operacional.
+Na RAM do processo ficam apenas os últimos HISTORY_HOT_WINDOW grupos completos.
+
+As consultas espelham o GroupController do servidor (médias por cor, grupos
+atrasados/adiantados, notificações e últimos tempos), para que o painel e
+ferramentas locais possam ser atendidos sem consultar a API. Um único processo
+deve escrever em cada diretório de histórico.
+"""
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from config import (HISTORY_SEGMENT_ROWS, HISTORY_HOT_WINDOW,
+                    DELAYED_GROUP_THRESHOLD, EARLY_GROUP_THRESHOLD)
+
+# Mesma ordem usada pelo GroupController em averagesByAllColors
+COLORS = ['white', 'red', 'orange', 'blue', 'yellow', 'green']
+COLOR_IDS = {color: i for i, color in enumerate(COLORS)}
+UNKNOWN_COLOR_ID = 255
+
+CUBE_COLUMNS = {
+    'timestamp': np.float64,
+    'color_id': np.uint8,
+    'individual_time': np.float32,
+    'group_id': np.int64,
+}
+
+# O cubo mais lento e o mais rápido de cada grupo ficam no próprio grupo,
+# assim atrasados/adiantados não precisam cruzar as duas tabelas
+GROUP_COLUMNS = {
+    'group_id': np.int64,
+    'timestamp': np.float64,
+    'group_time': np.float32,
+    'max_color': np.uint8,
+    'max_time': np.float32,
+    'min_color': np.uint8,
+    'min_time': np.float32,
+}
+
+
+class _Segment:
+    """Um bloco de linhas: um memmap por coluna + contador de linhas completas"""
+
+    def __init__(self, path, columns, capacity, create=False):
+        self.path = path
+        if create:
+            os.makedirs(path, exist_ok=True)
+            self.columns = {
+                name: np.lib.format.open_memmap(os.path.join(path, f"{name}.npy"), mode='w+',
+                                                dtype=dtype, shape=(capacity,))
+                for name, dtype in columns.items()
+            }
+            self.count = np.lib.format.open_memmap(os.path.join(path, "count.npy"), mode='w+',
+                                                   dtype=np.int64, shape=(1,))
+        else:
+            self.columns = {
+                name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r+')
+                for name in columns
+            }
+            self.count = np.load(os.path.join(path, "count.npy"), mmap_mode='r+')
+        self.capacity = len(next(iter(self.columns.values())))
+
+    @property
+    def rows(self):
+        return int(self.count[0])
+
+    def is_full(self):
+        return self.rows >= self.capacity
+
+    def view(self, name):
+        return self.columns[name][:self.rows]
+
+    def flush(self):
+        for column in self.columns.values():
+            column.flush()
+        self.count.flush()
+
+
+class ColumnTable:
+    """Tabela só de inserção formada por segmentos colunares"""
+
+    def __init__(self, path, columns, segment_rows=HISTORY_SEGMENT_ROWS):
+        self.path = path
+        self.columns = columns
+        self.segment_rows = segment_rows
+        os.makedirs(path, exist_ok=True)
+        self.segments = [
+            _Segment(os.path.join(path, name), columns, segment_rows)
+            for name in sorted(os.listdir(path))
+            if os.path.exists(os.path.join(path, name, "count.npy"))
+        ]
+
+    def __len__(self):
+        return sum(segment.rows for segment in self.segments)
+
+    def append(self, values):
+        """Grava uma linha ({coluna: valor}); o contador é atualizado por último"""
+        segment = self._writable_segment()
+        row = segment.rows
+        for name, value in values.items():
+            segment.columns[name][row] = value
+        segment.count[0] = row + 1
+
+    def extend(self, values):
+        """Grava várias linhas de uma vez ({coluna: array}), ex.: importação de histórico"""
+        total = len(next(iter(values.values())))
+        done = 0
+        while done < total:
+            segment = self._writable_segment()
+            row = segment.rows
+            n = min(total - done, segment.capacity - row)
+            for name, column in values.items():
+                segment.columns[name][row:row + n] = column[done:done + n]
+            segment.count[0] = row + n
+            done += n
+
+    def scan(self, names, newest_first=False):
+        """Percorre os segmentos devolvendo {coluna: view} sem copiar os dados"""
+        segments = reversed(self.segments) if newest_first else self.segments
+        for segment in segments:
+            if segment.rows:
+                yield {name: segment.view(name) for name in names}
+
+    def last_value(self, name):
+        for segment in reversed(self.segments):
+            if segment.rows:
+                return segment.columns[name][segment.rows - 1]
+        return None
+
+    def _writable_segment(self):
+        if not self.segments or self.segments[-1].is_full():
+            name = f"{len(self.segments):06d}"
+            self.segments.append(_Segment(os.path.join(self.path, name), self.columns,
+                                          self.segment_rows, create=True))
+        return self.segments[-1]
+
+    def flush(self):
+        for segment in self.segments:
+            segment.flush()
+
+
+class HistoryStore:
+    """Histórico local de grupos finalizados com consultas agregadas rápidas"""
+
+    def __init__(self, path, face_names=None, segment_rows=HISTORY_SEGMENT_ROWS,
+                 hot_window=HISTORY_HOT_WINDOW):
+        self.path = path
+        self.face_names = face_names or {}
+        self.cubes = ColumnTable(os.path.join(path, "cubes"), CUBE_COLUMNS, segment_rows)
+        self.groups = ColumnTable(os.path.join(path, "groups"), GROUP_COLUMNS, segment_rows)
+        self.hot = deque(maxlen=hot_window)  # Últimos grupos completos (com os cubos)
+        self._lock = threading.RLock()
+
+        last_id = self.groups.last_value('group_id')
+        self._next_group_id = int(last_id) + 1 if last_id is not None else 1
+
+    def append_group(self, cubes, group_time, timestamp=None):
+        """Grava um grupo finalizado e seus cubos; retorna o id do grupo no histórico"""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            group_id = self._next_group_id
+            self._next_group_id += 1
+
+            for cube in cubes:
+                self.cubes.append({
+                    'timestamp': timestamp,
+                    'color_id': COLOR_IDS.get(cube['color'], UNKNOWN_COLOR_ID),
+                    'individual_time': cube['individual_time'],
+                    'group_id': group_id,
+                })
+            slowest = max(cubes, key=lambda cube: cube['individual_time'])
+            fastest = min(cubes, key=lambda cube: cube['individual_time'])
+            self.groups.append({
+                'group_id': group_id,
+                'timestamp': timestamp,
+                'group_time': group_time,
+                'max_color': COLOR_IDS.get(slowest['color'], UNKNOWN_COLOR_ID),
+                'max_time': slowest['individual_time'],
+                'min_color': COLOR_IDS.get(fastest['color'], UNKNOWN_COLOR_ID),
+                'min_time': fastest['individual_time'],
+            })
+            self.hot.append({
+                'id': group_id,
+                'group_time': group_time,
+                'created_at': timestamp,
+                'cubes': [dict(cube) for cube in cubes],
+            })
+            return group_id
+
+    # -------------------------------
+    # CONSULTAS (espelham o GroupController)
+    # -------------------------------
+    def averages_by_all_colors(self, since=None):
+        """Tempo individual médio por cor (todas as cores presentes, 0 sem dados)"""
+        sums = np.zeros(256)
+        counts = np.zeros(256)
+        with self._lock:
+            for columns in self.cubes.scan(('timestamp', 'color_id', 'individual_time')):
+                color_ids, times = columns['color_id'], columns['individual_time']
+                if since is not None:
+                    # Linhas em ordem de chegada: corta o início por busca binária
+                    start = np.searchsorted(columns['timestamp'], since)
+                    color_ids, times = color_ids[start:], times[start:]
+                counts += np.bincount(color_ids, minlength=256)
+                sums += np.bincount(color_ids, weights=times, minlength=256)
+        return {
+            color.upper(): float(sums[i] / counts[i]) if counts[i] else 0
+            for i, color in enumerate(COLORS)
+        }
+
+    def average_by_color(self, color, since=None):
+        averages = self.averages_by_all_colors(since)
+        return {'color': color, 'average_individual_time': averages.get(color.upper(), 0)}
+
+    def delayed(self, threshold=DELAYED_GROUP_THRESHOLD, limit=None):
+        """Grupos acima do limite, do mais recente para o mais antigo, com o cubo mais lento"""
+        return self._outliers(threshold, limit, delayed=True)
+
+    def early(self, threshold=EARLY_GROUP_THRESHOLD, limit=None):
+        """Grupos abaixo do limite, do mais recente para o mais antigo, com o cubo mais rápido"""
+        return self._outliers(threshold, limit, delayed=False)
+
+    def notifications(self, limit=5):
+        """Atrasados e adiantados juntos, os `limit` mais recentes"""
+        merged = self.delayed(limit=limit) + self.early(limit=limit)
+        merged.sort(key=lambda item: item['group_id'], reverse=True)
+        return merged[:limit]
+
+    def latest_group_times(self, n=7):
+        """Tempos dos últimos `n` grupos (mais recente primeiro)"""
+        latest = []
+        with self._lock:
+            for columns in self.groups.scan(('group_id', 'group_time', 'timestamp'), newest_first=True):
+                take = min(n - len(latest), len(columns['group_id']))
+                for i in range(len(columns['group_id']) - 1, len(columns['group_id']) - 1 - take, -1):
+                    latest.append({
+                        'id': int(columns['group_id'][i]),
+                        'group_time': float(columns['group_time'][i]),
+                        'created_at': datetime.fromtimestamp(columns['timestamp'][i]).isoformat()
+                    })
+                if len(latest) >= n:
+                    break
+        return latest
+
+    def groups_with_cubes(self, n=5):
+        """Últimos grupos com os cubos (atendido pela janela em memória)"""
+        with self._lock:
+            groups = list(self.hot)[-n:]
+        return [
+            dict(group, created_at=datetime.fromtimestamp(group['created_at']).isoformat())
+            for group in reversed(groups)
+        ]
+
+    def count(self):
+        return {'groups': len(self.groups), 'cubes': len(self.cubes)}
+
+    def flush(self):
+        with self._lock:
+            self.cubes.flush()
+            self.groups.flush()
+
+    def _outliers(self, threshold, limit, delayed):
+        color_column, time_column = ('max_color', 'max_time') if delayed else ('min_color', 'min_time')
+        kind = 'high_time' if delayed else 'low_time'
+        message = ('Grupo com tempo acima do esperado.' if delayed
+                   else 'Grupo com tempo abaixo do esperado.')
+        found = []
+        with self._lock:
+            names = ('group_id', 'group_time', color_column, time_column)
+            for columns in self.groups.scan(names, newest_first=True):
+                group_times = columns['group_time']
+                mask = group_times > threshold if delayed else group_times < threshold
+                rows = np.flatnonzero(mask)[::-1]
+                if limit is not None:
+                    rows = rows[:limit - len(found)]
+                # Seleção vetorizada; só as linhas escolhidas viram objetos Python
+                selected_times = group_times[rows].astype(np.float64)
+                diffs = selected_times - threshold if delayed else threshold - selected_times
+                for group_id, group_time, color_id, cube_time, diff in zip(
+                        columns['group_id'][rows].tolist(), selected_times.tolist(),
+                        columns[color_column][rows].tolist(),
+                        columns[time_column][rows].astype(np.float64).tolist(), diffs.tolist()):
+                    color = COLORS[color_id] if color_id < len(COLORS) else 'unknown'
+                    found.append({
+                        'type': kind,
+                        'message': message,
+                        'group_id': group_id,
+                        'group_time': group_time,
+                        'cube': {
+                            'color': color.upper(),
+                            'face': self.face_names.get(color, 'Desconhecida'),
+                            'individual_time': cube_time,
+                            'diff': diff
+                        }
+                    })
+                if limit is not None and len(found) >= limit:
+                    break
+        return found
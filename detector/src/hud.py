@@ -0,0 +1,92 @@
+"""
+HUD incremental para o overlay do detector
+
+Cada painel (bloco de tempos, progresso do grupo, configurações, controles...)
+é desenhado uma única vez numa imagem pequena e guardado em cache junto com a
+máscara dos pixels de texto/borda. Enquanto o conteúdo do painel não muda, cada
+frame só escurece o retângulo do painel (quando tem fundo) e copia os pixels em
+cache - sem copiar o frame inteiro nem repetir dezenas de cv2.putText.
+"""
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+class HudPanel:
+    """Painel em cache: imagem renderizada, máscara e retângulo no frame"""
+
+    def __init__(self, key, x, y, image, mask, background_alpha):
+        self.key = key
+        self.x = x
+        self.y = y
+        self.image = image
+        self.mask = mask
+        self.background_alpha = background_alpha
+
+
+class HudRenderer:
+    """Renderiza painéis de texto com cache e aplica só nos seus retângulos"""
+
+    def __init__(self):
+        self.panels = {}
+        self.renders = 0  # Quantas vezes algum painel precisou ser redesenhado
+        self.hits = 0     # Quantas vezes o painel em cache foi reaproveitado
+
+    def draw_panel(self, frame, name, x, y, width, height, lines,
+                   background_alpha=None, border=None):
+        """Desenha um painel no frame, reaproveitando o cache se o conteúdo não mudou
+
+        `lines` é uma lista de (texto, (x, y) relativo ao painel, escala, cor, espessura).
+        `background_alpha` escurece o fundo do painel (0.7 = 70% preto) e
+        `border` é (cor, espessura) de uma borda retangular.
+        """
+        # Recorta o painel aos limites do frame
+        frame_h, frame_w = frame.shape[:2]
+        x, y = max(0, x), max(0, y)
+        width, height = min(width, frame_w - x), min(height, frame_h - y)
+        if width <= 0 or height <= 0:
+            return
+
+        key = (x, y, width, height, tuple(lines), background_alpha, border)
+        panel = self.panels.get(name)
+        if panel is None or panel.key != key:
+            panel = self._render(key, x, y, width, height, lines, background_alpha, border)
+            self.panels[name] = panel
+            self.renders += 1
+        else:
+            self.hits += 1
+
+        roi = frame[y:y + height, x:x + width]
+        if panel.background_alpha:
+            # Mesmo resultado de addWeighted(overlay preto, alpha, frame, 1 - alpha), só no retângulo
+            cv2.convertScaleAbs(roi, dst=roi, alpha=1.0 - panel.background_alpha)
+        cv2.copyTo(panel.image, panel.mask, roi)
+
+    def _render(self, key, x, y, width, height, lines, background_alpha, border):
+        image = np.zeros((height, width, 3), dtype=np.uint8)
+        mask = np.zeros((height, width), dtype=np.uint8)
+        if border:
+            border_color, border_thickness = border
+            cv2.rectangle(image, (0, 0), (width - 1, height - 1), border_color, border_thickness)
+            cv2.rectangle(mask, (0, 0), (width - 1, height - 1), 255, border_thickness)
+        for text, (tx, ty), scale, color, thickness in lines:
+            cv2.putText(image, text, (tx, ty), FONT, scale, color, thickness)
+            cv2.putText(mask, text, (tx, ty), FONT, scale, 255, thickness)
+        return HudPanel(key, x, y, image, mask, background_alpha)
+
+    def clear(self, name=None):
+        """Remove um painel (ou todos) do cache"""
+        if name is None:
+            self.panels.clear()
+        else:
+            self.panels.pop(name, None)
+
+    def get_stats(self):
+        total = self.renders + self.hits
+        return {
+            'panels': len(self.panels),
+            'renders': self.renders,
+            'hits': self.hits,
+            'hit_rate': self.hits / total if total else 0.0
+        }
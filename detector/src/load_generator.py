@@ -0,0 +1,179 @@
+"""
+Gerador de carga sintético com várias estações
+
+Simula N estações, cada uma com seu CubeTimeLogger, gerando saídas de cubos
+numa taxa e mistura de cores configuráveis (chamando add_cube diretamente),
+contra o substituto local de POST /api/groups (api_standin.py).
+
+Reporta:
+- throughput de grupos ponta a ponta (grupos aceitos pela API por segundo)
+- latência de envio (p50/p95/p99)
+- crescimento de memória (tracemalloc)
+- grupos perdidos (finalizados mas não aceitos pela API) e cubos descartados
+
+Uso:
+    python load_generator.py --stations 8 --rate 2 --duration 60 \\
+        --latency 0.05 --error-rate 0.02 --outage-every 20 --outage-duration 3
+"""
+import argparse
+import contextlib
+import os
+import random
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+from api_standin import FakeGroupsAPI
+from config import EXPECTED_CUBE_TIME
+from cube_time_logger import create_logger
+
+COLORS = ['white', 'yellow', 'red', 'orange', 'blue', 'green']
+
+
+def parse_color_mix(text):
+    """Converte 'red=2,blue=1' em pesos por cor (cores omitidas ficam com peso 0)"""
+    if not text:
+        return {color: 1.0 for color in COLORS}
+    weights = {}
+    for item in text.split(','):
+        color, _, weight = item.partition('=')
+        color = color.strip()
+        if color not in COLORS:
+            raise ValueError(f"Cor desconhecida no mix: {color}")
+        weights[color] = float(weight or 1)
+    return weights
+
+
+class StationSimulator:
+    """Uma estação: gera cubos com chegadas de Poisson e alimenta seu próprio logger"""
+
+    def __init__(self, station_id, api_url, rate, color_mix, send_results, results_lock, seed=None,
+                 cameras=1):
+        self.station_id = station_id
+        self.flows = [f"estacao-{station_id}/cam-{c}" for c in range(cameras)]
+        self.rate = rate
+        self.colors = list(color_mix.keys())
+        self.weights = list(color_mix.values())
+        self.rng = random.Random(seed)
+        self.cubes_generated = 0
+
+        self.logger = create_logger(history_dir=None)
+        self.logger.api_url = f"{api_url}/groups"
+
+        def on_send_complete(success, status, latency):
+            with results_lock:
+                send_results.append((success, status, latency))
+        self.logger.on_send_complete = on_send_complete
+
+    def run(self, stop_event):
+        while not stop_event.is_set():
+            # Intervalo exponencial entre saídas de cubos (taxa média = rate cubos/s)
+            if stop_event.wait(self.rng.expovariate(self.rate)):
+                break
+            color = self.rng.choices(self.colors, weights=self.weights)[0]
+            individual_time = max(0.1, self.rng.gauss(EXPECTED_CUBE_TIME, EXPECTED_CUBE_TIME * 0.3))
+            # Com várias câmeras os cubos de fluxos diferentes chegam intercalados
+            self.logger.add_cube(color, individual_time, flow=self.rng.choice(self.flows))
+            self.cubes_generated += 1
+
+
+def run_load(args):
+    api = FakeGroupsAPI(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                        outage_every=args.outage_every, outage_duration=args.outage_duration).start()
+    color_mix = parse_color_mix(args.color_mix)
+    send_results = []
+    results_lock = threading.Lock()
+
+    tracemalloc.start()
+    memory_before = tracemalloc.get_traced_memory()[0]
+
+    stations = [
+        StationSimulator(i + 1, api.url, args.rate, color_mix, send_results, results_lock, seed=args.seed + i,
+                         cameras=args.cameras)
+        for i in range(args.stations)
+    ]
+    stop_event = threading.Event()
+    threads = [threading.Thread(target=s.run, args=(stop_event,), daemon=True) for s in stations]
+
+    print(f"[INFO] {args.stations} estações x {args.rate} cubos/s por {args.duration}s contra {api.url}")
+    # Sem --verbose a saída vai para os.devnull: um StringIO guardaria cada linha e
+    # entraria na conta de memória do tracemalloc
+    with contextlib.ExitStack() as output:
+        if not args.verbose:
+            output.enter_context(contextlib.redirect_stdout(output.enter_context(open(os.devnull, 'w'))))
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(args.duration)
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+
+        # Aguarda os envios em andamento (limitado pelo timeout do logger)
+        groups_finalized = sum(s.logger.totals['groups'] for s in stations)
+        deadline = time.perf_counter() + stations[0].logger.api_timeout + 1 if stations else 0
+        while time.perf_counter() < deadline:
+            with results_lock:
+                if len(send_results) >= groups_finalized:
+                    break
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - start
+
+    memory_after, memory_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    api.stop()
+
+    cubes_generated = sum(s.cubes_generated for s in stations)
+    cubes_grouped = sum(s.logger.totals['cubes'] for s in stations)
+    cubes_pending = sum(len(g.cubes) for s in stations for g in s.logger.assembler.open_groups())
+    assembler_stats = {}
+    for s in stations:
+        for name, value in s.logger.assembler.get_stats().items():
+            assembler_stats[name] = assembler_stats.get(name, 0) + value
+    with results_lock:
+        results = list(send_results)
+    latencies = np.array([latency * 1000 for _, _, latency in results]) if results else np.zeros(1)
+    failures = {}
+    for success, status, _ in results:
+        if not success:
+            failures[status] = failures.get(status, 0) + 1
+
+    print("\n=== RESULTADO DA CARGA ===")
+    print(f"Duração: {elapsed:.1f}s | estações: {args.stations}")
+    print(f"Cubos gerados: {cubes_generated} | agrupados: {cubes_grouped} | "
+          f"pendentes: {cubes_pending} | recusados: {assembler_stats['dropped']}")
+    print(f"Grupos abertos: {assembler_stats['open_groups']} | expirados: {assembler_stats['expired']} | "
+          f"cores repetidas em grupo seguinte: {assembler_stats['duplicates']}")
+    print(f"Grupos finalizados: {groups_finalized} | aceitos pela API: {api.stats['received']} | "
+          f"perdidos: {groups_finalized - api.stats['received']}")
+    print(f"Throughput ponta a ponta: {api.stats['received'] / elapsed:.2f} grupos/s")
+    print(f"Latência de envio: p50 {np.percentile(latencies, 50):.1f}ms | "
+          f"p95 {np.percentile(latencies, 95):.1f}ms | p99 {np.percentile(latencies, 99):.1f}ms")
+    print(f"Falhas de envio: {failures or 'nenhuma'}")
+    print(f"Memória (tracemalloc): +{(memory_after - memory_before) / 1024:.0f} KiB "
+          f"(pico {memory_peak / 1024:.0f} KiB)")
+    print(f"API local: {api.stats}")
+    print("=" * 50)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gerador de carga multi-estação para o CubeTimeLogger")
+    parser.add_argument('--stations', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=1.0, help="cubos por segundo por estação")
+    parser.add_argument('--duration', type=float, default=30.0, help="duração da carga (s)")
+    parser.add_argument('--color-mix', default="", help="pesos por cor, ex.: red=2,blue=1,green=1")
+    parser.add_argument('--latency', type=float, default=0.0, help="latência injetada na API (s)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="variação da latência (s)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fração de respostas 500")
+    parser.add_argument('--outage-every', type=float, default=0.0, help="período entre quedas (s)")
+    parser.add_argument('--outage-duration', type=float, default=0.0, help="duração de cada queda (s)")
+    parser.add_argument('--cameras', type=int, default=1, help="fluxos (câmeras) intercalados por estação")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help="mostra as mensagens dos loggers")
+    run_load(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Teste barato de presença na região da última caixa de cada cubo
+
+A saída de um cubo só é confirmada depois de MIN_EXIT_DURATION sem detecção
+do YOLO, o que soma uma cauda longa e variável a cada tempo individual (e
+exige uma inferência por frame só para observar a ausência). Aqui é mantido
+um modelo da cena vazia em escala reduzida (média móvel BGR, atualizada só
+fora das caixas) e, a cada frame, a região central da última
+caixa de um cubo não detectado é comparada com esse fundo:
+
+- diferença alta: o cubo continua lá (falha do YOLO ou frame sem inferência)
+- diferença baixa: a região voltou a ser fundo, a saída pode ser confirmada
+  em PRESENCE_EXIT_DURATION em vez de MIN_EXIT_DURATION
+- fundo ainda desconhecido na região: sem conclusão, vale a regra antiga
+
+O custo é um recorte + resize pequeno por cubo não detectado; o fundo é
+atualizado a cada PRESENCE_BG_INTERVAL frames.
+"""
+import cv2
+import numpy as np
+
+from config import (PRESENCE_SCALE, PRESENCE_BG_ALPHA, PRESENCE_BG_INTERVAL,
+                    PRESENCE_DIFF_THRESHOLD, PRESENCE_MIN_KNOWN)
+
+
+class PresenceChecker:
+    """Modelo de cena vazia + comparação da região de uma caixa"""
+
+    def __init__(self, scale=PRESENCE_SCALE, alpha=PRESENCE_BG_ALPHA, interval=PRESENCE_BG_INTERVAL,
+                 threshold=PRESENCE_DIFF_THRESHOLD, min_known=PRESENCE_MIN_KNOWN):
+        self.scale = scale
+        self.alpha = alpha
+        self.interval = interval
+        self.threshold = threshold
+        self.min_known = min_known
+        self.background = None  # float32, escala reduzida
+        self.known = None       # 1 onde o fundo já foi observado vazio
+        self._frames = 0
+        self.stats = {'present': 0, 'absent': 0, 'unknown': 0, 'updates': 0}
+
+    def _small(self, image):
+        # Em cores: um cubo azul sobre fundo escuro quase some em tons de cinza
+        h, w = image.shape[:2]
+        size = (max(1, int(w * self.scale)), max(1, int(h * self.scale)))
+        return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+    def _scaled(self, bbox, center=False):
+        x1, y1, x2, y2 = bbox
+        if center:  # Metade central, como em detect_cube_color (as bordas da caixa têm fundo)
+            dx, dy = (x2 - x1) // 4, (y2 - y1) // 4
+            x1, y1, x2, y2 = x1 + dx, y1 + dy, x2 - dx, y2 - dy
+        s = self.scale
+        return int(x1 * s), int(y1 * s), int(np.ceil(x2 * s)), int(np.ceil(y2 * s))
+
+    def observe(self, frame, occupied_bboxes):
+        """Atualiza o fundo fora das caixas ocupadas (a cada `interval` frames)"""
+        self._frames += 1
+        if self.background is not None and self._frames % self.interval:
+            return
+        small = self._small(frame).astype(np.float32)
+        mask = np.ones(small.shape[:2], dtype=np.uint8)
+        for bbox in occupied_bboxes:
+            x1, y1, x2, y2 = self._scaled(bbox)
+            mask[max(0, y1 - 1):y2 + 1, max(0, x1 - 1):x2 + 1] = 0
+        if self.background is None:
+            self.background = small
+            self.known = mask.copy()
+        else:
+            cv2.accumulateWeighted(small, self.background, self.alpha, mask)
+            self.known |= mask
+        self.stats['updates'] += 1
+
+    def present(self, frame, bbox):
+        """True (ainda há algo na caixa), False (região igual ao fundo) ou None (fundo desconhecido)"""
+        if self.background is None:
+            self.stats['unknown'] += 1
+            return None
+        x1, y1, x2, y2 = self._scaled(bbox, center=True)
+        h, w = self.background.shape[:2]
+        x1, y1, x2, y2 = max(0, x1), max(0, y1), min(w, x2), min(h, y2)
+        if x2 <= x1 or y2 <= y1 or self.known[y1:y2, x1:x2].mean() < self.min_known:
+            self.stats['unknown'] += 1
+            return None
+
+        # Recorta no frame original e reduz só a região (não o frame inteiro)
+        inv = 1.0 / self.scale
+        roi = frame[int(y1 * inv):int(y2 * inv), int(x1 * inv):int(x2 * inv)]
+        if roi.size == 0:
+            self.stats['unknown'] += 1
+            return None
+        region = cv2.resize(roi, (x2 - x1, y2 - y1), interpolation=cv2.INTER_AREA).astype(np.float32)
+        diff = float(np.abs(region - self.background[y1:y2, x1:x2]).mean())
+        if diff > self.threshold:
+            self.stats['present'] += 1
+            return True
+        self.stats['absent'] += 1
+        return False
+
+    def reset(self):
+        self.background = None
+        self.known = None
+        self._frames = 0
@@ -0,0 +1,356 @@
+"""
+Preview remoto: stream MJPEG dos frames anotados com fps e resolução por cliente
+
+Os supervisores só viam o overlay na janela local da estação. Aqui o laço da
+câmera publica o frame já anotado (só quando há alguém assistindo e no ritmo
+do cliente mais rápido) e segue em frente: a publicação troca uma referência
+sob um lock. Uma thread de codificação gera um JPEG por resolução em uso,
+uma única vez por frame publicado, compartilhado por todos os clientes.
+
+Cada cliente roda na sua thread do servidor HTTP e sempre envia o JPEG mais
+novo (frames intermediários são pulados, nunca enfileirados). O tempo de
+escrita no socket mede o cliente: se ele não acompanha, o fps cai até a
+metade de PREVIEW_MAX_FPS, depois a resolução desce e por fim o fps cai até
+PREVIEW_MIN_FPS; com escritas rápidas por PREVIEW_ADAPT_FRAMES frames
+seguidos o caminho é refeito ao contrário.
+
+    GET /                página com o stream
+    GET /stream.mjpg     stream (opcional: ?fps=5 e/ou ?scale=0.5 fixam o valor)
+    GET /snapshot.jpg    um frame
+    GET /stats           contadores em JSON
+"""
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import cv2
+
+from config import (PREVIEW_HOST, PREVIEW_PORT, PREVIEW_MAX_FPS, PREVIEW_MIN_FPS, PREVIEW_SCALES,
+                    PREVIEW_JPEG_QUALITY, PREVIEW_ADAPT_FRAMES, PREVIEW_CLIENT_TIMEOUT)
+from resources import pin_io_thread
+
+BOUNDARY = 'frame'
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Detecção de Cubos</title></head>
+<body style="margin:0;background:#000"><img src="/stream.mjpg" style="max-width:100%"></body></html>
+"""
+
+
+class PreviewServer:
+    """Servidor MJPEG: o laço publica, uma thread codifica, cada cliente lê o JPEG mais novo"""
+
+    def __init__(self, host=PREVIEW_HOST, port=PREVIEW_PORT, max_fps=PREVIEW_MAX_FPS, min_fps=PREVIEW_MIN_FPS,
+                 scales=PREVIEW_SCALES, jpeg_quality=PREVIEW_JPEG_QUALITY, adapt_frames=PREVIEW_ADAPT_FRAMES,
+                 client_timeout=PREVIEW_CLIENT_TIMEOUT):
+        self.max_fps = max_fps
+        self.min_fps = min_fps
+        self.scales = sorted(scales, reverse=True)
+        self.jpeg_quality = jpeg_quality
+        self.adapt_frames = adapt_frames
+        self.stats = {'published': 0, 'replaced': 0, 'encoded': 0, 'encode_time': 0.0, 'publish_time': 0.0,
+                      'clients_total': 0, 'disconnects': 0}
+
+        self._lock = threading.Lock()
+        self._new_frame = threading.Condition(self._lock)  # Laço -> thread de codificação
+        self._new_jpeg = threading.Condition(self._lock)   # Thread de codificação -> clientes
+        self._pending = None   # (seq, frame) mais novo ainda não codificado
+        self._encoded = {}     # escala -> (seq, jpeg)
+        self._levels = {}      # escala -> clientes usando
+        self._clients = {}     # id -> estado do cliente
+        self._seq = 0
+        self._client_ids = itertools.count(1)
+        self._running = True
+        # Lidos pelo laço da câmera sem lock (atribuições simples)
+        self._viewers = 0
+        self._publish_interval = 1.0 / max_fps
+        self._last_publish = 0.0
+
+        preview = self
+
+        class Handler(BaseHTTPRequestHandler):
+            timeout = client_timeout  # Cliente parado por mais que isso é desconectado
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                path = url.path.rstrip('/')
+                if path == '':
+                    self._reply(200, 'text/html; charset=utf-8', PAGE.encode('utf-8'))
+                elif path == '/stream.mjpg':
+                    preview._stream(self, parse_qs(url.query))
+                elif path == '/snapshot.jpg':
+                    jpeg = preview._snapshot()
+                    if jpeg is None:
+                        self._reply(503, 'application/json', b'{"error": "nenhum frame publicado"}')
+                    else:
+                        self._reply(200, 'image/jpeg', jpeg)
+                elif path == '/stats':
+                    self._reply(200, 'application/json', json.dumps(preview.get_stats()).encode('utf-8'))
+                else:
+                    body = json.dumps({'error': f"Caminho desconhecido: {self.path}"})
+                    self._reply(404, 'application/json', body.encode('utf-8'))
+
+            def _reply(self, status, content_type, data):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass  # Silencia o log padrão do http.server
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+        self._encoder = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{'localhost' if host == '0.0.0.0' else host}:{port}"
+
+    # ------------------------------
+    # LAÇO DA CÂMERA
+    # ------------------------------
+    def wants_frame(self, now):
+        """Há cliente assistindo e já passou o intervalo do cliente mais rápido?"""
+        return self._viewers > 0 and now - self._last_publish >= self._publish_interval
+
+    def publish(self, frame, now):
+        """Entrega o frame anotado à thread de codificação (substitui um frame ainda não codificado)
+
+        O frame não é copiado: o laço não pode desenhar nele depois de publicar
+        (cap.read() devolve um array novo a cada leitura).
+        """
+        start = time.perf_counter()
+        self._last_publish = now
+        with self._new_frame:
+            if self._pending is not None:
+                self.stats['replaced'] += 1
+            self._seq += 1
+            self._pending = (self._seq, frame)
+            self._new_frame.notify()
+        self.stats['published'] += 1
+        self.stats['publish_time'] += time.perf_counter() - start
+
+    # ------------------------------
+    # THREAD DE CODIFICAÇÃO
+    # ------------------------------
+    def _encode_loop(self):
+        pin_io_thread()
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        while True:
+            with self._new_frame:
+                while self._pending is None and self._running:
+                    self._new_frame.wait()
+                if not self._running:
+                    return
+                seq, frame = self._pending
+                self._pending = None
+                scales = [scale for scale, count in self._levels.items() if count]
+
+            start = time.perf_counter()
+            encoded = {}
+            for scale in scales:
+                image = frame if scale == 1.0 else cv2.resize(frame, None, fx=scale, fy=scale,
+                                                              interpolation=cv2.INTER_AREA)
+                ok, jpeg = cv2.imencode('.jpg', image, params)
+                if ok:
+                    encoded[scale] = (seq, jpeg.tobytes())
+            elapsed = time.perf_counter() - start
+
+            with self._new_jpeg:
+                # Um nível abandonado durante a codificação não volta a ser guardado
+                self._encoded.update((scale, entry) for scale, entry in encoded.items() if scale in self._levels)
+                self.stats['encoded'] += len(encoded)
+                self.stats['encode_time'] += elapsed
+                self._new_jpeg.notify_all()
+
+    # ------------------------------
+    # CLIENTES
+    # ------------------------------
+    def _register(self, client):
+        with self._lock:
+            self._clients[client['id']] = client
+            self._use_level(client['scale'], 1)
+            self.stats['clients_total'] += 1
+            self._update_rate()
+
+    def _unregister(self, client):
+        with self._lock:
+            self._clients.pop(client['id'], None)
+            self._use_level(client['scale'], -1)
+            self._update_rate()
+
+    def _use_level(self, scale, delta):
+        self._levels[scale] = self._levels.get(scale, 0) + delta
+        if not self._levels[scale]:
+            del self._levels[scale]
+            self._encoded.pop(scale, None)
+
+    def _update_rate(self):
+        """Publicação no ritmo do cliente mais rápido (chamado com o lock)"""
+        self._viewers = len(self._clients)
+        fastest = max((client['fps'] for client in self._clients.values()), default=self.max_fps)
+        self._publish_interval = 0.9 / fastest  # Margem para o jitter do laço (senão 15fps viram 10fps a 30fps)
+
+    def _nearest_scale(self, value):
+        return min(self.scales, key=lambda scale: abs(scale - value))
+
+    def _new_client(self, handler, query):
+        client = {'id': next(self._client_ids), 'address': handler.client_address[0], 'fps': self.max_fps,
+                  'scale': self.scales[0], 'fixed_fps': False, 'fixed_scale': False, 'sent': 0, 'bytes': 0,
+                  'send_avg': 0.0, 'samples': 0, 'fast_frames': 0, 'connected_at': time.time()}
+        try:
+            if 'fps' in query:
+                client['fps'] = min(self.max_fps, max(self.min_fps, float(query['fps'][0])))
+                client['fixed_fps'] = True
+            if 'scale' in query:
+                client['scale'] = self._nearest_scale(float(query['scale'][0]))
+                client['fixed_scale'] = True
+        except ValueError:
+            return None
+        return client
+
+    def _stream(self, handler, query):
+        """Roda na thread da requisição: envia o JPEG mais novo no ritmo deste cliente"""
+        client = self._new_client(handler, query)
+        if client is None:
+            handler._reply(400, 'application/json', b'{"error": "fps/scale devem ser numericos"}')
+            return
+        handler.send_response(200)
+        handler.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+        handler.send_header('Cache-Control', 'no-cache')
+        handler.end_headers()
+
+        self._register(client)
+        last_seq = 0
+        try:
+            while self._running:
+                frame_start = time.perf_counter()
+                with self._new_jpeg:
+                    self._new_jpeg.wait_for(
+                        lambda: not self._running or self._encoded.get(client['scale'], (0,))[0] > last_seq,
+                        timeout=1.0)
+                    entry = self._encoded.get(client['scale'])
+                if entry is None or entry[0] <= last_seq:
+                    continue
+                last_seq, jpeg = entry
+
+                start = time.perf_counter()
+                handler.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                    f"Content-Length: {len(jpeg)}\r\n\r\n".encode('ascii') + jpeg + b"\r\n")
+                self._adapt(client, time.perf_counter() - start)
+                client['sent'] += 1
+                client['bytes'] += len(jpeg)
+
+                # Espera o próximo intervalo deste cliente (os frames publicados no meio são pulados)
+                remaining = 1.0 / client['fps'] - (time.perf_counter() - frame_start)
+                if remaining > 0:
+                    time.sleep(remaining)
+        except OSError:  # Cliente fechou a conexão ou ficou parado além do timeout
+            self.stats['disconnects'] += 1
+        finally:
+            self._unregister(client)
+
+    def _adapt(self, client, send_time):
+        """Ajusta fps e resolução pelo tempo de escrita no socket (média móvel)"""
+        client['send_avg'] = send_time if not client['samples'] else 0.8 * client['send_avg'] + 0.2 * send_time
+        client['samples'] += 1
+        interval = 1.0 / client['fps']
+        scale_index = self.scales.index(client['scale'])
+
+        comfortable = max(self.min_fps, self.max_fps / 2)
+        if client['send_avg'] > 0.5 * interval:
+            # Cliente não acompanha: fps até a metade, depois resolução, depois fps até o mínimo
+            client['fast_frames'] = 0
+            if not client['fixed_fps'] and client['fps'] > comfortable:
+                self._set_client(client, fps=max(comfortable, client['fps'] * 0.7))
+            elif not client['fixed_scale'] and scale_index < len(self.scales) - 1:
+                self._set_client(client, scale=self.scales[scale_index + 1])
+            elif not client['fixed_fps'] and client['fps'] > self.min_fps:
+                self._set_client(client, fps=max(self.min_fps, client['fps'] * 0.7))
+        elif client['send_avg'] < 0.1 * interval:
+            client['fast_frames'] += 1
+            if client['fast_frames'] >= self.adapt_frames:
+                # Recupera na ordem inversa
+                client['fast_frames'] = 0
+                if not client['fixed_fps'] and client['fps'] < comfortable:
+                    self._set_client(client, fps=min(comfortable, client['fps'] * 1.25))
+                elif not client['fixed_scale'] and scale_index > 0:
+                    self._set_client(client, scale=self.scales[scale_index - 1])
+                elif not client['fixed_fps'] and client['fps'] < self.max_fps:
+                    self._set_client(client, fps=min(self.max_fps, client['fps'] * 1.25))
+        else:
+            client['fast_frames'] = 0
+
+    def _set_client(self, client, fps=None, scale=None):
+        with self._lock:
+            if fps is not None:
+                client['fps'] = fps
+            if scale is not None:
+                self._use_level(client['scale'], -1)
+                self._use_level(scale, 1)
+                client['scale'] = scale
+                client['samples'] = 0  # A média recomeça na nova resolução
+            self._update_rate()
+
+    def _snapshot(self, timeout=2.0):
+        """JPEG de um frame novo em resolução cheia (publicado porque há um cliente esperando)"""
+        client = {'id': -next(self._client_ids), 'fps': self.max_fps, 'scale': self.scales[0]}
+        self._register(client)
+        try:
+            with self._new_jpeg:
+                self._new_jpeg.wait_for(lambda: not self._running or client['scale'] in self._encoded, timeout)
+                entry = self._encoded.get(client['scale'])
+        finally:
+            self._unregister(client)
+        return entry[1] if entry else None
+
+    # ------------------------------
+    # CICLO DE VIDA E ESTATÍSTICAS
+    # ------------------------------
+    def _serve(self):
+        pin_io_thread()  # As threads dos clientes herdam a afinidade de E/S
+        self.server.serve_forever()
+
+    def start(self):
+        self._encoder = threading.Thread(target=self._encode_loop, name="preview-jpeg", daemon=True)
+        self._encoder.start()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._lock:
+            self._running = False
+            self._new_frame.notify_all()
+            self._new_jpeg.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
+        if self._encoder:
+            self._encoder.join(1.0)
+
+    def get_stats(self):
+        with self._lock:
+            clients = [
+                {'address': c['address'], 'fps': round(c['fps'], 2), 'scale': c['scale'], 'sent': c['sent'],
+                 'mb_sent': round(c['bytes'] / (1024 * 1024), 2), 'send_avg_ms': round(c['send_avg'] * 1000, 2),
+                 'connected_s': round(time.time() - c['connected_at'], 1)}
+                for c in self._clients.values() if c['id'] > 0
+            ]
+            stats = dict(self.stats, viewers=len(clients), clients=clients, levels=sorted(self._levels))
+        stats['publish_avg_us'] = stats['publish_time'] / stats['published'] * 1e6 if stats['published'] else 0.0
+        stats['encode_avg_ms'] = stats['encode_time'] / stats['encoded'] * 1000 if stats['encoded'] else 0.0
+        return stats
+
+
+def print_preview_stats(stats):
+    print(f"[INFO] Preview: {stats['published']} frames publicados ({stats['publish_avg_us']:.1f}us no laço) | "
+          f"{stats['replaced']} substituídos antes de codificar | JPEG {stats['encode_avg_ms']:.2f}ms | "
+          f"{stats['clients_total']} clientes ({stats['disconnects']} desconexões)")
@@ -0,0 +1,183 @@
+"""
+Replay de gravações de detecções no tracker e no logger (sem modelo e sem câmera)
+
+Alimenta CubeDetector.update_tracking e o CubeTimeLogger com as detecções
+gravadas pelo detector (--record), usando os timestamps originais, os frames
+em que o YOLO foi pulado e os resultados gravados do teste de presença (sem a
+imagem ele não pode ser refeito). Nada espera o relógio, então uma gravação de
+minutos roda em milissegundos. A saída (cubos
+e grupos com seus tempos) pode ser comparada com uma saída de referência:
+
+    python replay.py gravacao.cdl                                # mostra cubos e grupos
+    python replay.py gravacao.cdl --update-golden gravacao.json  # grava a referência
+    python replay.py gravacao.cdl --golden gravacao.json         # compara (sai com 1 se divergir)
+    python replay.py gravacao.cdl --reclassify                   # recalcula a cor pelos recortes
+    python replay.py --synthetic sintetico.cdl                   # gera uma gravação sintética
+
+Para gravar no detector:
+    python webcam_detect_adaptive.py --record gravacao.cdl [--record-crops]
+"""
+import argparse
+import contextlib
+import io
+import json
+import random
+import sys
+import time
+
+from cube_time_logger import CubeTimeLogger
+from detection_log import DetectionRecorder, read_detection_log
+from history_store import COLORS
+from webcam_detect_adaptive import CubeDetector
+
+# Diferença máxima aceita entre tempos do replay e da referência (s)
+TIME_TOLERANCE = 1e-6
+
+
+class ReplayLogger(CubeTimeLogger):
+    """Logger sem API nem histórico em disco que guarda cubos e grupos para comparação"""
+
+    def __init__(self):
+        super().__init__(history_dir=None)
+        self.enable_api_send = False
+        self.replay_cubes = []
+        self.replay_groups = []
+
+    def add_cube(self, color, individual_time, flow='default', now=None):
+        self.replay_cubes.append({'color': color, 'time': individual_time, 'exit_at': now})
+        super().add_cube(color, individual_time, flow, now)
+
+    def finalize_group(self, cubes=None):
+        groups_before = self.totals['groups']
+        super().finalize_group(cubes)
+        if self.totals['groups'] > groups_before:
+            group = self.all_groups[-1]
+            self.replay_groups.append({
+                'colors': [cube['color'] for cube in group['cubes']],
+                'total_time': group['total_group_time']
+            })
+
+
+def replay(frames, reclassify=False):
+    """Roda uma gravação pelo tracker e logger e retorna {'cubes', 'groups', 'frames'}"""
+    detector = CubeDetector(None)
+    logger = ReplayLogger()
+    detector.attach_logger(logger)
+    start = frames[0][0] if frames else 0.0
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for timestamp, detections, inference, presence in frames:
+            if not reclassify:
+                detections = [{k: v for k, v in d.items() if k != 'crop'} for d in detections]
+            logger.expire_groups(timestamp)
+            # Sem imagem: frames sem inferência e testes de presença vêm da gravação
+            detector.update_tracking(detections, timestamp, inference=inference, presence=presence)
+            # O logger roda na thread do barramento: espera os cubos do frame (replay determinístico)
+            detector.events.drain()
+        detector.events.close()
+
+    return {
+        'frames': len(frames),
+        'duration': frames[-1][0] - start if frames else 0.0,
+        'cubes': [
+            {'color': c['color'], 'time': round(c['time'], 6), 'exit_at': round(c['exit_at'] - start, 6)}
+            for c in logger.replay_cubes
+        ],
+        'groups': [
+            {'colors': g['colors'], 'total_time': round(g['total_time'], 6)}
+            for g in logger.replay_groups
+        ]
+    }
+
+
+def diff_results(result, golden, tolerance=TIME_TOLERANCE):
+    """Lista as diferenças entre o replay e a referência (vazia = iguais)"""
+    differences = []
+    for section, time_keys in (('cubes', ('time', 'exit_at')), ('groups', ('total_time',))):
+        current, expected = result[section], golden.get(section, [])
+        if len(current) != len(expected):
+            differences.append(f"{section}: {len(current)} no replay, {len(expected)} na referência")
+        for i, (got, want) in enumerate(zip(current, expected)):
+            for key in want:
+                if key in time_keys:
+                    if abs(got.get(key, float('inf')) - want[key]) > tolerance:
+                        differences.append(f"{section}[{i}].{key}: {got.get(key)} != {want[key]}")
+                elif got.get(key) != want[key]:
+                    differences.append(f"{section}[{i}].{key}: {got.get(key)} != {want[key]}")
+    return differences
+
+
+def make_synthetic_log(path, cubes=30, fps=30.0, seed=0):
+    """Gera uma gravação com cubos passando um a um (cor já classificada)"""
+    rng = random.Random(seed)
+    timestamp = 1000.0
+    with DetectionRecorder(path) as recorder:
+        for i in range(cubes):
+            color = COLORS[i % len(COLORS)]
+            bbox = (200 + rng.randint(-20, 20), 150 + rng.randint(-20, 20), 300, 250)
+            for _ in range(int(rng.uniform(2.0, 6.0) * fps)):
+                # Falhas esporádicas de detecção, como no YOLO real
+                detections = [] if rng.random() < 0.05 else [
+                    {'bbox': bbox, 'confidence': 0.9, 'color': color, 'color_conf': 0.6}
+                ]
+                recorder.write_frame(timestamp, detections)
+                timestamp += 1 / fps
+            # Esteira vazia até o próximo cubo (passa do cooldown da cor)
+            for _ in range(int(rng.uniform(0.5, 1.5) * fps)):
+                recorder.write_frame(timestamp, [])
+                timestamp += 1 / fps
+        frames = recorder.frames
+    print(f"[INFO] Gravação sintética: {frames} frames, {cubes} cubos em {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay de gravações de detecções no tracker")
+    parser.add_argument('log', help="arquivo .cdl gravado com --record (ou destino de --synthetic)")
+    parser.add_argument('--golden', help="saída de referência para comparar")
+    parser.add_argument('--update-golden', metavar='ARQUIVO', help="grava a saída como referência")
+    parser.add_argument('--reclassify', action='store_true',
+                        help="recalcula a cor a partir dos recortes gravados (--record-crops)")
+    parser.add_argument('--repeat', type=int, default=1, help="repetições para medir velocidade")
+    parser.add_argument('--synthetic', action='store_true', help="gera uma gravação sintética em LOG")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        make_synthetic_log(args.log)
+        return
+
+    frames = read_detection_log(args.log)
+    elapsed = []
+    for _ in range(max(1, args.repeat)):
+        start = time.perf_counter()
+        result = replay(frames, args.reclassify)
+        elapsed.append(time.perf_counter() - start)
+    best = min(elapsed)
+    speedup = result['duration'] / best if best > 0 else float('inf')
+    print(f"[INFO] {result['frames']} frames ({result['duration']:.1f}s gravados) em {best * 1000:.1f}ms "
+          f"- {speedup:.0f}x o tempo real")
+    print(f"[INFO] Cubos: {len(result['cubes'])} | grupos: {len(result['groups'])}")
+
+    if args.update_golden:
+        with open(args.update_golden, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"💾 Referência salva em {args.update_golden}")
+
+    if args.golden:
+        with open(args.golden) as f:
+            golden = json.load(f)
+        differences = diff_results(result, golden)
+        if differences:
+            print(f"❌ {len(differences)} diferença(s) em relação a {args.golden}:")
+            for line in differences[:50]:
+                print(f"   {line}")
+            sys.exit(1)
+        print(f"✅ Replay igual à referência {args.golden}")
+    elif not args.update_golden:
+        for cube in result['cubes']:
+            print(f"   cubo {cube['color']:<7} {cube['time']:7.2f}s (saída em {cube['exit_at']:.2f}s)")
+        for group in result['groups']:
+            print(f"   grupo {group['colors']} {group['total_time']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+"""
+Gerência de CPU dos workers do detector
+
+Torch, OpenCV e a BLAS do NumPy criam, cada um, um pool com uma thread por
+núcleo. Com mais de um detector (ou o painel) na mesma máquina os pools
+disputam os mesmos núcleos e a latência por frame oscila. Este módulo:
+- divide os núcleos entre os workers de detecção e um grupo reservado para
+  threads de E/S (envio para a API, observador de configuração, captura)
+- limita as threads de torch/OpenCV/BLAS de cada worker ao seu grupo de núcleos
+- fixa a afinidade de todas as threads do processo e move as threads de E/S
+  para o grupo reservado
+- define as variáveis da BLAS antes do import do NumPy (limit_blas_env), já
+  que OpenBLAS/MKL só as leem ao carregar
+- no modo --autotune mede a latência p95 por frame para várias contagens de
+  threads e grava a melhor em resources.json, usada nas execuções seguintes
+
+Uso:
+    python resources.py                         # mostra o plano de núcleos desta máquina
+    python resources.py --autotune              # procura a melhor combinação e grava resources.json
+    python resources.py --autotune --workers 2  # idem, para dois detectores na mesma máquina
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+from config import RESOURCES_FILE, IO_RESERVED_CORES
+
+try:
+    import psutil
+except ImportError:  # Opcional: só é usado para afinidade fora do Linux
+    psutil = None
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:  # Opcional: sem ele a BLAS só respeita as variáveis de ambiente
+    threadpool_limits = None
+
+BLAS_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                 'NUMEXPR_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS')
+
+# Configuração aplicada neste processo (lida pelos hooks de torch e das threads de E/S)
+_applied = {'torch_threads': None, 'io_cores': None, 'blas_env': None}
+
+
+def available_cores():
+    """Núcleos que este processo pode usar"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    if psutil is not None:
+        try:
+            return sorted(psutil.Process().cpu_affinity())
+        except (AttributeError, psutil.Error):
+            pass
+    return list(range(os.cpu_count() or 1))
+
+
+def plan_cores(workers=1, io_cores=IO_RESERVED_CORES, cores=None):
+    """Divide os núcleos em {'io': [...], 'workers': [[...], ...]}
+
+    Os últimos `io_cores` núcleos ficam para E/S; o resto é repartido em blocos
+    contíguos entre os workers. Se não houver núcleos suficientes os grupos são
+    compartilhados em vez de deixar um worker sem núcleo.
+    """
+    cores = sorted(cores if cores is not None else available_cores())
+    if len(cores) <= io_cores:
+        return {'io': cores, 'workers': [cores] * workers}
+
+    io = cores[len(cores) - io_cores:] if io_cores else []
+    compute = cores[:len(cores) - io_cores]
+    if workers >= len(compute):
+        return {'io': io, 'workers': [[compute[i % len(compute)]] for i in range(workers)]}
+
+    size, extra = divmod(len(compute), workers)
+    groups, start = [], 0
+    for i in range(workers):
+        end = start + size + (1 if i < extra else 0)
+        groups.append(compute[start:end])
+        start = end
+    return {'io': io, 'workers': groups}
+
+
+def load_resources(path=RESOURCES_FILE):
+    """Lê a configuração gravada pelo autotune ({} se não houver)"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def limit_blas_env(settings=None):
+    """Define as variáveis da BLAS antes do primeiro import do NumPy/OpenCV
+
+    OpenBLAS/MKL leem OMP_NUM_THREADS & cia. uma única vez, ao carregar; por isso
+    os pontos de entrada chamam esta função antes de importar numpy/cv2. Depois
+    do import só o threadpoolctl consegue mudar o pool (ver set_blas_threads).
+    """
+    settings = load_resources() if settings is None else settings
+    n = settings.get('blas_threads') or 1
+    for name in BLAS_ENV_VARS:
+        os.environ[name] = str(n)
+    if 'numpy' not in sys.modules:
+        _applied['blas_env'] = n
+    return n
+
+
+def set_blas_threads(n):
+    """Limita a BLAS já carregada (threadpoolctl) e a dos processos filhos (variáveis de ambiente)"""
+    for name in BLAS_ENV_VARS:
+        os.environ[name] = str(n)
+    if threadpool_limits is not None:
+        threadpool_limits(n)
+    elif 'numpy' in sys.modules and _applied['blas_env'] != n:
+        print(f"[WARN] BLAS já carregada sem threadpoolctl: limite de {n} thread(s) vale só para processos filhos")
+
+
+def set_cv2_threads(n):
+    import cv2
+    cv2.setNumThreads(n)
+
+
+def set_torch_threads(n):
+    """Aplica no torch se ele já foi importado; senão fica para apply_torch_threads()"""
+    _applied['torch_threads'] = n
+    if 'torch' in sys.modules:
+        apply_torch_threads()
+
+
+def apply_torch_threads():
+    """Chamado logo depois do import do ultralytics/torch (ver startup.load_model)"""
+    n = _applied['torch_threads']
+    if n is None or 'torch' not in sys.modules:
+        return
+    torch = sys.modules['torch']
+    torch.set_num_threads(n)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # Só pode ser alterado antes do primeiro trabalho paralelo
+
+
+def _thread_ids():
+    """Ids nativos de todas as threads do processo (Linux); [0] = só a atual"""
+    try:
+        return [int(tid) for tid in os.listdir('/proc/self/task')]
+    except OSError:
+        return [0]
+
+
+def pin_process(cores):
+    """Fixa todas as threads do processo (e as criadas depois) nos núcleos dados
+
+    No Linux sched_setaffinity(0) vale só para a thread que chama; as threads
+    já iniciadas (pools do torch/OpenCV, E/S) são fixadas uma a uma pelo
+    /proc/self/task. Threads novas herdam a afinidade de quem as cria.
+    """
+    try:
+        if hasattr(os, 'sched_setaffinity'):
+            for tid in _thread_ids():
+                try:
+                    os.sched_setaffinity(tid, cores)
+                except ProcessLookupError:
+                    pass  # Thread terminou entre a listagem e a chamada
+        elif psutil is not None:
+            psutil.Process().cpu_affinity(list(cores))
+        else:
+            return False
+        return True
+    except (OSError, ValueError, AttributeError) as e:
+        print(f"[WARN] Não foi possível fixar afinidade em {cores}: {e}")
+        return False
+
+
+def pin_current_thread(cores):
+    """Fixa só a thread atual (suportado no Linux)"""
+    if not hasattr(os, 'sched_setaffinity'):
+        return False
+    try:
+        os.sched_setaffinity(threading.get_native_id(), cores)
+        return True
+    except OSError:
+        return False
+
+
+def pin_io_thread():
+    """Move a thread atual para os núcleos de E/S do plano aplicado (se houver)"""
+    if _applied['io_cores']:
+        pin_current_thread(_applied['io_cores'])
+
+
+def apply_worker_resources(role='detector', index=0, workers=1, settings=None):
+    """Aplica threads e afinidade ao processo atual
+
+    `role` = 'detector' (usa o grupo `index` do plano) ou 'io' (grupo reservado).
+    `settings` vem do autotune (resources.json); contagens ausentes usam o
+    tamanho do grupo de núcleos.
+    """
+    settings = load_resources() if settings is None else settings
+    plan = plan_cores(workers, settings.get('io_cores', IO_RESERVED_CORES))
+    cores = plan['io'] if role == 'io' else plan['workers'][index % len(plan['workers'])]
+    if not cores:
+        cores = available_cores()
+
+    torch_threads = min(settings.get('torch_threads') or len(cores), len(cores))
+    cv2_threads = min(settings.get('cv2_threads') or len(cores), len(cores))
+    blas_threads = min(settings.get('blas_threads') or 1, len(cores))
+
+    set_blas_threads(blas_threads)
+    set_cv2_threads(cv2_threads)
+    if role == 'detector':
+        set_torch_threads(torch_threads)
+    pinned = pin_process(cores)
+    _applied['io_cores'] = plan['io'] or None
+
+    applied = {
+        'role': role, 'index': index, 'cores': cores, 'io_cores': plan['io'], 'pinned': pinned,
+        'torch_threads': torch_threads if role == 'detector' else None,
+        'cv2_threads': cv2_threads, 'blas_threads': blas_threads
+    }
+    print(f"[INFO] Recursos ({role} {index}): núcleos {cores}{'' if pinned else ' (sem afinidade)'} | "
+          f"torch {applied['torch_threads']} | OpenCV {cv2_threads} | BLAS {blas_threads} | "
+          f"E/S {plan['io']}")
+    return applied
+
+
+# -------------------------------
+# AUTOTUNE
+# -------------------------------
+def _thread_candidates(max_threads):
+    candidates, n = [], 1
+    while n < max_threads:
+        candidates.append(n)
+        n *= 2
+    candidates.append(max_threads)
+    return candidates
+
+
+def _measure_frame_latency(detector, frames, n_frames, use_model):
+    """Latências (ms) do processamento completo de cada frame"""
+    import numpy as np
+    latencies = []
+    current_time = 1000.0
+    for i in range(n_frames):
+        _, frame, boxes = frames[i % len(frames)]
+        t0 = time.perf_counter()
+        if use_model:
+            detector.detect_cubes(frame, current_time)
+        else:
+            detections = [{'bbox': bbox, 'confidence': 0.9, 'frame': frame} for bbox in boxes]
+            detector.update_tracking(detections, current_time)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        current_time += 1 / 30
+    return np.array(latencies)
+
+
+def autotune(model_path=None, workers=1, n_frames=150, output=RESOURCES_FILE):
+    """Procura as contagens de threads com menor latência p95 por frame e grava o resultado"""
+    import contextlib
+    import io
+    limit_blas_env({'blas_threads': 1})  # O autotune mede sempre com BLAS em 1 thread
+    import numpy as np
+    from benchmark_hotpaths import load_dataset_frames, make_synthetic_frames
+    from webcam_detect_adaptive import CubeDetector
+
+    plan = plan_cores(workers)
+    cores = plan['workers'][0]
+    pin_process(cores)
+    print(f"[INFO] Autotune no grupo de núcleos {cores} ({workers} worker(s), E/S em {plan['io']})")
+
+    frames = load_dataset_frames() or make_synthetic_frames()
+    use_model = model_path is not None
+    detector = CubeDetector(model_path)  # Sem logger: nada é agrupado nem enviado
+    if not use_model:
+        print("[WARN] Sem modelo: mede só cor + tracking (threads do torch não são avaliadas)")
+
+    torch_options = _thread_candidates(len(cores)) if use_model else [None]
+    cv2_options = _thread_candidates(len(cores))
+    results = []
+    for torch_threads in torch_options:
+        for cv2_threads in cv2_options:
+            if torch_threads is not None:
+                set_torch_threads(torch_threads)
+            set_cv2_threads(cv2_threads)
+            set_blas_threads(1)
+            with contextlib.redirect_stdout(io.StringIO()):
+                _measure_frame_latency(detector, frames, 10, use_model)  # aquecimento
+                latencies = _measure_frame_latency(detector, frames, n_frames, use_model)
+            result = {
+                'torch_threads': torch_threads, 'cv2_threads': cv2_threads, 'blas_threads': 1,
+                'p50_ms': float(np.percentile(latencies, 50)),
+                'p95_ms': float(np.percentile(latencies, 95))
+            }
+            results.append(result)
+            print(f"  torch {str(torch_threads):>4} | OpenCV {cv2_threads:>3} | "
+                  f"p50 {result['p50_ms']:7.2f}ms | p95 {result['p95_ms']:7.2f}ms")
+
+    best = min(results, key=lambda r: r['p95_ms'])
+    settings = {
+        'torch_threads': best['torch_threads'],
+        'cv2_threads': best['cv2_threads'],
+        'blas_threads': best['blas_threads'],
+        'io_cores': IO_RESERVED_CORES,
+        'workers': workers,
+        'p95_ms': best['p95_ms'],
+        'model_path': model_path,
+        'machine': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': results
+    }
+    with open(output, 'w') as f:
+        json.dump(settings, f, indent=2)
+    print(f"✅ Melhor: torch {best['torch_threads']} | OpenCV {best['cv2_threads']} | "
+          f"p95 {best['p95_ms']:.2f}ms - salvo em {output}")
+    return settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plano de núcleos e autotune de threads do detector")
+    parser.add_argument('--autotune', action='store_true', help="mede e grava a melhor combinação de threads")
+    parser.add_argument('--workers', type=int, default=1, help="detectores rodando na mesma máquina")
+    parser.add_argument('--model', default=None, help="modelo YOLO usado no autotune (sem ele mede só cor + tracking)")
+    parser.add_argument('--frames', type=int, default=150, help="frames medidos por combinação")
+    parser.add_argument('--output', default=RESOURCES_FILE)
+    args = parser.parse_args()
+
+    if args.autotune:
+        autotune(args.model, args.workers, args.frames, args.output)
+        return
+
+    plan = plan_cores(args.workers)
+    print(f"Núcleos disponíveis: {available_cores()}")
+    for i, cores in enumerate(plan['workers']):
+        print(f"  detector {i}: {cores}")
+    print(f"  E/S: {plan['io']}")
+    settings = load_resources(args.output)
+    if settings:
+        print(f"Configuração salva: torch {settings.get('torch_threads')} | OpenCV {settings.get('cv2_threads')} | "
+              f"BLAS {settings.get('blas_threads')} (p95 {settings.get('p95_ms', 0):.2f}ms)")
+    else:
+        print(f"Sem {args.output} - rode com --autotune")
+
+
+if __name__ == "__main__":
+    main()
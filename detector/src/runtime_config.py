@@ -0,0 +1,249 @@
+"""
+Configuração recarregável em tempo de execução com perfis por estação
+
+Os valores padrão continuam em config.py. O arquivo station_profiles.json
+sobrescreve parte deles, nesta ordem de prioridade (a última vence):
+
+    config.py  <  "default"  <  "stations"[estação]  <  "stations"[estação]["cameras"][câmera]
+
+Exemplo (ver station_profiles.example.json):
+
+    {
+      "default": {"MIN_EXIT_DURATION": 0.3},
+      "stations": {
+        "linha-1": {
+          "COOLDOWN_DURATION": 1.5,
+          "cameras": {"1": {"COLOR_RANGES": {"blue": [[100, 70, 70], [130, 255, 255]]}}}
+        }
+      }
+    }
+
+O ConfigWatcher verifica o arquivo em segundo plano; cada versão nova é validada
+por completo antes de ficar disponível e é aplicada pelo laço principal entre
+dois frames (troca de referência + atribuição de atributos).
+"""
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+
+import config
+from resources import pin_io_thread
+
+
+def _number_in(minimum, maximum=None, exclusive_min=False):
+    def validate(name, value):
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            raise ValueError(f"{name} deve ser numérico (recebido {value!r})")
+        if value < minimum or (exclusive_min and value == minimum) or (maximum is not None and value > maximum):
+            limit = f"> {minimum}" if exclusive_min else f">= {minimum}"
+            if maximum is not None:
+                limit += f" e <= {maximum}"
+            raise ValueError(f"{name} deve ser {limit} (recebido {value!r})")
+        return float(value)
+    return validate
+
+
+def _url(name, value):
+    if not isinstance(value, str) or not value.startswith(('http://', 'https://')):
+        raise ValueError(f"{name} deve ser uma URL http(s) (recebido {value!r})")
+    return value.rstrip('/')
+
+
+def _color_ranges(name, value):
+    if not isinstance(value, dict):
+        raise ValueError(f"{name} deve ser um objeto {{cor: [[h, s, v], [h, s, v]]}}")
+    ranges = {}
+    for color, bounds in value.items():
+        if color not in config.COLOR_RANGES:
+            raise ValueError(f"{name}: cor desconhecida {color!r}")
+        try:
+            lower, upper = [list(map(int, b)) for b in bounds]
+        except (TypeError, ValueError):
+            raise ValueError(f"{name}.{color} deve ser [[h, s, v], [h, s, v]]")
+        if len(lower) != 3 or len(upper) != 3:
+            raise ValueError(f"{name}.{color} deve ter 3 valores por limite")
+        for low, high, maximum in zip(lower, upper, (180, 255, 255)):
+            if not 0 <= low <= high <= maximum:
+                raise ValueError(f"{name}.{color}: limites fora de ordem ou de 0..{maximum}: {bounds}")
+        ranges[color] = (lower, upper)
+    return ranges
+
+
+# Chaves que podem ser alteradas por perfil: nome -> validador
+SCHEMA = {
+    'MAX_MISSED_DURATION': _number_in(0, exclusive_min=True),
+    'MIN_EXIT_DURATION': _number_in(0, exclusive_min=True),
+    'PRESENCE_EXIT_DURATION': _number_in(0, exclusive_min=True),
+    'PRESENCE_DIFF_THRESHOLD': _number_in(0, 255, exclusive_min=True),
+    'COOLDOWN_DURATION': _number_in(0),
+    'MIN_DETECTION_DURATION': _number_in(0),
+    'COLOR_CONFIDENCE_THRESHOLD': _number_in(0, 1),
+    'EXPECTED_CUBE_TIME': _number_in(0, exclusive_min=True),
+    'TOLERANCE': _number_in(0),
+    'API_BASE_URL': _url,
+    'COLOR_RANGES': _color_ranges,
+}
+
+
+def default_values():
+    """Valores de config.py para todas as chaves recarregáveis"""
+    values = {name: getattr(config, name) for name in SCHEMA}
+    values['COLOR_RANGES'] = {c: (list(l), list(u)) for c, (l, u) in config.COLOR_RANGES.items()}
+    return values
+
+
+def _apply_overrides(values, overrides, source):
+    """Valida e aplica um bloco de sobrescritas sobre `values`"""
+    if not isinstance(overrides, dict):
+        raise ValueError(f"{source}: esperado um objeto JSON")
+    for name, raw in overrides.items():
+        if name == 'cameras':
+            continue
+        if name not in SCHEMA:
+            raise ValueError(f"{source}: chave desconhecida {name!r}")
+        value = SCHEMA[name](f"{source}.{name}", raw)
+        if name == 'COLOR_RANGES':
+            # Ranges são mesclados por cor: o perfil só precisa listar as cores alteradas
+            merged = dict(values['COLOR_RANGES'])
+            merged.update(value)
+            value = merged
+        values[name] = value
+
+
+def resolve_profile(data, station_id=None, camera_id=None):
+    """Monta a configuração final de uma estação/câmera a partir do JSON de perfis"""
+    values = default_values()
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        raise ValueError("Arquivo de perfis: esperado um objeto JSON")
+    unknown = set(data) - {'default', 'stations'}
+    if unknown:
+        raise ValueError(f"Seções desconhecidas no arquivo de perfis: {sorted(unknown)}")
+
+    _apply_overrides(values, data.get('default', {}), 'default')
+    stations = data.get('stations', {})
+    if not isinstance(stations, dict):
+        raise ValueError("stations: esperado um objeto JSON")
+    station = None
+    if station_id is not None:
+        station = stations.get(str(station_id))
+        if station is None:
+            print(f"[WARN] Estação {station_id!r} sem perfil - usando padrão")
+    if station is not None:
+        _apply_overrides(values, station, f"stations.{station_id}")
+        cameras = station.get('cameras', {})
+        if not isinstance(cameras, dict):
+            raise ValueError(f"stations.{station_id}.cameras: esperado um objeto JSON")
+        camera = cameras.get(str(camera_id)) if camera_id is not None else None
+        if camera is not None:
+            _apply_overrides(values, camera, f"stations.{station_id}.cameras.{camera_id}")
+
+    values['EXPECTED_GROUP_TIME'] = values['EXPECTED_CUBE_TIME'] * 3
+    return values
+
+
+class RuntimeConfig:
+    """Snapshot imutável de uma versão validada da configuração"""
+
+    def __init__(self, values, version, source):
+        self.values = MappingProxyType(dict(values))
+        self.version = version
+        self.source = source
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+    def get(self, name, default=None):
+        return self.values.get(name, default)
+
+
+class ConfigWatcher:
+    """Observa o arquivo de perfis e prepara novas versões validadas em segundo plano
+
+    O laço principal chama poll() entre frames; se houver versão nova ela é
+    devolvida uma única vez para ser aplicada no detector e no logger.
+    """
+
+    def __init__(self, path=config.STATION_PROFILES_FILE, station_id=None, camera_id=None,
+                 interval=config.CONFIG_WATCH_INTERVAL):
+        self.path = path
+        self.station_id = station_id
+        self.camera_id = camera_id
+        self.interval = interval
+        self.current = None
+        self._pending = None
+        self._pending_lock = threading.Lock()  # load() roda na thread do watcher, poll() no laço
+        self._mtime = None
+        self._version = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self.load()  # Primeira versão fica pendente até o primeiro poll()
+
+    def _read_file(self):
+        if not os.path.exists(self.path):
+            return None, None
+        mtime = os.path.getmtime(self.path)
+        with open(self.path, encoding='utf-8') as f:
+            return json.load(f), mtime
+
+    def load(self):
+        """Lê e valida o arquivo; em caso de erro mantém a versão atual"""
+        try:
+            data, mtime = self._read_file()
+            values = resolve_profile(data, self.station_id, self.camera_id)
+        except (OSError, ValueError) as e:
+            print(f"❌ Configuração inválida em {self.path} - mantendo versão atual: {e}")
+            try:
+                self._mtime = os.path.getmtime(self.path)
+            except OSError:
+                pass
+            return False
+
+        self._mtime = mtime
+        self._version += 1
+        source = self.path if data is not None else 'config.py'
+        with self._pending_lock:
+            self._pending = RuntimeConfig(values, self._version, source)
+        return True
+
+    def _changed(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        return mtime != self._mtime
+
+    def _run(self):
+        pin_io_thread()
+        while not self._stop.wait(self.interval):
+            if self._changed():
+                self.load()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def poll(self):
+        """Retorna a nova versão pronta para aplicar (ou None). Chamar entre frames."""
+        with self._pending_lock:
+            pending, self._pending = self._pending, None
+        if pending is not None:
+            self.current = pending
+        return pending
+
+
+def apply_runtime_config(cfg, detector=None, logger=None):
+    """Aplica uma versão no detector e no logger e retorna o tempo gasto (s)"""
+    start = time.perf_counter()
+    if detector is not None:
+        detector.apply_config(cfg)
+    if logger is not None:
+        logger.apply_config(cfg)
+    return time.perf_counter() - start
@@ -0,0 +1,178 @@
+"""
+Inicialização rápida do detector
+
+- Carrega o modelo uma única vez (o import do ultralytics/torch só acontece aqui)
+- Lembra o último modelo que carregou com sucesso para tentá-lo logo no início
+- Abre as câmeras candidatas em paralelo enquanto o modelo carrega e aquece
+- Mede o tempo de cada etapa para mostrar onde a inicialização gasta tempo
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from config import STARTUP_CACHE_FILE
+from resources import apply_torch_threads
+
+CAMERA_IDS = [1, 0, 2, 3]
+FRAME_WIDTH = 640
+FRAME_HEIGHT = 480
+CAMERA_FPS = 30
+
+
+class StartupTimer:
+    """Registra a duração de cada etapa da inicialização"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, duration):
+        with self._lock:
+            self.phases[name] = duration
+
+    def measure(self, name):
+        """Context manager que mede o bloco e grava como etapa `name`"""
+        timer = self
+
+        class _Phase:
+            def __enter__(self):
+                self.t0 = time.perf_counter()
+
+            def __exit__(self, *exc):
+                timer.record(name, time.perf_counter() - self.t0)
+        return _Phase()
+
+    def report(self):
+        total = time.perf_counter() - self.start
+        print("\n=== TEMPO DE INICIALIZAÇÃO ===")
+        for name, duration in self.phases.items():
+            print(f"  {name:<28} {duration:6.2f}s")
+        print(f"  {'total (etapas em paralelo)':<28} {total:6.2f}s")
+        print("=" * 40)
+
+
+def load_model(model_path):
+    """Carrega um modelo YOLO (import adiado para não pesar em quem não usa o modelo)"""
+    from ultralytics import YOLO
+    apply_torch_threads()  # Limites de threads do worker valem assim que o torch existe
+    return YOLO(model_path)
+
+
+def warm_up_model(model, imgsz=None):
+    """Roda uma inferência num frame vazio para inicializar kernels e buffers"""
+    dummy = np.zeros((FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8)
+    if imgsz:
+        model(dummy, imgsz=imgsz, verbose=False)
+    else:
+        model(dummy, verbose=False)
+
+
+def read_last_good_model():
+    """Lê o caminho do último modelo carregado com sucesso"""
+    try:
+        with open(STARTUP_CACHE_FILE) as f:
+            return json.load(f).get('model_path')
+    except (OSError, ValueError):
+        return None
+
+
+def save_last_good_model(model_path):
+    try:
+        with open(STARTUP_CACHE_FILE, 'w') as f:
+            json.dump({'model_path': model_path, 'saved_at': time.strftime('%Y-%m-%dT%H:%M:%S')}, f)
+    except OSError as e:
+        print(f"[WARN] Não foi possível salvar cache de inicialização: {e}")
+
+
+def order_candidates(candidates, pinned=None):
+    """Ordena os candidatos: escolha do benchmark (pinned), último modelo bom, demais"""
+    ordered = [pinned] if pinned in candidates else []
+    last_good = read_last_good_model()
+    if last_good in candidates and last_good not in ordered:
+        ordered.append(last_good)
+    ordered += [path for path in candidates if path not in ordered]
+    return ordered
+
+
+def load_first_available_model(candidates, timer, imgsz_for=None):
+    """Tenta os candidatos em ordem, carregando cada modelo no máximo uma vez"""
+    for path in candidates:
+        if not os.path.exists(path):
+            print(f"[WARN] Modelo {path} não encontrado")
+            continue
+        # Só conta como carregado depois de aquecer (imgsz/backend que a exportação não aceita falham aqui)
+        try:
+            with timer.measure("carregar modelo"):
+                model = load_model(path)
+            with timer.measure("aquecer modelo"):
+                warm_up_model(model, imgsz_for(path) if imgsz_for else None)
+        except Exception as e:
+            print(f"[WARN] Modelo {path} não pôde ser carregado: {e}")
+            continue
+        save_last_good_model(path)
+        print(f"[INFO] Modelo carregado: {path}")
+        return path, model
+    return None, None
+
+
+def _open_camera(camera_id):
+    cap = cv2.VideoCapture(camera_id)
+    if cap.isOpened():
+        return cap
+    cap.release()
+    return None
+
+
+def probe_cameras(camera_ids=CAMERA_IDS):
+    """Abre as câmeras em paralelo e retorna (id, cap) da primeira disponível na ordem de prioridade"""
+    with ThreadPoolExecutor(max_workers=len(camera_ids)) as pool:
+        futures = {camera_id: pool.submit(_open_camera, camera_id) for camera_id in camera_ids}
+        opened = {camera_id: future.result() for camera_id, future in futures.items()}
+
+    chosen_id, chosen_cap = None, None
+    for camera_id in camera_ids:
+        cap = opened[camera_id]
+        if cap is None:
+            continue
+        if chosen_cap is None:
+            chosen_id, chosen_cap = camera_id, cap
+        else:
+            cap.release()
+
+    if chosen_cap is not None:
+        chosen_cap.set(cv2.CAP_PROP_FRAME_WIDTH, FRAME_WIDTH)
+        chosen_cap.set(cv2.CAP_PROP_FRAME_HEIGHT, FRAME_HEIGHT)
+        chosen_cap.set(cv2.CAP_PROP_FPS, CAMERA_FPS)
+        print(f"[INFO] Câmera aberta: ID {chosen_id}")
+    return chosen_id, chosen_cap
+
+
+def fast_startup(candidates, pinned=None, imgsz_for=None, camera_ids=CAMERA_IDS):
+    """Carrega o modelo em segundo plano enquanto procura a câmera
+
+    `pinned` é o modelo escolhido pelo benchmark (sempre tentado primeiro) e
+    `imgsz_for(path)` o tamanho de entrada usado no aquecimento de cada modelo.
+    Retorna (model_path, model, camera_id, cap, timer); model/cap são None se não houver.
+    """
+    timer = StartupTimer()
+    result = {}
+
+    def model_worker():
+        with timer.measure("modelo (thread)"):
+            ordered = order_candidates(candidates, pinned)
+            result['model_path'], result['model'] = load_first_available_model(ordered, timer, imgsz_for)
+
+    model_thread = threading.Thread(target=model_worker, daemon=True)
+    model_thread.start()
+
+    with timer.measure("câmeras (paralelo)"):
+        camera_id, cap = probe_cameras(camera_ids)
+
+    model_thread.join()
+    return result.get('model_path'), result.get('model'), camera_id, cap, timer
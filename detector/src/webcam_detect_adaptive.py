@@ -1,20 +1,72 @@
+import argparse
+from resources import limit_blas_env
+limit_blas_env()  # Antes do numpy/cv2: a BLAS só lê as variáveis ao carregar
 import cv2
-from ultralytics import YOLO
 import numpy as np
+import json
+import os
 import time
-from collections import defaultdict
+from collections import defaultdict, deque
 from cube_time_logger import create_logger
+from hud import HudRenderer
+from frame_rate import FrameRateMeter
+from color_cache import ColorCache
+from presence import PresenceChecker
+from resources import apply_worker_resources
+from startup import load_model, fast_startup
+from runtime_config import ConfigWatcher, apply_runtime_config
+from detection_log import DetectionRecorder
+from control_api import ControlServer, apply_control, new_control_state
+from evidence import EvidenceStore, print_evidence_stats
+from preview import PreviewServer, print_preview_stats
+from event_bus import (EventBus, print_event_stats, CANDIDATE_STARTED, CUBE_CONFIRMED,
+                       CANDIDATE_LOST, CUBE_EXITED, COOLDOWN_STARTED)
 from config import (
     COLOR_CONFIDENCE_THRESHOLD, MAX_DISTANCE_THRESHOLD, MAX_CUBES_SIMULTANEOUS,
-    MIN_STABILITY_FRAMES, MIN_DETECTION_DURATION, MIN_CONSECUTIVE_FRAMES,
-    MAX_MISSED_FRAMES, COOLDOWN_DURATION, MIN_EXIT_FRAMES
+    MIN_STABILITY_FRAMES, MIN_DETECTION_DURATION, MAX_MISSED_DURATION,
+    COOLDOWN_DURATION, MIN_EXIT_DURATION, MODEL_SELECTION_FILE, BASE_DIR,
+    DISPLAY_MODE, DISPLAY_FPS, COLOR_RANGES, STATION_PROFILES_FILE,
+    CUBE_HISTORY_LIMIT, CONTROL_API_PORT, EVIDENCE_DIR, COLOR_CACHE_ENABLED, PREVIEW_HOST, PREVIEW_PORT,
+    PRESENCE_ENABLED, PRESENCE_EXIT_DURATION, PRESENCE_MAX_HOLD, YOLO_SKIP_FRAMES
 )
 
+# Modelos tentados em ordem quando não há escolha feita pelo benchmark
+DEFAULT_MODEL_PATHS = [
+    "../runs-cube/yolov8n-cube5/weights/best.pt",
+    "../runs-cube/yolov8n-cube4/weights/best.pt",
+    "../runs-cube/yolov8n-cube3/weights/best.pt",
+    "../runs-cube/yolov8n-cube2/weights/best.pt",
+    "../runs-cube/yolov8n-cube/weights/best.pt"
+]
+
+# Cores BGR usadas no overlay para cada cor de cubo
+OVERLAY_COLORS = {
+    'white': (255, 255, 255),
+    'yellow': (0, 255, 255),
+    'red': (0, 0, 255),
+    'orange': (0, 165, 255),
+    'blue': (255, 0, 0),
+    'green': (0, 255, 0),
+    'unknown': (128, 128, 128)
+}
+
 class CubeDetector:
-    def __init__(self, model_path):
-        """Inicializa o detector de cubos com tracking por cor"""
-        self.model = YOLO(model_path)
+    def __init__(self, model_path, model=None):
+        """Inicializa o detector de cubos com tracking por cor
+
+        Se um modelo já carregado for passado em `model`, ele é reutilizado
+        (útil para benchmarks e para evitar carregar os pesos duas vezes).
+        Sem `model_path` nem `model`, o detector faz apenas cor e tracking
+        (ex.: processo de tracking alimentado pelo frame_bus).
+        """
+        if model is not None:
+            self.model = model
+        elif model_path:
+            self.model = load_model(model_path)
+        else:
+            self.model = None
         self.confidence = 0.5
+        self.imgsz = None  # Tamanho de entrada do modelo (None = padrão do modelo)
         
         # Mapeamento de cores para faces do cubo magico
         self.color_mapping = {
@@ -26,20 +78,12 @@ class CubeDetector:
             'green': 'Esquerda'
         }
         
-        # Ranges de cores em HSV com margens maiores para iluminação variável
-        self.color_ranges = {
-            'white': ([0, 0, 150], [180, 80, 255]),  # Margem maior para branco
-            'yellow': ([15, 80, 80], [35, 255, 255]),  # Margem expandida
-            'red': ([0, 80, 80], [15, 255, 255]),  # Margem expandida
-            'red2': ([165, 80, 80], [180, 255, 255]),  # Margem expandida
-            'orange': ([5, 80, 80], [25, 255, 255]),  # Margem expandida
-            'blue': ([95, 60, 60], [135, 255, 255]),  # Margem muito maior para azul
-            'green': ([35, 80, 80], [85, 255, 255])  # Margem expandida
-        }
+        # Ranges de cores em HSV (padrão do config.py, ajustáveis por perfil de estação)
+        self.color_ranges = {color: (list(lower), list(upper)) for color, (lower, upper) in COLOR_RANGES.items()}
         
         # Sistema de tracking por cor - cada cor e um cubo diferente
         self.active_cubes_by_color = {}  # {color: cube_data}
-        self.cube_history = []  # Historico de cubos que sairam
+        self.cube_history = deque(maxlen=CUBE_HISTORY_LIMIT)  # Ultimos cubos que sairam (historico completo no logger)
         self.color_total_times = defaultdict(float)  # Tempo total por cor
         
         # Parametros de tracking melhorados (usando configurações)
@@ -63,23 +107,54 @@ class CubeDetector:
         
         # Sistema de verificação de saída do cubo
         self.cube_exit_frames = {}  # {color: frames_sem_deteccao}
-        self.min_exit_frames = MIN_EXIT_FRAMES
+        self.min_exit_duration = MIN_EXIT_DURATION
+        
+        # Teste de presença na última caixa (ver presence.py) e frames sem inferência
+        self.presence = PresenceChecker() if PRESENCE_ENABLED else None
+        self.presence_exit_duration = PRESENCE_EXIT_DURATION
+        self.presence_max_hold = PRESENCE_MAX_HOLD
+        self.yolo_skip_frames = YOLO_SKIP_FRAMES
+        self.skipped_frames = 0
+        self.last_inference = True   # O último update_tracking teve inferência? (gravado com --record)
+        self.presence_results = {}   # {cor: True/False/None} do último frame (gravado com --record)
+        self.exit_stats = {'presence_exits': 0, 'frame_exits': 0, 'presence_holds': 0, 'skipped_inferences': 0}
         
         # Sistema de debounce temporal - só considera cor após tempo configurado
         self.color_detection_start = {}  # {color: first_detection_time}
         self.min_detection_duration = MIN_DETECTION_DURATION
         self.color_detection_frames = {}  # {color: frames_consecutivos_detectados}
-        self.min_consecutive_frames = MIN_CONSECUTIVE_FRAMES
-        self.max_missed_frames = MAX_MISSED_FRAMES
+        self.max_missed_duration = MAX_MISSED_DURATION
         self.color_missed_frames = {}  # {color: frames_perdidos_consecutivos}
         
         # Debug - mostra informacoes de deteccao
         self.debug_mode = True
         
+        # HUD com painéis de texto em cache (ver hud.py)
+        self.hud = HudRenderer()
+        
         # Modo de detecção rápida
         self.quick_detection_mode = False
         self.quick_detection_duration = 0.1  # 0.1 segundos para modo rápido
-        self.quick_detection_frames = 3  # 3 frames para modo rápido
+        
+        # Taxa de frames efetiva: converte as janelas de tempo em mínimos de frames
+        self.frame_rate = FrameRateMeter()
+        self.update_frame_windows()
+        
+        # Eventos do tracking (ver event_bus.py): o logger e outros consumidores assinam
+        # e rodam nas próprias threads; o laço da câmera só enfileira
+        self.events = EventBus()
+        self.logger = None  # Usado pelo overlay e pelos controles; recebe cubos pelo barramento
+        
+        # Recortes dos cubos na confirmação e na saída (opcional, ver evidence.py)
+        self.evidence = None
+        
+        # Reaproveita a cor de caixas paradas com pixels inalterados (ver color_cache.py)
+        self.color_cache = ColorCache() if COLOR_CACHE_ENABLED else None
+    
+    def attach_logger(self, logger):
+        """Assina o logger nos cubos que saem (fila com bloqueio: cubos não são descartados)"""
+        self.logger = logger
+        return self.events.subscribe('logger', logger.handle_event, kinds=(CUBE_EXITED,), policy='block')
         
     def detect_cube_color(self, frame, bbox):
         """Detecta a cor dominante do cubo com filtros de ruído melhorados"""
@@ -228,43 +303,48 @@ class CubeDetector:
         block_x = frame.shape[1] - block_width - 20  # 20px da borda direita
         block_y = 20  # 20px do topo
         
-        # Desenha fundo do bloco com transparência
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (block_x, block_y), (block_x + block_width, block_y + block_height), 
-                     (0, 0, 0), -1)  # Fundo preto
-        cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
-        
-        # Borda do bloco
-        cv2.rectangle(frame, (block_x, block_y), (block_x + block_width, block_y + block_height), 
-                     (255, 255, 255), 2)
-        
         # Título do bloco
-        title_y = block_y + 25
-        cv2.putText(frame, "TEMPOS TOTAIS POR COR", (block_x + 10, title_y),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-        
-        # Cores para cada linha
-        color_colors = {
-            'white': (255, 255, 255),
-            'yellow': (0, 255, 255),
-            'red': (0, 0, 255),
-            'orange': (0, 165, 255),
-            'blue': (255, 0, 0),
-            'green': (0, 255, 0)
-        }
+        lines = [("TEMPOS TOTAIS POR COR", (10, 25), 0.6, (255, 255, 255), 2)]
         
-        # Desenha cada cor com seu tempo total
-        y_offset = title_y + 30
+        # Desenha cada cor com seu tempo total (cor do texto baseada na cor do cubo)
+        y_offset = 55
         for color, total_time in detector.color_total_times.items():
-            face_name = detector.color_mapping.get(color, 'Desconhecida')
             text = f"{color.upper()}: {total_time:.1f}s"
-            
-            # Cor do texto baseada na cor do cubo
-            text_color = color_colors.get(color, (255, 255, 255))
-            
-            cv2.putText(frame, text, (block_x + 15, y_offset),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, text_color, 2)
+            text_color = OVERLAY_COLORS.get(color, (255, 255, 255))
+            lines.append((text, (15, y_offset), 0.5, text_color, 2))
             y_offset += 25
+        
+        # Fundo preto com transparência e borda branca - só o retângulo do bloco é misturado
+        detector.hud.draw_panel(frame, 'tempos_totais', block_x, block_y, block_width, block_height,
+                                lines, background_alpha=0.7, border=((255, 255, 255), 2))
+    
+    def apply_config(self, cfg):
+        """Aplica uma versão da configuração em tempo de execução (ver runtime_config.py)
+
+        Chamado pelo laço principal entre dois frames, então o tracking nunca vê
+        uma configuração pela metade.
+        """
+        self.color_confidence_threshold = cfg['COLOR_CONFIDENCE_THRESHOLD']
+        self.max_missed_duration = cfg['MAX_MISSED_DURATION']
+        self.min_exit_duration = cfg['MIN_EXIT_DURATION']
+        self.presence_exit_duration = cfg['PRESENCE_EXIT_DURATION']
+        if self.presence is not None:
+            self.presence.threshold = cfg['PRESENCE_DIFF_THRESHOLD']
+        self.cooldown_duration = cfg['COOLDOWN_DURATION']
+        self.min_detection_duration = cfg['MIN_DETECTION_DURATION']
+        self.color_ranges = dict(cfg['COLOR_RANGES'])
+        if self.color_cache is not None:
+            self.color_cache.clear()  # Cores em cache vieram dos ranges anteriores
+        self.update_frame_windows()
+    
+    def update_frame_windows(self):
+        """Recalcula os mínimos de frames das janelas de tempo com o fps medido"""
+        frames_for = self.frame_rate.frames_for
+        self.min_consecutive_frames = frames_for(self.min_detection_duration)
+        self.quick_detection_frames = frames_for(self.quick_detection_duration)
+        self.max_missed_frames = frames_for(self.max_missed_duration)
+        self.min_exit_frames = frames_for(self.min_exit_duration)
+        self.presence_exit_frames = frames_for(self.presence_exit_duration)
     
     def calculate_distance(self, bbox1, bbox2):
         """Calcula distância entre centroides de duas bounding boxes"""
@@ -276,7 +356,7 @@ class CubeDetector:
         
         return np.sqrt((center1[0] - center2[0])**2 + (center1[1] - center2[1])**2)
     
-    def get_stable_color(self, cube_id):
+    def get_stable_color(self, cube_id, current_time=None):
         """Retorna a cor mais estável baseada no histórico melhorado"""
         if cube_id not in self.color_detection_history or len(self.color_detection_history[cube_id]) < self.min_color_samples:
             return 'unknown', 0.0
@@ -294,7 +374,7 @@ class CubeDetector:
         confidence = color_counts[most_common_color] / len(self.color_detection_history[cube_id])
         
         # Só retorna a cor se a confiança for alta o suficiente E não estiver em cooldown
-        current_time = time.time()
+        current_time = time.time() if current_time is None else current_time
         if (confidence >= self.color_stability_threshold and 
             most_common_color not in self.color_cooldown or 
             current_time - self.color_cooldown.get(most_common_color, 0) > self.cooldown_duration):
@@ -302,30 +382,65 @@ class CubeDetector:
         else:
             return 'unknown', confidence
     
-    def is_color_in_cooldown(self, color):
-        """Verifica se uma cor está em período de cooldown"""
-        current_time = time.time()
+    def is_color_in_cooldown(self, color, current_time=None):
+        """Verifica se uma cor está em período de cooldown (no tempo do frame, se informado)"""
+        current_time = time.time() if current_time is None else current_time
         return (color in self.color_cooldown and 
                 current_time - self.color_cooldown[color] < self.cooldown_duration)
     
-    def update_tracking(self, detections, current_time):
-        """Sistema de tracking baseado em cores com verificação robusta de saída"""
+    def classify_detection(self, detection):
+        """Cor de uma detecção, calculada uma única vez por frame
+
+        Usa o frame (passando pelo cache temporal, se ativo) ou o recorte gravado
+        em 'crop'; detecções reproduzidas de uma gravação sem imagem trazem a cor
+        já classificada. O resultado fica em detection['color'] /
+        detection['color_conf'] para o gravador.
+        """
+        crop = detection.get('crop')
+        frame = detection.get('frame')
+        if crop is not None:
+            color, conf = self.detect_cube_color(crop, (0, 0, crop.shape[1], crop.shape[0]))
+        elif frame is None and 'color' in detection:
+            return detection['color'], detection['color_conf']
+        elif self.color_cache is not None and frame is not None:
+            color, conf = self.color_cache.classify(frame, detection['bbox'], self.detect_cube_color)
+        else:
+            color, conf = self.detect_cube_color(detection.get('frame', None), detection['bbox'])
+        detection['color'] = color
+        detection['color_conf'] = conf
+        return color, conf
+    
+    def update_tracking(self, detections, current_time, frame=None, inference=True, presence=None):
+        """Sistema de tracking baseado em cores com verificação robusta de saída
+
+        `frame` é usado pelo teste de presença e pelas evidências. Com
+        `inference=False` (frame sem YOLO) a ausência de detecções não conta
+        como falha: só o teste de presença decide saídas. `presence`
+        ({cor: True/False/None}, do replay) substitui o teste de presença por
+        resultados gravados.
+        """
+        self.last_inference = inference
+        self.presence_results = {}
+        # Mede o fps efetivo e ajusta os mínimos de frames das janelas de tempo
+        self.frame_rate.tick(current_time)
+        self.update_frame_windows()
+        
         # Marca todos os cubos ativos como não detectados neste frame
         for color in self.active_cubes_by_color:
             self.active_cubes_by_color[color]['detected_this_frame'] = False
         
-        # Processa cada detecção
+        # Processa cada detecção (a cor é classificada uma única vez por detecção)
+        colors_detected_this_frame = set()
         for detection in detections:
             bbox = detection['bbox']
             
             # Detecta cor da detecção
-            cube_color, color_conf = self.detect_cube_color(
-                detection.get('frame', None), bbox
-            )
+            cube_color, color_conf = self.classify_detection(detection)
             
             if (color_conf > self.color_confidence_threshold and 
                 cube_color != 'unknown' and 
-                not self.is_color_in_cooldown(cube_color)):
+                not self.is_color_in_cooldown(cube_color, current_time)):
+                colors_detected_this_frame.add(cube_color)
                 
                 # Verifica se já existe um cubo desta cor
                 if cube_color in self.active_cubes_by_color:
@@ -333,6 +448,7 @@ class CubeDetector:
                     cube = self.active_cubes_by_color[cube_color]
                     cube['bbox'] = bbox
                     cube['last_seen'] = current_time
+                    cube['last_detected'] = current_time
                     cube['detected_this_frame'] = True
                     
                     # Reset contador de frames sem detecção
@@ -356,6 +472,7 @@ class CubeDetector:
                         self.color_detection_frames[cube_color] = 1
                         self.color_missed_frames[cube_color] = 0
                         print(f"🔍 Iniciando detecção de cor {cube_color}...")
+                        self.events.publish(CANDIDATE_STARTED, cube_color, current_time)
                     else:
                         # Reset contador de frames perdidos (cor foi detectada novamente)
                         self.color_missed_frames[cube_color] = 0
@@ -382,6 +499,7 @@ class CubeDetector:
                                 'color': cube_color,
                                 'entry_time': detection_start_time,  # Inclui o tempo de detecção
                                 'last_seen': current_time,
+                                'last_detected': current_time,
                                 'bbox': bbox,
                                 'detected_this_frame': True
                             }
@@ -396,6 +514,12 @@ class CubeDetector:
                             if cube_color in self.color_missed_frames:
                                 del self.color_missed_frames[cube_color]
                             
+                            self.events.publish(CUBE_CONFIRMED, cube_color, current_time,
+                                                id=cube_id, entry_time=detection_start_time)
+                            if self.evidence is not None and frame is not None:
+                                self.evidence.capture(frame, bbox, cube_id, cube_color, 'confirmed',
+                                                      entry_time=detection_start_time, confirmed_at=current_time)
+                            
                             mode_text = "MODO RÁPIDO" if self.quick_detection_mode else "NORMAL"
                             print(f"✅ Cor {cube_color} confirmada após {detection_duration:.1f}s - Cubo adicionado ao grupo! ({mode_text})")
                         else:
@@ -404,6 +528,10 @@ class CubeDetector:
                             mode_text = "RÁPIDO" if self.quick_detection_mode else "NORMAL"
                             print(f"⏳ Cor {cube_color}: {progress:.0f}% ({detection_duration:.1f}s/{required_duration:.1f}s) [{mode_text}]")
         
+        # Trilhas do cache de cor sem caixa neste frame são descartadas
+        if self.color_cache is not None:
+            self.color_cache.end_frame()
+        
         # Limpa detecções que não foram confirmadas há muito tempo
         colors_to_clean = []
         for color in self.color_detection_start:
@@ -412,25 +540,15 @@ class CubeDetector:
         
         for color in colors_to_clean:
             print(f"❌ Cor {color} descartada - não foi confirmada em 3 segundos")
+            self.events.publish(CANDIDATE_LOST, color, current_time, reason='timeout')
             del self.color_detection_start[color]
             if color in self.color_detection_frames:
                 del self.color_detection_frames[color]
         
-        # Incrementa contadores de frames perdidos para cores em detecção
-        colors_detected_this_frame = set()
-        for detection in detections:
-            cube_color, color_conf = self.detect_cube_color(
-                detection.get('frame', None), detection['bbox']
-            )
-            if (color_conf > self.color_confidence_threshold and 
-                cube_color != 'unknown' and 
-                not self.is_color_in_cooldown(cube_color)):
-                colors_detected_this_frame.add(cube_color)
-        
         # Processa cores em detecção que não foram detectadas neste frame
         colors_to_reset = []
         for color in self.color_detection_start:
-            if color not in colors_detected_this_frame:
+            if inference and color not in colors_detected_this_frame:
                 # Incrementa contador de frames perdidos
                 if color not in self.color_missed_frames:
                     self.color_missed_frames[color] = 0
@@ -445,6 +563,7 @@ class CubeDetector:
         
         # Remove contadores de cores que perderam muitos frames
         for color in colors_to_reset:
+            self.events.publish(CANDIDATE_LOST, color, current_time, reason='missed')
             del self.color_detection_start[color]
             if color in self.color_detection_frames:
                 del self.color_detection_frames[color]
@@ -455,15 +574,38 @@ class CubeDetector:
         cubes_to_remove = []
         for color, cube_data in self.active_cubes_by_color.items():
             if not cube_data['detected_this_frame']:
+                # Teste de presença na última caixa (None = sem conclusão)
+                present = None
+                if presence is not None:
+                    present = presence.get(color)
+                    self.presence_results[color] = present
+                elif self.presence is not None and frame is not None:
+                    present = self.presence.present(frame, cube_data['bbox'])
+                    self.presence_results[color] = present
+                if present and current_time - cube_data['last_detected'] > self.presence_max_hold:
+                    present = None  # Só a presença há tempo demais: volta à regra por frames
+                
+                if present:
+                    # A região ainda não é fundo: o cubo continua lá (falha do YOLO ou frame sem inferência)
+                    cube_data['last_seen'] = current_time
+                    self.cube_exit_frames[color] = 0
+                    self.exit_stats['presence_holds'] += 1
+                    continue
+                if present is None and not inference:
+                    continue  # Sem inferência e sem fundo conhecido: nada a concluir neste frame
+                
                 # Incrementa contador de frames sem detecção
                 if color not in self.cube_exit_frames:
                     self.cube_exit_frames[color] = 0
                 self.cube_exit_frames[color] += 1
                 
-                # Só remove se passou do número mínimo de frames sem detecção
-                if self.cube_exit_frames[color] >= self.min_exit_frames:
+                # Região já igual ao fundo confirma a saída mais cedo; sem fundo conhecido vale o mínimo de frames
+                required_frames = self.presence_exit_frames if present is False else self.min_exit_frames
+                if self.cube_exit_frames[color] >= required_frames:
                     cubes_to_remove.append(color)
-                    print(f"✅ Cubo {color} confirmado como saído após {self.cube_exit_frames[color]} frames sem detecção")
+                    self.exit_stats['presence_exits' if present is False else 'frame_exits'] += 1
+                    reason = "região vazia" if present is False else "sem detecção"
+                    print(f"✅ Cubo {color} confirmado como saído após {self.cube_exit_frames[color]} frames ({reason})")
         
         # Remove cubos confirmados como saídos
         for color in cubes_to_remove:
@@ -480,12 +622,21 @@ class CubeDetector:
             
             self.cube_history.append(cube_data.copy())
             
-            # Adiciona ao logger se estiver disponível
-            if hasattr(self, 'logger'):
-                self.logger.add_cube(color, total_time)
+            # Evidência da saída: região da última caixa no frame atual (já sem o cubo)
+            if self.evidence is not None and frame is not None:
+                self.evidence.capture(frame, cube_data['bbox'], cube_data['id'], color, 'exit',
+                                      entry_time=cube_data['entry_time'], last_seen=cube_data['last_seen'],
+                                      exit_confirmed_at=current_time, total_time=total_time)
+            
+            # Logger e demais assinantes recebem o cubo pelo barramento
+            self.events.publish(CUBE_EXITED, color, current_time, id=cube_data['id'],
+                                entry_time=cube_data['entry_time'], last_seen=cube_data['last_seen'],
+                                total_time=total_time)
             
             # Adiciona cooldown para evitar detecção duplicada
             self.color_cooldown[color] = current_time
+            self.events.publish(COOLDOWN_STARTED, color, current_time,
+                                until=current_time + self.cooldown_duration)
             
             del self.active_cubes_by_color[color]
             # Limpa histórico de cores e contador de saída
@@ -493,11 +644,25 @@ class CubeDetector:
                 del self.color_detection_history[color]
             if color in self.cube_exit_frames:
                 del self.cube_exit_frames[color]
+        
+        # Modelo da cena vazia: atualizado fora das caixas detectadas e dos cubos ativos
+        if self.presence is not None and frame is not None:
+            occupied = [d['bbox'] for d in detections]
+            occupied.extend(cube['bbox'] for cube in self.active_cubes_by_color.values())
+            self.presence.observe(frame, occupied)
     
     def detect_cubes(self, frame, current_time):
         """Detecta cubos no frame"""
+        # Frame sem inferência (YOLO_SKIP_FRAMES): a saída fica com o teste de presença
+        if self.should_skip_inference():
+            self.update_tracking([], current_time, frame, inference=False)
+            return []
+        
         # Faz predição
-        results = self.model(frame, conf=self.confidence, verbose=False)
+        if self.imgsz:
+            results = self.model(frame, conf=self.confidence, imgsz=self.imgsz, verbose=False)
+        else:
+            results = self.model(frame, conf=self.confidence, verbose=False)
         
         detections = []
         for r in results:
@@ -513,232 +678,372 @@ class CubeDetector:
                     })
         
         # Atualiza tracking
-        self.update_tracking(detections, current_time)
+        self.update_tracking(detections, current_time, frame)
         
         return detections
+    
+    def should_skip_inference(self):
+        """Pula o YOLO só com cubos confirmados, nenhum candidato e teste de presença ativo"""
+        if (self.yolo_skip_frames and self.presence is not None and self.active_cubes_by_color
+                and not self.color_detection_start and self.skipped_frames < self.yolo_skip_frames):
+            self.skipped_frames += 1
+            self.exit_stats['skipped_inferences'] += 1
+            return True
+        self.skipped_frames = 0
+        return False
 
-def main():
-    print("[INFO] Iniciando script...")
+def draw_overlay(frame, detector, current_time):
+    """Desenha contornos, progresso do grupo, debug e controles sobre o frame
 
-    # Carrega o melhor modelo disponível
-    model_paths = [
-        "../runs-cube/yolov8n-cube5/weights/best.pt",
-        "../runs-cube/yolov8n-cube4/weights/best.pt",
-        "../runs-cube/yolov8n-cube3/weights/best.pt",
-        "../runs-cube/yolov8n-cube2/weights/best.pt",
-        "../runs-cube/yolov8n-cube/weights/best.pt"
-    ]
+    Os painéis de texto passam pelo HUD do detector e só são redesenhados quando
+    o conteúdo muda; os contornos e rótulos dos cubos são desenhados direto.
+    """
+    hud = detector.hud
+    frame_h, frame_w = frame.shape[:2]
+    
+    # Desenha detecções para cubos ativos
+    for color, cube_data in detector.active_cubes_by_color.items():
+        x1, y1, x2, y2 = cube_data['bbox']
+        
+        # Cor do contorno baseada na cor detectada
+        color_bgr = OVERLAY_COLORS.get(color, (128, 128, 128))
+        face_name = detector.color_mapping.get(color, 'Desconhecida')
+        
+        # Desenha contorno
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color_bgr, 3)
+        
+        # Calcula tempo na tela - usa último tempo visto se não foi detectado neste frame
+        if cube_data['detected_this_frame']:
+            time_in_frame = current_time - cube_data['entry_time']
+        else:
+            time_in_frame = cube_data['last_seen'] - cube_data['entry_time']
+        
+        # Texto com tempo e face (incluindo tempo de detecção)
+        label = f"Cubo {color} | {time_in_frame:.1f}s | {face_name} (incl. detecção)"
+        
+        cv2.putText(frame, label, (x1, y1 - 10),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, color_bgr, 2)
     
-    model_path = None
-    for path in model_paths:
-        try:
-            YOLO(path)
-            model_path = path
-            print(f"[INFO] Modelo carregado: {path}")
-            break
-        except Exception as e:
-            print(f"[WARN] Modelo {path} não pôde ser carregado: {e}")
-            continue
+    # Informações do grupo atual (minimalista)
+    if detector.logger is not None:
+        group_info = detector.logger.get_current_group_info()
+        if group_info['current_group_size'] > 0:
+            # Mostra progresso do grupo atual
+            group_lines = [(f"Grupo: {group_info['current_group_size']}/3", (10, 30), 0.7, (0, 255, 0), 2)]
+            
+            # Mostra cores já detectadas
+            if group_info['current_colors']:
+                colors_text = f"Cores: {', '.join(group_info['current_colors'])}"
+                group_lines.append((colors_text, (10, 60), 0.5, (255, 255, 255), 1))
+            
+            # Mostra tempo total dos grupos finalizados
+            if group_info['total_groups'] > 0:
+                group_lines.append((f"Grupos: {group_info['total_groups']}", (10, 90), 0.5, (255, 255, 0), 1))
+            
+            # Mostra informações de debug dos cubos sendo rastreados
+            debug_y = 120
+            for color, cube_data in detector.active_cubes_by_color.items():
+                if color in detector.cube_exit_frames:
+                    exit_frames = detector.cube_exit_frames[color]
+                    debug_text = f"{color}: {exit_frames}/{detector.min_exit_frames} frames sem detecção"
+                    color_debug = (0, 255, 255) if exit_frames < detector.min_exit_frames else (0, 0, 255)
+                    group_lines.append((debug_text, (10, debug_y), 0.4, color_debug, 1))
+                    debug_y += 20
+            
+            hud.draw_panel(frame, 'grupo', 0, 0, 420, debug_y, group_lines)
     
-    if model_path is None:
-        print("[ERRO] Nenhum modelo disponível. Saindo...")
-        return
+    # Mostra configurações de detecção atuais
+    current_duration = detector.quick_detection_duration if detector.quick_detection_mode else detector.min_detection_duration
+    mode_text = "RÁPIDO" if detector.quick_detection_mode else "NORMAL"
+    mode_color = (0, 255, 0) if detector.quick_detection_mode else (255, 255, 255)
     
-    # Inicializa detector
-    detector = CubeDetector(model_path)
-    print("[INFO] Detector inicializado")
+    hud.draw_panel(frame, 'configuracoes', frame_w - 200, 0, 200, 100, [
+        (f"Tempo: {current_duration:.1f}s", (0, 30), 0.5, (255, 255, 255), 1),
+        (f"Tolerância: {detector.max_missed_duration:.2f}s ({detector.max_missed_frames}f)", (0, 50), 0.5, (255, 255, 255), 1),
+        (f"Modo: {mode_text}", (0, 70), 0.5, mode_color, 1),
+        (f"FPS: {detector.frame_rate.fps:.0f}", (0, 90), 0.5, (255, 255, 255), 1)
+    ])
     
-    # Inicializa logger
-    logger = create_logger()
-    detector.logger = logger
-    print("[INFO] Logger criado")
+    # Mostra progresso de detecção de cores em andamento
+    if detector.color_detection_start:
+        panel_y = frame_h - 125
+        progress_lines = [("DETECÇÃO EM ANDAMENTO:", (10, 25), 0.6, (255, 255, 0), 2)]
+        line_y = 50
+        
+        for color in detector.color_detection_start:
+            detection_duration = current_time - detector.color_detection_start[color]
+            progress = min(100, (detection_duration / detector.min_detection_duration) * 100)
+            
+            # Cor do texto baseada na cor do cubo
+            text_color = OVERLAY_COLORS.get(color, (255, 255, 255))
+            
+            progress_text = f"{color.upper()}: {progress:.0f}% ({detection_duration:.1f}s)"
+            progress_lines.append((progress_text, (10, line_y), 0.5, text_color, 2))
+            line_y += 20
+        
+        hud.draw_panel(frame, 'deteccao', 0, panel_y, 420, line_y, progress_lines)
     
-    # Abre webcam
-    cap = None
-    for camera_id in [1, 0, 2, 3]:
-        cap = cv2.VideoCapture(camera_id)
-        if cap.isOpened():
-            print(f"[INFO] Câmera aberta: ID {camera_id}")
-            cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            cap.set(cv2.CAP_PROP_FPS, 30)
-            break
-        else:
-            cap.release()
+    # Mostra controles de teclado (estático - desenhado uma vez e reaproveitado)
+    controls_text = "Controles: Q=Sair, R=Modo Rápido, +/-=Tempo, [/]=Tolerância"
+    hud.draw_panel(frame, 'controles', 0, frame_h - 45, frame_w, 25, [
+        (controls_text, (10, 15), 0.4, (200, 200, 200), 1)
+    ])
+
+def load_model_selection(path=MODEL_SELECTION_FILE):
+    """Lê a escolha de modelo gravada por benchmark_models.py (ou None se não houver)
+
+    O arquivo e o model_path dentro dele são relativos a esta pasta, como o
+    benchmark grava.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            selection = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[WARN] Escolha de modelo inválida em {path}: {e}")
+        return None
+    if selection.get('model_path'):
+        selection['model_path'] = os.path.normpath(os.path.join(BASE_DIR, selection['model_path']))
+    return selection
+
+def get_model_candidates(selection=None):
+    """Retorna os modelos em ordem de tentativa: escolhido pelo benchmark primeiro"""
+    candidates = list(DEFAULT_MODEL_PATHS)
+    if selection and selection.get('model_path'):
+        selected = selection['model_path']
+        candidates = [selected] + [path for path in candidates if os.path.abspath(path) != selected]
+    return candidates
+
+# Teclas da janela -> ações de control_api.apply_control ('q' e 't' ficam no laço principal)
+KEY_ACTIONS = {
+    ord('d'): ('toggle_debug', {}),
+    ord('f'): ('finalize_group', {}),
+    ord('a'): ('toggle_api_send', {}),
+    ord('+'): ('detection_duration', {'delta': 0.1}),
+    ord('='): ('detection_duration', {'delta': 0.1}),
+    ord('-'): ('detection_duration', {'delta': -0.1}),
+    ord('['): ('missed_tolerance', {'frames': -1}),
+    ord(']'): ('missed_tolerance', {'frames': 1}),
+    ord('r'): ('quick_mode', {}),
+}
+
+def parse_args(argv=None):
+    """Lê as opções de linha de comando do detector"""
+    parser = argparse.ArgumentParser(description="Detector de cubos em tempo real")
+    parser.add_argument('--display', choices=['window', 'reduced', 'headless'], default=DISPLAY_MODE,
+                        help="window = janela a cada frame, reduced = janela a --display-fps, "
+                             "headless = sem janela nem desenho")
+    parser.add_argument('--headless', action='store_const', const='headless', dest='display',
+                        help="atalho para --display headless")
+    parser.add_argument('--display-fps', type=float, default=DISPLAY_FPS,
+                        help="taxa da janela no modo reduced")
+    parser.add_argument('--station', default=os.environ.get('STATION_ID'),
+                        help="perfil da estação em station_profiles.json (ou env STATION_ID)")
+    parser.add_argument('--profiles', default=STATION_PROFILES_FILE,
+                        help="arquivo de perfis recarregado sem reiniciar")
+    parser.add_argument('--worker', type=int, default=0,
+                        help="índice deste detector quando vários rodam na mesma máquina")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="quantos detectores dividem os núcleos desta máquina")
+    parser.add_argument('--daemon', action='store_true',
+                        help="sem janela, com API de controle local e reconexão da câmera")
+    parser.add_argument('--control-port', type=int, default=None,
+                        help=f"porta da API de controle (padrão {CONTROL_API_PORT} com --daemon; 0 desativa)")
+    parser.add_argument('--evidence', nargs='?', const=EVIDENCE_DIR, metavar='DIR',
+                        help=f"grava recortes JPEG dos cubos na confirmação e na saída (padrão {EVIDENCE_DIR}/)")
+    parser.add_argument('--preview', nargs='?', type=int, const=PREVIEW_PORT, metavar='PORTA',
+                        help=f"serve os frames anotados como stream MJPEG (padrão porta {PREVIEW_PORT})")
+    parser.add_argument('--preview-host', default=PREVIEW_HOST, metavar='ENDEREÇO',
+                        help=f"interface do preview (padrão {PREVIEW_HOST}; 0.0.0.0 expõe na rede)")
+    parser.add_argument('--record', metavar='ARQUIVO',
+                        help="grava as detecções de cada frame para replay sem modelo (ver replay.py)")
+    parser.add_argument('--record-crops', action='store_true',
+                        help="inclui na gravação um recorte pequeno de cada detecção")
+    args = parser.parse_args(argv)
+    if args.daemon:
+        args.display = 'headless'
+    return args
+
+def close_detector(detector, logger, frames):
+    """Encerra barramento, evidências e logger (mostrando as estatísticas) na saída do main()"""
+    # Entrega os eventos pendentes ao logger antes de fechar o grupo restante
+    print_event_stats(detector.events.close())
+    if detector.color_cache is not None:
+        cache = detector.color_cache.get_stats()
+        print(f"[INFO] Cache de cor: {cache['hit_rate'] * 100:.0f}% reaproveitado | {cache['new']} novas | "
+              f"{cache['changed']} mudaram | {cache['refreshed']} renovadas")
+    exits = detector.exit_stats
+    print(f"[INFO] Saídas: {exits['presence_exits']} por região vazia | {exits['frame_exits']} por frames sem detecção | "
+          f"{exits['presence_holds']} frames mantidos pela presença | {exits['skipped_inferences']} inferências puladas")
+    if detector.evidence is not None:
+        detector.evidence.close()
+        print_evidence_stats(detector.evidence.get_stats(frames))
+    if logger.current_group:
+        logger.force_finalize_group()
+    logger.close()
+
+def main(argv=None):
+    args = parse_args(argv)
+    print("[INFO] Iniciando script...")
     
+    # Threads de torch/OpenCV/BLAS e afinidade deste worker (ver resources.py)
+    apply_worker_resources('detector', args.worker, args.workers)
+
+    # Carrega o modelo (uma única vez, em segundo plano) enquanto procura a câmera
+    selection = load_model_selection()
+    model_paths = get_model_candidates(selection)
+    selected_path = selection.get('model_path') if selection else None
+    selected_imgsz = selection.get('imgsz') if selection else None
+        
+    model_path, model, camera_id, cap, startup_timer = fast_startup(
+        model_paths, pinned=selected_path,
+        imgsz_for=lambda path: selected_imgsz if path == selected_path else None
+    )
+        
+    if model_path is None:
+        print("[ERRO] Nenhum modelo disponível. Saindo...")
+        if cap:
+            cap.release()
+        return
+        
+    # Inicializa detector reaproveitando o modelo já carregado
+    with startup_timer.measure("detector + logger"):
+        detector = CubeDetector(model_path, model=model)
+        if model_path == selected_path:
+            detector.imgsz = selected_imgsz
+            print(f"[INFO] Usando escolha do benchmark: {selection.get('backend')} @ {detector.imgsz}px")
+        print("[INFO] Detector inicializado")
+            
+        # Inicializa logger
+        logger = create_logger()
+        detector.attach_logger(logger)
+        print("[INFO] Logger criado")
+        
     if not cap or not cap.isOpened():
         print("[ERRO] Nenhuma câmera disponível. Saindo...")
+        close_detector(detector, logger, 0)  # O barramento e o logger já estão rodando
         return
 
+    # Perfil da estação/câmera: a primeira versão é aplicada antes do primeiro frame
+    config_watcher = ConfigWatcher(args.profiles, args.station, camera_id)
+    initial_config = config_watcher.poll()
+    if initial_config is not None:
+        apply_runtime_config(initial_config, detector, logger)
+        print(f"[INFO] Configuração v{initial_config.version} ({initial_config.source}) - "
+              f"estação {args.station or 'padrão'}, câmera {camera_id}")
+    config_watcher.start()
+
+    recorder = DetectionRecorder(args.record, crops=args.record_crops) if args.record else None
+    if recorder:
+        print(f"[INFO] Gravando detecções em {args.record}{' (com recortes)' if args.record_crops else ''}")
+
+    if args.evidence:
+        detector.evidence = EvidenceStore(args.evidence)
+        print(f"[INFO] Evidências em {args.evidence}/ (máx. {detector.evidence.max_bytes // (1024 * 1024)}MB)")
+
+    startup_timer.report()
+        
+    display_interval = 1.0 / args.display_fps if args.display == 'reduced' and args.display_fps > 0 else 0.0
+    last_display = 0.0
+    print(f"[INFO] Modo de exibição: {args.display}")
+        
+    # API de controle local: ações aplicadas entre frames (ver control_api.py)
+    control = new_control_state()
+    control_server = None
+    control_port = args.control_port if args.control_port is not None else (CONTROL_API_PORT if args.daemon else 0)
+    if control_port:
+        control_server = ControlServer(port=control_port).start()
+        print(f"[INFO] API de controle em {control_server.url} (GET /state, POST /actions/<ação>)")
     
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        current_time = time.time()
-        
-        # Detecta cubos
-        detections = detector.detect_cubes(frame, current_time)
-        
-        # Desenha detecções para cubos ativos
-        for color, cube_data in detector.active_cubes_by_color.items():
-            x1, y1, x2, y2 = cube_data['bbox']
+    # Preview remoto: o laço só anota e publica quando há cliente (ver preview.py)
+    preview = PreviewServer(host=args.preview_host, port=args.preview).start() if args.preview else None
+    if preview:
+        print(f"[INFO] Preview em {preview.url}/stream.mjpg")
+        
+    try:
+        while control['running']:
+            if control_server:
+                control_server.process(detector, logger, control)
             
-            # Cor do contorno baseada na cor detectada
-            color_map = {
-                'white': (255, 255, 255),
-                'yellow': (0, 255, 255),
-                'red': (0, 0, 255),
-                'orange': (0, 165, 255),
-                'blue': (255, 0, 0),
-                'green': (0, 255, 0),
-                'unknown': (128, 128, 128)
-            }
+            ret, frame = cap.read()
+            if not ret:
+                if not args.daemon:
+                    break
+                # Daemon: mantém o modelo carregado e tenta reabrir a câmera
+                print(f"[WARN] Falha na leitura da câmera {camera_id} - reabrindo em 1s")
+                cap.release()
+                time.sleep(1.0)
+                cap = cv2.VideoCapture(camera_id)
+                continue
             
-            color_bgr = color_map.get(color, (128, 128, 128))
-            face_name = detector.color_mapping.get(color, 'Desconhecida')
+            # Aplica nova configuração entre frames (validada em segundo plano)
+            new_config = config_watcher.poll()
+            if new_config is not None:
+                swap_time = apply_runtime_config(new_config, detector, logger)
+                print(f"🔄 Configuração v{new_config.version} aplicada em {swap_time * 1000:.2f}ms")
             
-            # Desenha contorno
-            cv2.rectangle(frame, (x1, y1), (x2, y2), color_bgr, 3)
+            current_time = time.time()
+            logger.expire_groups(current_time)
             
-            # Calcula tempo na tela - usa último tempo visto se não foi detectado neste frame
-            if cube_data['detected_this_frame']:
-                time_in_frame = current_time - cube_data['entry_time']
+            # Detecta cubos (pausado: a câmera continua sendo lida, sem inferência)
+            if control['paused']:
+                detections = []
             else:
-                time_in_frame = cube_data['last_seen'] - cube_data['entry_time']
-            
-            # Texto com tempo e face (incluindo tempo de detecção)
-            label = f"Cubo {color} | {time_in_frame:.1f}s | {face_name} (incl. detecção)"
+                detections = detector.detect_cubes(frame, current_time)
+                control['frames'] += 1
+                if recorder:
+                    recorder.write_frame(current_time, detections, detector.last_inference,
+                                         detector.presence_results)
             
-            cv2.putText(frame, label, (x1, y1 - 10),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, color_bgr, 2)
-        
-        # Informações do grupo atual (minimalista)
-        if hasattr(detector, 'logger'):
-            group_info = detector.logger.get_current_group_info()
-            if group_info['current_group_size'] > 0:
-                # Mostra progresso do grupo atual
-                progress_text = f"Grupo: {group_info['current_group_size']}/3"
-                cv2.putText(frame, progress_text, (10, 30),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                
-                # Mostra cores já detectadas
-                if group_info['current_colors']:
-                    colors_text = f"Cores: {', '.join(group_info['current_colors'])}"
-                    cv2.putText(frame, colors_text, (10, 60),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            # No modo reduced o overlay e a janela seguem a taxa de exibição, não a da inferência
+            drawn = False
+            if args.display != 'headless' and current_time - last_display >= display_interval:
+                last_display = current_time
                 
-                # Mostra tempo total dos grupos finalizados
-                if group_info['total_groups'] > 0:
-                    total_groups_text = f"Grupos: {group_info['total_groups']}"
-                    cv2.putText(frame, total_groups_text, (10, 90),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
+                # Desenha overlay (contornos, grupo, debug e controles)
+                draw_overlay(frame, detector, current_time)
+                drawn = True
                 
-                # Mostra informações de debug dos cubos sendo rastreados
-                debug_y = 120
-                for color, cube_data in detector.active_cubes_by_color.items():
-                    if color in detector.cube_exit_frames:
-                        exit_frames = detector.cube_exit_frames[color]
-                        debug_text = f"{color}: {exit_frames}/{detector.min_exit_frames} frames sem detecção"
-                        color_debug = (0, 255, 255) if exit_frames < detector.min_exit_frames else (0, 0, 255)
-                        cv2.putText(frame, debug_text, (10, debug_y),
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.4, color_debug, 1)
-                        debug_y += 20
-        
-        # Mostra configurações de detecção atuais
-        current_duration = detector.quick_detection_duration if detector.quick_detection_mode else detector.min_detection_duration
-        current_frames = detector.quick_detection_frames if detector.quick_detection_mode else detector.min_consecutive_frames
-        mode_text = "RÁPIDO" if detector.quick_detection_mode else "NORMAL"
-        
-        detection_time_text = f"Tempo: {current_duration:.1f}s"
-        tolerance_text = f"Tolerância: {detector.max_missed_frames} frames"
-        mode_display_text = f"Modo: {mode_text}"
-        
-        cv2.putText(frame, detection_time_text, (frame.shape[1] - 200, 30),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-        cv2.putText(frame, tolerance_text, (frame.shape[1] - 200, 50),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-        cv2.putText(frame, mode_display_text, (frame.shape[1] - 200, 70),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0) if detector.quick_detection_mode else (255, 255, 255), 1)
-        
-        # Mostra progresso de detecção de cores em andamento
-        if detector.color_detection_start:
-            detection_y = frame.shape[0] - 100
-            cv2.putText(frame, "DETECÇÃO EM ANDAMENTO:", (10, detection_y),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
-            detection_y += 25
+                # Mostra frame
+                cv2.imshow("Detecção de Cubos", frame)
             
-            for color in detector.color_detection_start:
-                current_time = time.time()
-                detection_duration = current_time - detector.color_detection_start[color]
-                progress = min(100, (detection_duration / detector.min_detection_duration) * 100)
-                
-                # Cor do texto baseada na cor do cubo
-                color_map = {
-                    'white': (255, 255, 255),
-                    'yellow': (0, 255, 255),
-                    'red': (0, 0, 255),
-                    'orange': (0, 165, 255),
-                    'blue': (255, 0, 0),
-                    'green': (0, 255, 0)
-                }
-                text_color = color_map.get(color, (255, 255, 255))
-                
-                progress_text = f"{color.upper()}: {progress:.0f}% ({detection_duration:.1f}s)"
-                cv2.putText(frame, progress_text, (10, detection_y),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, text_color, 2)
-                detection_y += 20
-        
-        # Mostra controles de teclado
-        controls_y = frame.shape[0] - 30
-        controls_text = "Controles: Q=Sair, R=Modo Rápido, +/-=Tempo, [/]=Tolerância"
-        cv2.putText(frame, controls_text, (10, controls_y),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.4, (200, 200, 200), 1)
-        
-        # Mostra frame
-        cv2.imshow("Detecção de Cubos", frame)
-        
-        # Controles
-        key = cv2.waitKey(1) & 0xFF
-        if key == ord('q'):
-            break
-        elif key == ord('t'):  # Tecla 't' para testar ranges de cores
-            if detections:
-                detector.test_color_ranges(frame, detections[0]['bbox'])
-        elif key == ord('d'):  # Tecla 'd' para toggle debug
-            detector.debug_mode = not detector.debug_mode
-        elif key == ord('f'):  # Tecla 'f' para finalizar grupo atual
-            if hasattr(detector, 'logger'):
-                detector.logger.force_finalize_group()
-        elif key == ord('a'):  # Tecla 'a' para alternar envio para API
-            if hasattr(detector, 'logger'):
-                detector.logger.toggle_api_send()
-        elif key == ord('+') or key == ord('='):  # Tecla '+' para aumentar tempo de detecção
-            detector.min_detection_duration = min(2.0, detector.min_detection_duration + 0.1)
-            detector.min_consecutive_frames = int(detector.min_detection_duration * 30)
-            print(f"⏱️ Tempo de detecção aumentado para {detector.min_detection_duration:.1f}s")
-        elif key == ord('-'):  # Tecla '-' para diminuir tempo de detecção
-            detector.min_detection_duration = max(0.1, detector.min_detection_duration - 0.1)
-            detector.min_consecutive_frames = int(detector.min_detection_duration * 30)
-            print(f"⏱️ Tempo de detecção reduzido para {detector.min_detection_duration:.1f}s")
-        elif key == ord('['):  # Tecla '[' para diminuir tolerância a frames perdidos
-            detector.max_missed_frames = max(1, detector.max_missed_frames - 1)
-            print(f"🎯 Tolerância a frames perdidos reduzida para {detector.max_missed_frames}")
-        elif key == ord(']'):  # Tecla ']' para aumentar tolerância a frames perdidos
-            detector.max_missed_frames = min(10, detector.max_missed_frames + 1)
-            print(f"🎯 Tolerância a frames perdidos aumentada para {detector.max_missed_frames}")
-        elif key == ord('r'):  # Tecla 'r' para alternar modo de detecção rápida
-            detector.quick_detection_mode = not detector.quick_detection_mode
-            mode_text = "ATIVADO" if detector.quick_detection_mode else "DESATIVADO"
-            duration = detector.quick_detection_duration if detector.quick_detection_mode else detector.min_detection_duration
-            frames = detector.quick_detection_frames if detector.quick_detection_mode else detector.min_consecutive_frames
-            print(f"🚀 Modo de detecção rápida {mode_text} - {duration:.1f}s / {frames} frames")
-    
-    # Finaliza grupo restante se houver
-    if hasattr(detector, 'logger') and detector.logger.current_group:
-        detector.logger.force_finalize_group()
+            # Preview: reaproveita o overlay da janela e acrescenta os tempos totais por cor
+            if preview and preview.wants_frame(current_time):
+                if not drawn:
+                    draw_overlay(frame, detector, current_time)
+                detector.draw_time_block(frame, detector)
+                preview.publish(frame, current_time)
+            
+            # Modo headless: sem janela (encerre com Ctrl+C ou POST /actions/stop)
+            if args.display == 'headless':
+                continue
+            
+            # Controles (as mesmas ações da API de controle, ver control_api.py)
+            key = cv2.waitKey(1) & 0xFF
+            if key == ord('q'):
+                break
+            elif key == ord('t'):  # Tecla 't' para testar ranges de cores
+                if detections:
+                    detector.test_color_ranges(frame, detections[0]['bbox'])
+            elif key in KEY_ACTIONS:
+                action, params = KEY_ACTIONS[key]
+                apply_control(action, detector, logger, params, control)
+        
+    except KeyboardInterrupt:
+        print("[INFO] Interrompido pelo usuário")
+    finally:
+        config_watcher.stop()
+        if control_server:
+            control_server.stop()
+        if preview:
+            preview.stop()
+            print_preview_stats(preview.get_stats())
+        if recorder:
+            recorder.close()
+            print(f"💾 {recorder.frames} frames gravados em {args.record}")
     
+    close_detector(detector, logger, control['frames'])
     cap.release()
     cv2.destroyAllWindows()
 